@@ -0,0 +1,33 @@
+"""Add tombstone retention
+
+Revision ID: 3e7a5c91d0b2
+Revises: 9b3f6d2e18a4
+Create Date: 2026-10-19 10:05:47.216390
+
+Tombstones older than TOMBSTONE_RETENTION_SECONDS are pruned by a periodic
+job, which finds them by deleted_at and records on each owner the newest
+version pruned, so delta syncs from before it reset.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e7a5c91d0b2'
+down_revision: Union[str, Sequence[str], None] = '9b3f6d2e18a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('tombstone_horizon', sa.Integer(), nullable=False, server_default='0'))
+    op.create_index('ix_todo_tombstones_deleted_at', 'todo_tombstones', ['deleted_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_todo_tombstones_deleted_at', table_name='todo_tombstones')
+    op.drop_column('users', 'tombstone_horizon')
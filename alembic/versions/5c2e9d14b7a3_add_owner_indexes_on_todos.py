@@ -0,0 +1,41 @@
+"""Add owner_id composite and partial indexes on todos
+
+Revision ID: 5c2e9d14b7a3
+Revises: a831f143f9de
+Create Date: 2026-10-17 16:45:02.118430
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2e9d14b7a3'
+down_revision: Union[str, Sequence[str], None] = 'a831f143f9de'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY cannot run inside a transaction; it keeps the table
+    # writable while the indexes build on Postgres.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_todos_owner_id_id', 'todos', ['owner_id', 'id'],
+                        postgresql_concurrently=True)
+        op.create_index('ix_todos_owner_id_complete_priority', 'todos', ['owner_id', 'complete', 'priority'],
+                        postgresql_concurrently=True)
+        op.create_index('ix_todos_owner_id_open', 'todos', ['owner_id', 'id'],
+                        postgresql_where=sa.text('NOT complete'),
+                        sqlite_where=sa.text('complete = 0'),
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_todos_owner_id_open', table_name='todos', postgresql_concurrently=True)
+        op.drop_index('ix_todos_owner_id_complete_priority', table_name='todos', postgresql_concurrently=True)
+        op.drop_index('ix_todos_owner_id_id', table_name='todos', postgresql_concurrently=True)
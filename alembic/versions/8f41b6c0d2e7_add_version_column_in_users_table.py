@@ -0,0 +1,28 @@
+"""Add version column in users table
+
+Revision ID: 8f41b6c0d2e7
+Revises: 5c2e9d14b7a3
+Create Date: 2026-10-17 17:32:48.904215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f41b6c0d2e7'
+down_revision: Union[str, Sequence[str], None] = '5c2e9d14b7a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'version')
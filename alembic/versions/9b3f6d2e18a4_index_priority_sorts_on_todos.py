@@ -0,0 +1,46 @@
+"""Index priority sorts on todos
+
+Revision ID: 9b3f6d2e18a4
+Revises: c5e71b9a04d2
+Create Date: 2026-10-18 14:32:09.541873
+
+Keyset pages sorted by priority walk (owner_id, priority, id), or (priority,
+id) for admin listings across owners, instead of sorting every matching row.
+That needs a priority on every todo: NULLs become 0, and Postgres makes the
+column NOT NULL. SQLite cannot change a column's nullability without a table
+rebuild, which would drop the full-text search triggers on todos, so there
+the model's default keeps new rows non-NULL.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b3f6d2e18a4'
+down_revision: Union[str, Sequence[str], None] = 'c5e71b9a04d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute('UPDATE todos SET priority = 0 WHERE priority IS NULL')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column('todos', 'priority', existing_type=sa.Integer(), nullable=False, server_default='0')
+    # CONCURRENTLY cannot run inside a transaction; it keeps the table
+    # writable while the indexes build on Postgres.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_todos_owner_id_priority_id', 'todos', ['owner_id', 'priority', 'id'],
+                        postgresql_concurrently=True)
+        op.create_index('ix_todos_priority_id', 'todos', ['priority', 'id'], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_todos_priority_id', table_name='todos', postgresql_concurrently=True)
+        op.drop_index('ix_todos_owner_id_priority_id', table_name='todos', postgresql_concurrently=True)
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column('todos', 'priority', existing_type=sa.Integer(), nullable=True, server_default=None)
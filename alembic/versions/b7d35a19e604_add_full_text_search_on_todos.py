@@ -0,0 +1,66 @@
+"""Add full-text search index on todos
+
+Revision ID: b7d35a19e604
+Revises: 8f41b6c0d2e7
+Create Date: 2026-10-17 18:20:11.530917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d35a19e604'
+down_revision: Union[str, Sequence[str], None] = '8f41b6c0d2e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match backend.models.SEARCH_VECTOR_SQL for queries to use the index.
+SEARCH_VECTOR_SQL = "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, ''))"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # Building the expression index computes the vector for every
+        # existing row, which is the backfill; CONCURRENTLY keeps todos
+        # writable meanwhile.
+        with op.get_context().autocommit_block():
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_todos_search ON todos USING gin ({SEARCH_VECTOR_SQL})')
+    elif dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE todos_fts USING fts5("
+            "title, description, content='todos', content_rowid='id', tokenize='porter unicode61')"
+        )
+        op.execute(
+            "CREATE TRIGGER todos_fts_insert AFTER INSERT ON todos BEGIN "
+            "INSERT INTO todos_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER todos_fts_delete AFTER DELETE ON todos BEGIN "
+            "INSERT INTO todos_fts(todos_fts, rowid, title, description) "
+            "VALUES ('delete', old.id, old.title, old.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER todos_fts_update AFTER UPDATE OF title, description ON todos BEGIN "
+            "INSERT INTO todos_fts(todos_fts, rowid, title, description) "
+            "VALUES ('delete', old.id, old.title, old.description); "
+            "INSERT INTO todos_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END"
+        )
+        # Backfill: index every existing todo from the content table.
+        op.execute("INSERT INTO todos_fts(todos_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_todos_search')
+    elif dialect == 'sqlite':
+        for trigger in ('todos_fts_update', 'todos_fts_delete', 'todos_fts_insert'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS todos_fts')
@@ -0,0 +1,47 @@
+"""Widen todo ids to bigint
+
+Revision ID: c5e71b9a04d2
+Revises: a4c8e2f1d936
+Create Date: 2026-10-18 10:14:52.306718
+
+Shard k hands out todo ids from k << 40 (backend/shards.py), past the range of
+a 32-bit SERIAL. SQLite's INTEGER PRIMARY KEY is 64-bit already, so this is a
+no-op there. Seed a shard's id sequence afterwards with
+`python -m backend.shards prepare`.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e71b9a04d2'
+down_revision: Union[str, Sequence[str], None] = 'a4c8e2f1d936'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The sequence behind todos.id was created AS integer by SERIAL.
+ALTER_SEQUENCE_SQL = (
+    "DO $$ BEGIN EXECUTE format('ALTER SEQUENCE %s AS {type}', pg_get_serial_sequence('todos', 'id')); END $$"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.alter_column('todos', 'id', type_=sa.BigInteger(), existing_type=sa.Integer(), existing_nullable=False)
+    op.execute(ALTER_SEQUENCE_SQL.format(type='bigint'))
+    op.alter_column('todo_tombstones', 'todo_id', type_=sa.BigInteger(), existing_type=sa.Integer(),
+                    existing_nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.alter_column('todo_tombstones', 'todo_id', type_=sa.Integer(), existing_type=sa.BigInteger(),
+                    existing_nullable=False)
+    op.execute(ALTER_SEQUENCE_SQL.format(type='integer'))
+    op.alter_column('todos', 'id', type_=sa.Integer(), existing_type=sa.BigInteger(), existing_nullable=False)
@@ -0,0 +1,80 @@
+"""Add todo_counts table
+
+Revision ID: e6b19f3c50d8
+Revises: d2a8c47e91f5
+Create Date: 2026-10-17 19:48:22.607341
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6b19f3c50d8'
+down_revision: Union[str, Sequence[str], None] = 'd2a8c47e91f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Snapshot of backend.models.TODO_COUNTS_REMOVE_SQL / TODO_COUNTS_ADD_SQL.
+REMOVE_SQL = (
+    "UPDATE todo_counts SET count = count - 1 WHERE owner_id = old.owner_id "
+    "AND priority = coalesce(old.priority, 0) AND complete = coalesce(old.complete, false)"
+)
+ADD_SQL = (
+    "INSERT INTO todo_counts (owner_id, priority, complete, count) "
+    "SELECT new.owner_id, coalesce(new.priority, 0), coalesce(new.complete, false), 1 "
+    "WHERE new.owner_id IS NOT NULL "
+    "ON CONFLICT (owner_id, priority, complete) DO UPDATE SET count = todo_counts.count + 1"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    op.create_table(
+        'todo_counts',
+        sa.Column('owner_id', sa.Integer(), sa.ForeignKey('users.id'), primary_key=True),
+        sa.Column('priority', sa.Integer(), primary_key=True),
+        sa.Column('complete', sa.Boolean(), primary_key=True),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+    )
+    if dialect == 'postgresql':
+        # Hold off writers so none falls between the backfill and the trigger.
+        op.execute('LOCK TABLE todos IN SHARE ROW EXCLUSIVE MODE')
+        op.execute(
+            "CREATE OR REPLACE FUNCTION todo_counts_sync() RETURNS trigger AS $$ BEGIN "
+            f"IF TG_OP <> 'INSERT' THEN {REMOVE_SQL}; END IF; "
+            f"IF TG_OP <> 'DELETE' THEN {ADD_SQL}; END IF; "
+            "RETURN NULL; END $$ LANGUAGE plpgsql"
+        )
+        op.execute(
+            "CREATE TRIGGER todo_counts_sync AFTER INSERT OR DELETE OR UPDATE OF owner_id, priority, complete "
+            "ON todos FOR EACH ROW EXECUTE FUNCTION todo_counts_sync()"
+        )
+    elif dialect == 'sqlite':
+        op.execute(f"CREATE TRIGGER todo_counts_insert AFTER INSERT ON todos BEGIN {ADD_SQL}; END")
+        op.execute(f"CREATE TRIGGER todo_counts_delete AFTER DELETE ON todos BEGIN {REMOVE_SQL}; END")
+        op.execute(
+            "CREATE TRIGGER todo_counts_update AFTER UPDATE OF owner_id, priority, complete ON todos BEGIN "
+            f"{REMOVE_SQL}; {ADD_SQL}; END"
+        )
+    # Backfill from the existing todos.
+    op.execute(
+        "INSERT INTO todo_counts (owner_id, priority, complete, count) "
+        "SELECT owner_id, coalesce(priority, 0), coalesce(complete, false), count(*) FROM todos "
+        "WHERE owner_id IS NOT NULL GROUP BY owner_id, coalesce(priority, 0), coalesce(complete, false)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('DROP TRIGGER IF EXISTS todo_counts_sync ON todos')
+        op.execute('DROP FUNCTION IF EXISTS todo_counts_sync()')
+    elif dialect == 'sqlite':
+        for trigger in ('todo_counts_update', 'todo_counts_delete', 'todo_counts_insert'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    op.drop_table('todo_counts')
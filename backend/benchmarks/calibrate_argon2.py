@@ -0,0 +1,113 @@
+"""
+Pick Argon2 parameters for a target verify latency on this host.
+
+For every memory cost and parallelism in the grid, raises the time cost until a
+verify takes longer than the target, and keeps the last setting that fit. The
+strongest fitting setting (most memory passes: memory x time) wins, as long as
+HASH_MAX_CONCURRENCY simultaneous hashes stay within --max-memory-mib. The
+result is printed as JSON and as the ARGON2_* lines to put in the environment
+the app runs with (see backend/hashing.py).
+
+    python -m backend.benchmarks.calibrate_argon2 --target-ms 250
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from argon2 import PasswordHasher
+
+DEFAULT_MEMORY_MIB = (19, 32, 64, 128)
+DEFAULT_PARALLELISM = (1, 2, 4)
+PASSWORD = 'calibration-Password-1!'
+
+
+def measure(time_cost: int, memory_cost: int, parallelism: int, samples: int = 5) -> float:
+    """Median seconds for one verify with these parameters."""
+    ph = PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+    hashed = ph.hash(PASSWORD)
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        ph.verify(hashed, PASSWORD)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def calibrate(target_ms: float, memory_mib=DEFAULT_MEMORY_MIB, parallelism=DEFAULT_PARALLELISM,
+              max_time_cost: int = 10, concurrency: int = 1, max_memory_mib: float = float('inf'),
+              samples: int = 5, measure=measure) -> dict:
+    """The strongest parameters whose verify fits `target_ms`, with every measurement taken."""
+    measurements = []
+    best = None
+    for mib in memory_mib:
+        if mib * concurrency > max_memory_mib:
+            continue
+        for lanes in parallelism:
+            for time_cost in range(1, max_time_cost + 1):
+                ms = measure(time_cost, mib * 1024, lanes, samples) * 1000
+                measurements.append({
+                    'time_cost': time_cost, 'memory_cost': mib * 1024, 'parallelism': lanes, 'verify_ms': round(ms, 1),
+                })
+                if ms > target_ms:
+                    break
+                # More passes over more memory is stronger; on a tie prefer
+                # more memory (harder on GPUs), then fewer lanes, which leaves
+                # cores for concurrent logins.
+                key = (mib * time_cost, mib, -lanes)
+                if best is None or key > best[0]:
+                    best = (key, measurements[-1])
+    return {
+        'target_ms': target_ms,
+        'chosen': best[1] if best else None,
+        'measurements': measurements,
+    }
+
+
+def env_lines(chosen: dict) -> str:
+    return '\n'.join([
+        f"ARGON2_TIME_COST={chosen['time_cost']}",
+        f"ARGON2_MEMORY_COST={chosen['memory_cost']}",
+        f"ARGON2_PARALLELISM={chosen['parallelism']}",
+    ])
+
+
+def _int_list(value: str):
+    return tuple(int(v) for v in value.split(','))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--target-ms', type=float, default=250.0, help='verify latency to stay under')
+    parser.add_argument('--memory-mib', type=_int_list, default=DEFAULT_MEMORY_MIB, help='comma-separated memory costs in MiB')
+    parser.add_argument('--parallelism', type=_int_list, default=DEFAULT_PARALLELISM, help='comma-separated lane counts')
+    parser.add_argument('--max-time-cost', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=int(os.getenv('HASH_MAX_CONCURRENCY', '2')),
+                        help='hashes running at once (default HASH_MAX_CONCURRENCY)')
+    parser.add_argument('--max-memory-mib', type=float, default=float('inf'),
+                        help='memory all concurrent hashes may use together')
+    parser.add_argument('--samples', type=int, default=5, help='verifies timed per setting (median is used)')
+    parser.add_argument('--output', help='write the JSON report here as well as to stdout')
+    args = parser.parse_args(argv)
+
+    report = calibrate(
+        args.target_ms, args.memory_mib, args.parallelism, args.max_time_cost,
+        args.concurrency, args.max_memory_mib, args.samples,
+    )
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    if report['chosen'] is None:
+        print(f'no setting verifies within {args.target_ms} ms; raise --target-ms', file=sys.stderr)
+        return 1
+    print(env_lines(report['chosen']), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""
+Fixtures for the micro-benchmarks.
+
+The benchmarks run against their own seeded SQLite file through the same
+aiosqlite driver the app uses, so they need no running server or Postgres.
+"""
+
+import asyncio
+import os
+import tempfile
+
+# backend.database builds its engine at import, so point it somewhere harmless.
+BENCH_DATABASE_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ.setdefault("ENV", "test")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{BENCH_DATABASE_PATH}")
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from backend.benchmarks.seed import BENCH_PASSWORD, bench_username, seed
+from backend.models import Users
+
+BENCH_TODOS = 1000
+
+
+@pytest.fixture(scope="session")
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def seeded_db():
+    """A SQLite file with one benchmark user owning BENCH_TODOS todos."""
+    path = os.path.join(tempfile.mkdtemp(), "micro.db")
+    seed(f"sqlite:///{path}", users=1, todos_per_user=BENCH_TODOS)
+    return path
+
+
+@pytest.fixture(scope="session")
+def session_factory(seeded_db, loop):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{seeded_db}", poolclass=NullPool)
+    yield async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    loop.run_until_complete(engine.dispose())
+
+
+@pytest.fixture(scope="session")
+def bench_user(session_factory, loop):
+    async def load():
+        async with session_factory() as db:
+            return await db.scalar(select(Users).where(Users.username == bench_username(0)))
+
+    user = loop.run_until_complete(load())
+    return {"username": user.username, "id": user.id, "role": user.role, "password": BENCH_PASSWORD}
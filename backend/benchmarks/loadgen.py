@@ -0,0 +1,242 @@
+"""
+Scripted load generator for the API.
+
+Seeds N users x M todos, starts the app under uvicorn (or targets a server
+that is already running) and drives a weighted mix of login, list, create,
+update and delete requests from a fixed number of concurrent clients. The
+report is JSON with p50/p95/p99 latency and throughput per operation, so two
+runs can be compared directly:
+
+    python -m backend.benchmarks.loadgen --users 20 --todos 500 --duration 30 \\
+        --output after.json --baseline before.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from statistics import mean
+
+import httpx
+
+# backend.database builds its engine at import; seeding only needs the models
+# and never connects through that engine.
+os.environ.setdefault('DATABASE_URL', 'sqlite:///loadtest.db')
+
+from backend.benchmarks.seed import BENCH_PASSWORD, bench_username, seed
+
+DEFAULT_MIX = 'login=1,list=10,create=3,update=3,delete=1'
+# Latency statistic compared against a baseline report.
+REGRESSION_METRIC = 'p95_ms'
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(','):
+        op, _, weight = part.partition('=')
+        if op not in ('login', 'list', 'create', 'update', 'delete'):
+            raise argparse.ArgumentTypeError(f'unknown operation {op!r}')
+        weights[op] = float(weight or 1)
+    return weights
+
+
+def percentile(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class VirtualUser:
+    """One client: logs in once, then loops over the weighted mix."""
+
+    def __init__(self, client: httpx.AsyncClient, username: str, weights: dict, results: dict, rng: random.Random):
+        self.client = client
+        self.username = username
+        self.ops = list(weights)
+        self.weights = list(weights.values())
+        self.results = results
+        self.rng = rng
+        self.headers = {}
+        self.todo_ids = []
+
+    async def _timed(self, op: str, method: str, url: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        elapsed = time.perf_counter() - started
+        stats = self.results.setdefault(op, {'latencies': [], 'errors': 0})
+        stats['latencies'].append(elapsed)
+        if response.status_code >= 400:
+            stats['errors'] += 1
+        return response
+
+    async def login(self):
+        response = await self._timed(
+            'login', 'POST', '/auth/token',
+            data={'username': self.username, 'password': BENCH_PASSWORD},
+        )
+        if response.status_code == 200:
+            self.headers = {'Authorization': f"Bearer {response.json()['access_token']}"}
+
+    async def list(self):
+        response = await self._timed('list', 'GET', '/', headers=self.headers)
+        if response.status_code == 200:
+            self.todo_ids = [t['id'] for t in response.json()]
+
+    async def create(self):
+        await self._timed('create', 'POST', '/todo', headers=self.headers, json={
+            'title': 'Load test', 'description': 'Created under load', 'priority': self.rng.randint(1, 5),
+        })
+
+    async def update(self):
+        if not self.todo_ids:
+            return await self.list()
+        await self._timed('update', 'PUT', f'/todo/{self.rng.choice(self.todo_ids)}', headers=self.headers, json={
+            'title': 'Load test', 'description': 'Updated under load',
+            'priority': self.rng.randint(1, 5), 'complete': self.rng.random() < 0.5,
+        })
+
+    async def delete(self):
+        if not self.todo_ids:
+            return await self.list()
+        todo_id = self.todo_ids.pop(self.rng.randrange(len(self.todo_ids)))
+        await self._timed('delete', 'DELETE', f'/todo/{todo_id}', headers=self.headers)
+
+    async def run(self, deadline: float):
+        await self.login()
+        await self.list()
+        while time.perf_counter() < deadline:
+            op = self.rng.choices(self.ops, self.weights)[0]
+            await getattr(self, op)()
+
+
+async def drive(base_url: str, users: int, concurrency: int, duration: float, weights: dict, seed_value: int) -> dict:
+    results = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            VirtualUser(client, bench_username(i % users), weights, results, random.Random(seed_value + i)).run(deadline)
+            for i in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    report = {'elapsed_s': round(elapsed, 3), 'ops': {}}
+    total = 0
+    for op, stats in sorted(results.items()):
+        latencies = stats['latencies']
+        total += len(latencies)
+        report['ops'][op] = {
+            'count': len(latencies),
+            'errors': stats['errors'],
+            'throughput_rps': round(len(latencies) / elapsed, 2),
+            'mean_ms': round(mean(latencies) * 1000, 3),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        }
+    report['total_requests'] = total
+    report['throughput_rps'] = round(total / elapsed, 2)
+    return report
+
+
+def start_server(database_url: str, port: int, workers: int) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=database_url)
+    env.setdefault('SECRET_KEY', 'loadtest-secret')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'backend.main:app', '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning'],
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f'http://127.0.0.1:{port}/docs', timeout=1)
+            return process
+        except httpx.HTTPError:
+            if process.poll() is not None:
+                raise RuntimeError('uvicorn exited during startup')
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('uvicorn did not start within 30s')
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def regressions(report: dict, baseline: dict, tolerance: float) -> list:
+    """Operations whose REGRESSION_METRIC grew by more than `tolerance` over the baseline."""
+    found = []
+    for op, stats in report['ops'].items():
+        before = baseline.get('ops', {}).get(op)
+        if before and before[REGRESSION_METRIC] > 0:
+            change = stats[REGRESSION_METRIC] / before[REGRESSION_METRIC] - 1
+            if change > tolerance:
+                found.append({'op': op, 'metric': REGRESSION_METRIC, 'before': before[REGRESSION_METRIC],
+                              'after': stats[REGRESSION_METRIC], 'change': round(change, 3)})
+    return found
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=10, help='users to seed')
+    parser.add_argument('--todos', type=int, default=100, help='todos seeded per user')
+    parser.add_argument('--concurrency', type=int, default=20, help='concurrent virtual clients')
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds to drive load for')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f'operation weights (default {DEFAULT_MIX})')
+    parser.add_argument('--database-url', help='sync SQLAlchemy URL to seed (default: a temporary SQLite file)')
+    parser.add_argument('--url', help='target an already running server instead of starting uvicorn (skips seeding)')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn workers')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for the request mix')
+    parser.add_argument('--output', help='write the JSON report here as well as to stdout')
+    parser.add_argument('--baseline', help='earlier report to compare against; exit 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=0.2, help=f'allowed {REGRESSION_METRIC} growth over the baseline')
+    args = parser.parse_args(argv)
+
+    process = None
+    base_url = args.url
+    if base_url is None:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'loadtest.db')}"
+        seed(database_url, args.users, args.todos)
+        process = start_server(database_url, args.port, args.workers)
+        base_url = f'http://127.0.0.1:{args.port}'
+
+    try:
+        report = asyncio.run(drive(base_url, args.users, args.concurrency, args.duration, args.mix, args.seed))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    report['config'] = {
+        'users': args.users, 'todos_per_user': args.todos, 'concurrency': args.concurrency,
+        'duration_s': args.duration, 'mix': args.mix, 'workers': args.workers, 'seed': args.seed,
+    }
+    report['commit'] = git_commit()
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = regressions(report, json.load(f), args.tolerance)
+        status = 1 if report['regressions'] else 0
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
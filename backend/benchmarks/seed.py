@@ -0,0 +1,60 @@
+"""
+Benchmark data seeding.
+
+Creates N users with M todos each in any database SQLAlchemy can reach. All
+users share one password, hashed once, so seeding cost is dominated by the
+bulk inserts rather than Argon2.
+"""
+
+from argon2 import PasswordHasher
+from sqlalchemy import create_engine, insert
+from sqlalchemy.pool import NullPool
+
+from backend.database import Base
+from backend.models import Todos, Users
+
+BENCH_PASSWORD = 'BenchPassword123!'
+INSERT_BATCH_SIZE = 5000
+
+
+def bench_username(index: int) -> str:
+    return f'bench{index}'
+
+
+def seed(database_url: str, users: int, todos_per_user: int) -> None:
+    """Create the schema and insert `users` users owning `todos_per_user` todos each."""
+    engine = create_engine(database_url, poolclass=NullPool)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    hashed_password = PasswordHasher().hash(BENCH_PASSWORD)
+
+    with engine.begin() as conn:
+        owner_ids = conn.scalars(insert(Users).returning(Users.id, sort_by_parameter_order=True), [
+            {
+                'username': bench_username(i),
+                'email': f'{bench_username(i)}@example.com',
+                'first_name': 'Bench',
+                'last_name': str(i),
+                'hashed_password': hashed_password,
+                'role': 'user',
+                'is_active': True,
+            }
+            for i in range(users)
+        ]).all()
+
+        batch = []
+        for owner_id in owner_ids:
+            for j in range(todos_per_user):
+                batch.append({
+                    'title': f'Todo {j}',
+                    'description': 'Seeded for benchmarks',
+                    'priority': j % 5 + 1,
+                    'complete': j % 3 == 0,
+                    'owner_id': owner_id,
+                })
+                if len(batch) >= INSERT_BATCH_SIZE:
+                    conn.execute(insert(Todos), batch)
+                    batch = []
+        if batch:
+            conn.execute(insert(Todos), batch)
+    engine.dispose()
@@ -0,0 +1,94 @@
+"""
+Micro-benchmarks for the hot paths of the API.
+
+Run with `pytest backend/benchmarks --benchmark-json=micro.json` (needs
+pytest-benchmark) and compare runs with `pytest-benchmark compare`.
+"""
+
+from datetime import timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_, select
+
+from backend.models import Todos
+from backend.pagination import page_of, paginate, sort_todos
+from backend.routers import auth
+from backend.serializers import dump_todos, todo_select
+from backend.token_cache import token_cache
+
+
+def _token(user):
+    return auth.create_access_token(user["username"], user["id"], user["role"], timedelta(minutes=20))
+
+
+class TestAuthBenchmarks:
+    """Token and password paths."""
+
+    def test_create_access_token(self, benchmark, bench_user):
+        benchmark(_token, bench_user)
+
+    def test_decode_token_uncached(self, benchmark, bench_user):
+        token = _token(bench_user)
+        benchmark.pedantic(auth.decode_token, args=(token,), setup=token_cache.clear, rounds=2000)
+
+    def test_decode_token_cached(self, benchmark, bench_user):
+        token = _token(bench_user)
+        auth.decode_token(token)
+        benchmark(auth.decode_token, token)
+
+    def test_authenticate_user(self, benchmark, bench_user, session_factory, loop):
+        async def authenticate():
+            async with session_factory() as db:
+                return await auth.authenticate_user(bench_user["username"], bench_user["password"], db)
+
+        user = benchmark.pedantic(lambda: loop.run_until_complete(authenticate()), rounds=20)
+        assert user is not None
+
+
+class TestTodoQueryBenchmarks:
+    """Todo reads against a seeded owner."""
+
+    def _run(self, loop, session_factory, stmt):
+        async def query():
+            async with session_factory() as db:
+                return (await db.scalars(stmt)).all()
+
+        return loop.run_until_complete(query())
+
+    def test_list_all(self, benchmark, bench_user, session_factory, loop):
+        stmt = sort_todos(select(Todos).where(Todos.owner_id == bench_user["id"]), "id")
+        rows = benchmark(self._run, loop, session_factory, stmt)
+        assert len(rows) > 0
+
+    def test_list_page(self, benchmark, bench_user, session_factory, loop):
+        stmt = paginate(select(Todos).where(Todos.owner_id == bench_user["id"]), "id", None, 100)
+        rows = benchmark(self._run, loop, session_factory, stmt)
+        assert page_of(rows, "id", 100)[1] is not None
+
+    def test_todo_by_id(self, benchmark, bench_user, session_factory, loop):
+        stmt = select(Todos).where(and_(Todos.id == 500, Todos.owner_id == bench_user["id"]))
+        rows = benchmark(self._run, loop, session_factory, stmt)
+        assert len(rows) == 1
+
+
+class TestSerializationBenchmarks:
+    """Encoding a full list: the old ORM + jsonable_encoder path against Core rows + orjson."""
+
+    def _load(self, loop, session_factory, stmt, scalars):
+        async def query():
+            async with session_factory() as db:
+                result = await (db.scalars(stmt) if scalars else db.execute(stmt))
+                return result.all()
+
+        return loop.run_until_complete(query())
+
+    def test_encode_orm_jsonable_encoder(self, benchmark, bench_user, session_factory, loop):
+        rows = self._load(loop, session_factory, select(Todos).where(Todos.owner_id == bench_user["id"]), True)
+        body = benchmark(lambda: JSONResponse(jsonable_encoder(rows)).body)
+        assert body.startswith(b"[")
+
+    def test_encode_core_rows_orjson(self, benchmark, bench_user, session_factory, loop):
+        rows = self._load(loop, session_factory, todo_select().where(Todos.owner_id == bench_user["id"]), False)
+        body = benchmark(dump_todos, rows)
+        assert body.startswith(b"[")
@@ -0,0 +1,160 @@
+"""
+Per-owner todo read cache.
+
+The serialized payload of each owner's todo list is cached under a key that
+includes the owner's data version (see backend/versions.py). Writers bump the
+version in the same transaction as the write, so a reader never asks for an
+entry written before the change; stale entries simply age out. Because the
+version lives in the database, this holds across workers even with the
+in-process store.
+
+The store is pluggable: an in-process LRU by default, or Redis when
+TODO_CACHE_BACKEND=redis (needs the optional `redis` package). A store that
+errors is treated as a miss so the database stays the source of truth.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+TODO_CACHE_BACKEND = os.getenv('TODO_CACHE_BACKEND', 'memory')
+TODO_CACHE_TTL = int(os.getenv('TODO_CACHE_TTL', '60'))
+TODO_CACHE_MAX_ENTRIES = int(os.getenv('TODO_CACHE_MAX_ENTRIES', '10000'))
+# Lists larger than this are served from the database every time.
+TODO_CACHE_MAX_PAYLOAD_BYTES = int(os.getenv('TODO_CACHE_MAX_PAYLOAD_BYTES', str(1024 * 1024)))
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+# Namespaces the cache's keys in a Redis database it may share.
+TODO_CACHE_REDIS_PREFIX = os.getenv('TODO_CACHE_REDIS_PREFIX', 'todo-cache:')
+REDIS_CLEAR_BATCH_SIZE = 500
+
+
+class MemoryStore:
+    """In-process LRU with per-entry TTLs."""
+
+    def __init__(self, max_entries: int = TODO_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    async def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value, ttl: Optional[int] = None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl if ttl else None, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisStore:
+    """The same interface on top of a redis.asyncio client, with every key under `prefix`."""
+
+    def __init__(self, client=None, url: str = REDIS_URL, prefix: str = TODO_CACHE_REDIS_PREFIX):
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError as exc:
+                raise RuntimeError('TODO_CACHE_BACKEND=redis requires the redis package') from exc
+            client = redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str):
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value, ttl: Optional[int] = None):
+        await self.client.set(self.prefix + key, value, ex=ttl)
+
+    async def clear(self):
+        """Delete the keys under `prefix`, a SCAN batch at a time; the rest of the database is left alone."""
+        keys = []
+        async for key in self.client.scan_iter(match=_glob_escape(self.prefix) + '*', count=REDIS_CLEAR_BATCH_SIZE):
+            keys.append(key)
+            if len(keys) >= REDIS_CLEAR_BATCH_SIZE:
+                await self.client.delete(*keys)
+                keys = []
+        if keys:
+            await self.client.delete(*keys)
+
+
+def _glob_escape(text: str) -> str:
+    return ''.join('\\' + char if char in '*?[]\\' else char for char in text)
+
+
+class CacheMetrics:
+    """Thread-safe counters describing the todo cache."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = {'hits': 0, 'misses': 0, 'sets': 0, 'skipped': 0, 'errors': 0}
+
+    def incr(self, name: str):
+        with self._lock:
+            self.counts[name] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.counts)
+
+
+class TodoCache:
+    """Versioned per-owner cache of serialized todo lists."""
+
+    def __init__(self, store, ttl: int = TODO_CACHE_TTL, max_payload_bytes: int = TODO_CACHE_MAX_PAYLOAD_BYTES):
+        self.store = store
+        self.ttl = ttl
+        self.max_payload_bytes = max_payload_bytes
+        self.metrics = CacheMetrics()
+
+    async def get_list(self, owner_id: int, version: int) -> Optional[bytes]:
+        try:
+            payload = await self.store.get(f'todos:list:{owner_id}:{version}')
+        except Exception:
+            self.metrics.incr('errors')
+            logger.exception('todo cache read failed')
+            return None
+        self.metrics.incr('hits' if payload is not None else 'misses')
+        return payload
+
+    async def set_list(self, owner_id: int, version: int, payload: bytes):
+        if len(payload) > self.max_payload_bytes:
+            self.metrics.incr('skipped')
+            return
+        try:
+            await self.store.set(f'todos:list:{owner_id}:{version}', payload, self.ttl)
+            self.metrics.incr('sets')
+        except Exception:
+            self.metrics.incr('errors')
+            logger.exception('todo cache write failed')
+
+
+def build_store():
+    if TODO_CACHE_BACKEND == 'redis':
+        return RedisStore()
+    return MemoryStore()
+
+
+todo_cache = TodoCache(build_store())
@@ -1,20 +1,187 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import asyncio
+from collections import deque
+from uuid import uuid4
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 import os
+import time
 from dotenv import load_dotenv
+from backend.metrics import REGISTRY, Counter, Histogram
 
 load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv('DATABASE_URL')
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    pool_pre_ping=True, 
-    pool_recycle=300,
-    pool_size=5,
-    max_overflow=10,
-    )
+# Pool sizing is per worker process: the database sees
+# workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections at most.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '300'))
+# Pre-ping costs a round trip per checkout; recycling already retires
+# connections before typical server or load-balancer idle timeouts.
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', '0') == '1'
+# Behind PgBouncer in transaction mode the bouncer does the pooling and a
+# server connection is not ours across transactions, so keep no pool and
+# no server-side prepared statements.
+DB_PGBOUNCER = os.getenv('DB_PGBOUNCER', '0') == '1'
 
-SessionLocal = sessionmaker(autocommit = False, autoflush = False, bind=engine)
+# /health/ready turns 503 above this share of the pool in use, or when the
+# slowest checkout in the last DB_READY_WINDOW seconds waited too long.
+DB_READY_MAX_UTILIZATION = float(os.getenv('DB_READY_MAX_UTILIZATION', '0.9'))
+DB_READY_MAX_CHECKOUT_WAIT_MS = float(os.getenv('DB_READY_MAX_CHECKOUT_WAIT_MS', '500'))
+DB_READY_WINDOW = float(os.getenv('DB_READY_WINDOW', '30'))
+
+
+def async_database_url(url: str):
+    """Point a plain DATABASE_URL at its asyncio driver (asyncpg / aiosqlite)."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend in ('postgres', 'postgresql'):
+        query = dict(url.query)
+        # asyncpg takes `ssl` rather than libpq's `sslmode`
+        if 'sslmode' in query:
+            query['ssl'] = query.pop('sslmode')
+        url = url.set(drivername='postgresql+asyncpg', query=query)
+    elif backend == 'sqlite':
+        url = url.set(drivername='sqlite+aiosqlite')
+    return url
+
+
+POOL_CHECKOUT_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds', 'Time taken to obtain a pooled connection, including any new connect.',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+POOL_CHECKOUT_TIMEOUTS = Counter('db_pool_checkout_timeouts_total', 'Checkouts that gave up waiting for a connection.')
+
+
+# (finished_at, seconds) for recent checkouts; readiness looks at the tail.
+_recent_checkouts = deque(maxlen=1024)
+
+
+class _CheckoutTimer:
+    """Times every checkout into POOL_CHECKOUT_WAIT and the readiness window."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            POOL_CHECKOUT_TIMEOUTS.inc()
+            raise
+        finally:
+            now = time.perf_counter()
+            POOL_CHECKOUT_WAIT.observe(now - started)
+            _recent_checkouts.append((now, now - started))
+
+
+class InstrumentedQueuePool(_CheckoutTimer, AsyncAdaptedQueuePool):
+    """The default asyncio queue pool, timing every checkout."""
+
+
+class InstrumentedNullPool(_CheckoutTimer, NullPool):
+    """A connection per checkout (PgBouncer mode), timed and counted."""
+
+    _checked_out = 0
+
+    def _do_get(self):
+        connection = super()._do_get()
+        self._checked_out += 1
+        return connection
+
+    def _do_return_conn(self, record):
+        self._checked_out -= 1
+        super()._do_return_conn(record)
+
+    def checkedout(self) -> int:
+        return self._checked_out
+
+
+def engine_options(url) -> dict:
+    """create_async_engine keyword arguments for `url` under the DB_* settings."""
+    if DB_PGBOUNCER:
+        options = {'poolclass': InstrumentedNullPool}
+        if url.get_backend_name() == 'postgresql':
+            options['connect_args'] = {
+                'statement_cache_size': 0,
+                'prepared_statement_cache_size': 0,
+                # Unique names, so a statement prepared on one server
+                # connection never collides with another client's.
+                'prepared_statement_name_func': lambda: f'__asyncpg_{uuid4()}__',
+            }
+        return options
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+    }
+
+
+_database_url = async_database_url(SQLALCHEMY_DATABASE_URL)
+engine = create_async_engine(_database_url, **engine_options(_database_url))
+
+
+async def warm_pool(connections: int):
+    """Open `connections` pooled connections at once so early requests skip the connect."""
+    results = await asyncio.gather(*(engine.connect().start() for _ in range(connections)), return_exceptions=True)
+    opened = [r for r in results if not isinstance(r, BaseException)]
+    await asyncio.gather(*(connection.close() for connection in opened))
+    # Opening connections is not a request waiting on the pool; keep it out
+    # of the readiness window.
+    _recent_checkouts.clear()
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+
+def pool_stats() -> dict:
+    pool = engine.pool
+    if isinstance(pool, InstrumentedNullPool):
+        return {'size': 0, 'checked_in': 0, 'checked_out': pool.checkedout(), 'overflow': 0, 'capacity': 0}
+    return {
+        'size': pool.size(),
+        'checked_in': pool.checkedin(),
+        'checked_out': pool.checkedout(),
+        'overflow': pool.overflow(),
+        'capacity': pool.size() + max(pool._max_overflow, 0),
+    }
+
+
+def pool_health() -> dict:
+    """Pool utilization and recent checkout waits, with a readiness verdict."""
+    stats = pool_stats()
+    capacity = stats['capacity']
+    utilization = stats['checked_out'] / capacity if capacity else 0.0
+    horizon = time.perf_counter() - DB_READY_WINDOW
+    waits = [seconds for finished, seconds in list(_recent_checkouts) if finished >= horizon]
+    max_wait_ms = max(waits, default=0.0) * 1000
+    return {
+        'ready': utilization < DB_READY_MAX_UTILIZATION and max_wait_ms < DB_READY_MAX_CHECKOUT_WAIT_MS,
+        'mode': 'pgbouncer' if DB_PGBOUNCER else 'pool',
+        'pool': {**stats, 'utilization': round(utilization, 3)},
+        'checkout_wait': {
+            'window_s': DB_READY_WINDOW,
+            'count': len(waits),
+            'mean_ms': round(sum(waits) / len(waits) * 1000, 3) if waits else 0.0,
+            'max_ms': round(max_wait_ms, 3),
+        },
+    }
+
+
+def _pool_metrics():
+    return [
+        (f'db_pool_{name}', 'gauge', f'Connection pool {name.replace("_", " ")}.', [({}, value)])
+        for name, value in pool_stats().items()
+    ]
+
+
+REGISTRY.register_collector(_pool_metrics)
+
+SessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
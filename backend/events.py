@@ -0,0 +1,327 @@
+"""
+Server push of todo changes.
+
+Writers publish a small event per committed write: the kind of change, the
+todo ids and the owner's new version (see backend/versions.py). Clients
+subscribed to GET /todo/events receive their own events as Server-Sent Events
+and fetch the rows with /todo/changes?since=, so an event never carries more
+than ids however large the write.
+
+Events go through a broker so every worker sees them: the in-process
+LocalBroker by default, or Redis pub/sub when EVENTS_BROKER=redis (needs the
+optional `redis` package). Each worker's Hub fans events out to the
+connections it holds. A worker that loses its Redis subscription resubscribes
+with backoff (EVENTS_RECONNECT_SECONDS, doubling up to
+EVENTS_RECONNECT_MAX_SECONDS) and overflows its open streams, since it cannot
+know what it missed.
+
+Every connection has a bounded queue, by event count and by bytes. A client
+that falls behind is not allowed to grow the queue or slow the publisher:
+its stream ends with an `overflow` event and it is expected to reconnect and
+resync from its last version.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from contextlib import aclosing
+from typing import Optional
+
+from backend.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+EVENTS_BROKER = os.getenv('EVENTS_BROKER', 'local')
+EVENTS_CHANNEL = os.getenv('EVENTS_CHANNEL', 'todo-events')
+EVENTS_MAX_QUEUED = int(os.getenv('EVENTS_MAX_QUEUED', '100'))
+EVENTS_MAX_QUEUED_BYTES = int(os.getenv('EVENTS_MAX_QUEUED_BYTES', str(64 * 1024)))
+EVENTS_MAX_CONNECTIONS_PER_OWNER = int(os.getenv('EVENTS_MAX_CONNECTIONS_PER_OWNER', '10'))
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv('EVENTS_HEARTBEAT_SECONDS', '15'))
+# Streams end after this long so connections rebalance across workers and
+# re-authenticate; EventSource-style clients reconnect on their own.
+EVENTS_MAX_STREAM_SECONDS = float(os.getenv('EVENTS_MAX_STREAM_SECONDS', '300'))
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+# Backoff between attempts to resubscribe after the Redis connection drops.
+EVENTS_RECONNECT_SECONDS = float(os.getenv('EVENTS_RECONNECT_SECONDS', '1'))
+EVENTS_RECONNECT_MAX_SECONDS = float(os.getenv('EVENTS_RECONNECT_MAX_SECONDS', '30'))
+
+OVERFLOW = object()
+
+
+class Subscription:
+    """One connection's bounded queue of encoded events."""
+
+    def __init__(self, owner_id: int, max_queued: int = EVENTS_MAX_QUEUED,
+                 max_queued_bytes: int = EVENTS_MAX_QUEUED_BYTES):
+        self.owner_id = owner_id
+        self.max_queued_bytes = max_queued_bytes
+        self.queued_bytes = 0
+        self.overflowed = False
+        self._queue = asyncio.Queue(maxsize=max_queued)
+
+    def offer(self, payload: bytes) -> bool:
+        """Queue an event without waiting; False (and overflowed) once the limits are hit."""
+        if self.overflowed:
+            return False
+        if self.queued_bytes + len(payload) > self.max_queued_bytes or self._queue.full():
+            self.overflow()
+            return False
+        self.queued_bytes += len(payload)
+        self._queue.put_nowait(payload)
+        return True
+
+    def overflow(self):
+        """Drop what is queued and end the stream with an overflow event."""
+        self.overflowed = True
+        # Wake the reader so it can end the stream now.
+        self._drain()
+        self._queue.put_nowait(OVERFLOW)
+
+    def _drain(self):
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self.queued_bytes = 0
+
+    async def get(self, timeout: Optional[float] = None):
+        """The next payload, OVERFLOW, or None on timeout."""
+        try:
+            item = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if item is not OVERFLOW:
+            self.queued_bytes -= len(item)
+        return item
+
+
+class TooManyConnections(Exception):
+    pass
+
+
+class Hub:
+    """In-process fan-out from owner ids to their open connections."""
+
+    def __init__(self, max_connections_per_owner: int = EVENTS_MAX_CONNECTIONS_PER_OWNER,
+                 heartbeat: float = EVENTS_HEARTBEAT_SECONDS, max_stream_seconds: float = EVENTS_MAX_STREAM_SECONDS):
+        self.max_connections_per_owner = max_connections_per_owner
+        self.heartbeat = heartbeat
+        self.max_stream_seconds = max_stream_seconds
+        self._subscriptions = defaultdict(set)
+        self.overflows = 0
+        # Called with the owner id of every event, before fan-out.
+        self.listeners = []
+
+    def subscribe(self, owner_id: int) -> Subscription:
+        if len(self._subscriptions[owner_id]) >= self.max_connections_per_owner:
+            raise TooManyConnections(owner_id)
+        subscription = Subscription(owner_id)
+        self._subscriptions[owner_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._subscriptions.get(subscription.owner_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.owner_id]
+
+    def has_room(self, owner_id: int) -> bool:
+        return len(self._subscriptions.get(owner_id, ())) < self.max_connections_per_owner
+
+    def connections(self, owner_id: Optional[int] = None) -> int:
+        if owner_id is not None:
+            return len(self._subscriptions.get(owner_id, ()))
+        return sum(len(s) for s in self._subscriptions.values())
+
+    def dispatch(self, owner_id: int, payload: bytes):
+        for listener in self.listeners:
+            listener(owner_id)
+        for subscription in list(self._subscriptions.get(owner_id, ())):
+            already_overflowed = subscription.overflowed
+            if not subscription.offer(payload) and not already_overflowed:
+                self.overflows += 1
+
+    def overflow_all(self):
+        """End every stream with an overflow event: events may have been missed, clients must resync."""
+        for subscriptions in list(self._subscriptions.values()):
+            for subscription in list(subscriptions):
+                if not subscription.overflowed:
+                    subscription.overflow()
+                    self.overflows += 1
+
+    async def connect(self, owner_id: int):
+        """Server-Sent Events for a new connection of the owner.
+
+        The subscription is taken once the response starts streaming, so a
+        client that goes away before the first byte never holds a slot. A
+        connection that lost the race for the owner's last slot ends at once.
+        """
+        try:
+            subscription = self.subscribe(owner_id)
+        except TooManyConnections:
+            return
+        async with aclosing(self.stream(subscription)) as chunks:
+            async for chunk in chunks:
+                yield chunk
+
+    async def stream(self, subscription: Subscription):
+        """Server-Sent Events for one subscription; unsubscribes when the client goes away."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_stream_seconds
+        try:
+            yield b'retry: 1000\n\n'
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                item = await subscription.get(min(self.heartbeat, remaining))
+                if item is None:
+                    yield b': keep-alive\n\n'
+                elif item is OVERFLOW:
+                    yield b'event: overflow\ndata: {}\n\n'
+                    break
+                else:
+                    yield b'event: todo\ndata: ' + item + b'\n\n'
+        finally:
+            self.unsubscribe(subscription)
+
+
+def encode_event(owner_id: int, kind: str, ids, version: Optional[int]) -> bytes:
+    return json.dumps({'owner_id': owner_id, 'type': kind, 'ids': list(ids), 'version': version},
+                      separators=(',', ':')).encode()
+
+
+class LocalBroker:
+    """Delivers straight to this process's hub; for a single worker and the tests."""
+
+    def __init__(self):
+        self.hub = None
+
+    async def start(self, hub: Hub):
+        self.hub = hub
+
+    async def stop(self):
+        self.hub = None
+
+    async def publish(self, owner_id: int, payload: bytes):
+        if self.hub is not None:
+            self.hub.dispatch(owner_id, payload)
+
+
+class RedisBroker:
+    """Redis pub/sub on one channel; every worker relays to its own hub."""
+
+    def __init__(self, client=None, url: str = REDIS_URL, channel: str = EVENTS_CHANNEL,
+                 reconnect_seconds: float = EVENTS_RECONNECT_SECONDS,
+                 reconnect_max_seconds: float = EVENTS_RECONNECT_MAX_SECONDS):
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError as exc:
+                raise RuntimeError('EVENTS_BROKER=redis requires the redis package') from exc
+            client = redis.from_url(url)
+        self.client = client
+        self.channel = channel
+        self.reconnect_seconds = reconnect_seconds
+        self.reconnect_max_seconds = reconnect_max_seconds
+        self.reconnects = 0
+        self._delay = reconnect_seconds
+        self._task = None
+
+    async def start(self, hub: Hub):
+        # The first subscription is made here, so events published once
+        # startup has finished are not missed.
+        self._task = asyncio.create_task(self._run(await self._subscribe(), hub))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _subscribe(self):
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(self.channel)
+        return pubsub
+
+    async def _run(self, pubsub, hub: Hub):
+        """Relay until stopped, resubscribing with backoff whenever the connection drops."""
+        self._delay = self.reconnect_seconds
+        while True:
+            try:
+                await self._relay(pubsub, hub)
+                logger.warning('todo event subscription ended; resubscribing')
+            except Exception:
+                logger.warning('todo event subscription failed; resubscribing', exc_info=True)
+            # Whatever was published meanwhile is lost: streams resync.
+            hub.overflow_all()
+            pubsub = None
+            while pubsub is None:
+                await asyncio.sleep(self._delay)
+                self._delay = min(self._delay * 2, self.reconnect_max_seconds)
+                try:
+                    pubsub = await self._subscribe()
+                except Exception:
+                    logger.warning('resubscribing to todo events failed; next try in %.0fs', self._delay,
+                                   exc_info=True)
+            self.reconnects += 1
+
+    async def _relay(self, pubsub, hub: Hub):
+        try:
+            async for message in pubsub.listen():
+                if message.get('type') != 'message':
+                    continue
+                # Delivering again: the next drop starts from the shortest backoff.
+                self._delay = self.reconnect_seconds
+                data = message['data']
+                try:
+                    owner_id = json.loads(data)['owner_id']
+                except (ValueError, KeyError, TypeError):
+                    logger.warning('dropping malformed todo event')
+                    continue
+                hub.dispatch(owner_id, data if isinstance(data, bytes) else data.encode())
+        finally:
+            try:
+                await pubsub.unsubscribe(self.channel)
+            except Exception:
+                # The connection is already gone.
+                pass
+
+    async def publish(self, owner_id: int, payload: bytes):
+        await self.client.publish(self.channel, payload)
+
+
+def build_broker():
+    if EVENTS_BROKER == 'redis':
+        return RedisBroker()
+    return LocalBroker()
+
+
+hub = Hub()
+broker = build_broker()
+
+
+async def publish(owner_id: int, kind: str, ids, version: Optional[int] = None):
+    """Announce a committed write. Never fails the request that made it."""
+    try:
+        await broker.publish(owner_id, encode_event(owner_id, kind, ids, version))
+    except Exception:
+        logger.exception('publishing todo event failed')
+
+
+def _event_metrics():
+    return [
+        ('todo_event_connections', 'gauge', 'Open todo event streams on this worker.', [({}, hub.connections())]),
+        ('todo_event_overflows_total', 'counter', 'Event streams closed because the client fell behind.',
+         [({}, hub.overflows)]),
+        ('todo_event_broker_reconnects_total', 'counter', 'Times the broker subscription was re-established.',
+         [({}, getattr(broker, 'reconnects', 0))]),
+    ]
+
+
+REGISTRY.register_collector(_event_metrics)
+
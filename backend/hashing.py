@@ -0,0 +1,201 @@
+"""
+Password hashing subsystem.
+
+Argon2 is deliberately expensive, so hashing and verification never run on the
+event loop. Every call is handed to a small, bounded thread pool (argon2-cffi
+releases the GIL while hashing) and the number of callers allowed to wait for
+a slot is capped, so a burst of logins cannot starve the rest of the API.
+
+The Argon2 cost comes from ARGON2_TIME_COST, ARGON2_MEMORY_COST (KiB) and
+ARGON2_PARALLELISM, which `python -m backend.benchmarks.calibrate_argon2`
+picks for a target verify latency on the host. Stored hashes made with other
+parameters are rehashed when their owner next logs in (see needs_rehash).
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from argon2 import PasswordHasher
+from argon2.exceptions import VerifyMismatchError
+from fastapi import HTTPException
+from starlette import status
+
+from backend.metrics import REGISTRY, Histogram
+
+# Number of hashes that may run at the same time (one thread each).
+HASH_MAX_CONCURRENCY = int(os.getenv('HASH_MAX_CONCURRENCY', '2'))
+# Number of callers allowed to wait for a free slot before we shed load.
+HASH_MAX_QUEUE = int(os.getenv('HASH_MAX_QUEUE', '64'))
+
+# Defaults are argon2-cffi's own (RFC 9106 low-memory profile).
+ARGON2_TIME_COST = int(os.getenv('ARGON2_TIME_COST', '3'))
+ARGON2_MEMORY_COST = int(os.getenv('ARGON2_MEMORY_COST', '65536'))
+ARGON2_PARALLELISM = int(os.getenv('ARGON2_PARALLELISM', '4'))
+
+ph = PasswordHasher(
+    time_cost=ARGON2_TIME_COST,
+    memory_cost=ARGON2_MEMORY_COST,
+    parallelism=ARGON2_PARALLELISM,
+)
+
+HASH_SECONDS = Histogram('argon2_duration_seconds', 'Time spent running Argon2, by operation.', ('op',))
+HASH_WAIT_SECONDS = Histogram('argon2_wait_seconds', 'Time spent queued for a hashing slot, by operation.', ('op',))
+
+
+class HashingMetrics:
+    """Thread-safe counters describing the hashing pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.queue_depth = 0
+            self.peak_queue_depth = 0
+            self.in_flight = 0
+            self.rejected = 0
+            self.ops = {
+                op: {'count': 0, 'wait_seconds': 0.0, 'run_seconds': 0.0, 'max_seconds': 0.0}
+                for op in ('hash', 'verify')
+            }
+
+    def enqueued(self):
+        with self._lock:
+            self.queue_depth += 1
+            self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+
+    def started(self):
+        with self._lock:
+            self.queue_depth -= 1
+            self.in_flight += 1
+
+    def finished(self, op: str, wait: float, run: float):
+        with self._lock:
+            self.in_flight -= 1
+            stats = self.ops[op]
+            stats['count'] += 1
+            stats['wait_seconds'] += wait
+            stats['run_seconds'] += run
+            stats['max_seconds'] = max(stats['max_seconds'], wait + run)
+        HASH_SECONDS.observe(run, op)
+        HASH_WAIT_SECONDS.observe(wait, op)
+
+    def cancelled(self):
+        with self._lock:
+            self.queue_depth -= 1
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'max_concurrency': HASH_MAX_CONCURRENCY,
+                'max_queue': HASH_MAX_QUEUE,
+                'queue_depth': self.queue_depth,
+                'peak_queue_depth': self.peak_queue_depth,
+                'in_flight': self.in_flight,
+                'rejected': self.rejected,
+                'ops': {op: dict(stats) for op, stats in self.ops.items()},
+            }
+
+
+metrics = HashingMetrics()
+
+
+def _hashing_metrics():
+    snapshot = metrics.snapshot()
+    return [
+        ('argon2_queue_depth', 'gauge', 'Callers waiting for a hashing slot.', [({}, snapshot['queue_depth'])]),
+        ('argon2_in_flight', 'gauge', 'Hashes currently running.', [({}, snapshot['in_flight'])]),
+        ('argon2_rejected_total', 'counter', 'Callers turned away because the queue was full.', [({}, snapshot['rejected'])]),
+    ]
+
+
+REGISTRY.register_collector(_hashing_metrics)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=HASH_MAX_CONCURRENCY,
+                    thread_name_prefix='argon2',
+                )
+    return _executor
+
+
+async def warm_up():
+    """Start every hashing thread and run Argon2 once on each, off the request path."""
+    executor = _get_executor()
+    await asyncio.gather(*(
+        asyncio.wrap_future(executor.submit(ph.hash, 'warm-up')) for _ in range(HASH_MAX_CONCURRENCY)
+    ))
+
+
+def shutdown():
+    """Stop the hashing pool, waiting for running hashes to finish."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+async def _run(op: str, fn, *args):
+    if metrics.queue_depth >= HASH_MAX_QUEUE:
+        metrics.reject()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Server is busy, please retry shortly.',
+            headers={'Retry-After': '1'},
+        )
+
+    submitted = time.perf_counter()
+
+    def job():
+        started = time.perf_counter()
+        metrics.started()
+        try:
+            return fn(*args)
+        finally:
+            finished = time.perf_counter()
+            metrics.finished(op, started - submitted, finished - started)
+
+    metrics.enqueued()
+    future = _get_executor().submit(job)
+    # A caller that goes away before its job starts must give its slot back.
+    future.add_done_callback(lambda f: metrics.cancelled() if f.cancelled() else None)
+    return await asyncio.wrap_future(future)
+
+
+async def hash_password(password: str) -> str:
+    """Hash a plain password off the event loop."""
+    return await _run('hash', ph.hash, password)
+
+
+async def verify_password(hashed_password: str, plain_password: str) -> bool:
+    """Return True if the plain password matches the stored hash."""
+    def verify():
+        try:
+            return ph.verify(hashed_password, plain_password)
+        except VerifyMismatchError:
+            return False
+
+    return await _run('verify', verify)
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True if the hash was made with other parameters than the configured ones. Cheap: it only parses."""
+    return ph.check_needs_rehash(hashed_password)
@@ -0,0 +1,267 @@
+"""
+Durable background jobs.
+
+Work too long for a request (deleting an account with a huge todo list, say)
+is queued as a row in the jobs table with `enqueue`, in the caller's
+transaction, and answered with 202 and the job id; GET /jobs/{id} reports
+its status and progress. Handlers are registered per kind with `@handler`.
+
+Every worker process runs JOBS_CONCURRENCY asyncio tasks (0 disables the
+runner, e.g. on web-only workers) that claim queued jobs from the main
+database with a conditional UPDATE, so workers in other processes never run
+the same job twice. A claimed job holds a lease of JOBS_LEASE_SECONDS, renewed
+whenever the handler reports progress or calls `renew`; a job whose worker
+died is taken over once the lease lapses. Jobs therefore survive restarts, and handlers must be
+safe to run again from the top: work in chunks that each commit, and skip
+what is already done.
+
+A handler that raises is retried after JOBS_RETRY_SECONDS, doubling each
+time, until it has run `max_attempts` times (JOBS_MAX_ATTEMPTS by default);
+then the job is failed with the error kept on the row.
+
+Housekeeping registered with `@periodic` runs every so many seconds: the
+runner queues one job of its kind at start, and each run that ends queues
+the next, unless one is queued already (by another process, say).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend import database
+from backend.metrics import Counter, Histogram
+from backend.models import Jobs
+
+logger = logging.getLogger(__name__)
+
+JOBS_CONCURRENCY = int(os.getenv('JOBS_CONCURRENCY', '2'))
+JOBS_POLL_SECONDS = float(os.getenv('JOBS_POLL_SECONDS', '1'))
+JOBS_LEASE_SECONDS = float(os.getenv('JOBS_LEASE_SECONDS', '300'))
+JOBS_RETRY_SECONDS = float(os.getenv('JOBS_RETRY_SECONDS', '5'))
+JOBS_MAX_ATTEMPTS = int(os.getenv('JOBS_MAX_ATTEMPTS', '5'))
+MAX_ERROR_LENGTH = 1000
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = 'queued', 'running', 'succeeded', 'failed'
+ACTIVE = (QUEUED, RUNNING)
+
+JOBS_FINISHED = Counter('jobs_finished_total', 'Job runs by kind and outcome.', ('kind', 'result'))
+JOB_SECONDS = Histogram('job_duration_seconds', 'Time spent running each job attempt.', ('kind',),
+                        buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0))
+
+HANDLERS = {}
+SCHEDULES = {}
+
+
+def handler(kind: str):
+    """Register the decorated coroutine function as the handler for jobs of `kind`."""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def periodic(kind: str, seconds: float):
+    """Register the handler for jobs of `kind` and have the runner run one every `seconds`."""
+    def register(fn):
+        HANDLERS[kind] = fn
+        SCHEDULES[kind] = seconds
+        return fn
+    return register
+
+
+async def enqueue(db: AsyncSession, kind: str, payload: Optional[dict] = None, owner_id: Optional[int] = None,
+                  max_attempts: int = JOBS_MAX_ATTEMPTS, run_after: Optional[float] = None) -> int:
+    """Queue a job (to run from `run_after`, default now) and return its id.
+
+    The caller commits, then calls `runner.wake()`.
+    """
+    return await db.scalar(insert(Jobs).values(
+        kind=kind, owner_id=owner_id, payload=json.dumps(payload or {}), status=QUEUED,
+        max_attempts=max_attempts, run_after=time.time() if run_after is None else run_after,
+    ).returning(Jobs.id))
+
+
+class JobContext:
+    """What a handler gets: the job's identity and payload, and a way to report progress."""
+
+    def __init__(self, runner: 'JobRunner', row):
+        self.runner = runner
+        self.id = row.id
+        self.kind = row.kind
+        self.owner_id = row.owner_id
+        self.payload = json.loads(row.payload)
+        self.attempts = row.attempts
+        self.max_attempts = row.max_attempts
+        self.total = row.total
+
+    def _current(self):
+        # Only the worker holding this attempt may write to the row.
+        return and_(Jobs.id == self.id, Jobs.status == RUNNING, Jobs.attempts == self.attempts)
+
+    async def progress(self, done: int, total: Optional[int] = None):
+        """Record `done` (out of `total`, if given) and renew the lease."""
+        values = {'progress': done}
+        if total is not None:
+            values['total'] = self.total = total
+        await self.renew(**values)
+
+    async def renew(self, **values):
+        """Extend the lease, so a long step that reports no progress is not taken over."""
+        async with self.runner.sessionmaker() as db:
+            await db.execute(update(Jobs).where(self._current()).values(
+                locked_until=time.time() + self.runner.lease_seconds, **values,
+            ))
+            await db.commit()
+
+
+class JobRunner:
+    """A pool of asyncio tasks that claim and run jobs from the jobs table."""
+
+    def __init__(self, sessionmaker, concurrency: int = JOBS_CONCURRENCY, poll_seconds: float = JOBS_POLL_SECONDS,
+                 lease_seconds: float = JOBS_LEASE_SECONDS, retry_seconds: float = JOBS_RETRY_SECONDS,
+                 handlers: Optional[dict] = None, schedules: Optional[dict] = None):
+        self.sessionmaker = sessionmaker
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.retry_seconds = retry_seconds
+        self.handlers = HANDLERS if handlers is None else handlers
+        # Only kinds this runner can run are scheduled.
+        schedules = SCHEDULES if schedules is None else schedules
+        self.schedules = {kind: seconds for kind, seconds in schedules.items() if kind in self.handlers}
+        self._workers = []
+        self._wake = None
+
+    async def start(self):
+        if self._workers or self.concurrency <= 0:
+            return
+        for kind in self.schedules:
+            await self._schedule_next(kind)
+        self._wake = asyncio.Event()
+        self._workers = [asyncio.create_task(self._work(), name=f'job-worker-{i}') for i in range(self.concurrency)]
+
+    async def stop(self):
+        """Cancel the workers; a job cut off mid-run is queued again straight away."""
+        workers, self._workers = self._workers, []
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    def wake(self):
+        """Have idle workers look for jobs now rather than at their next poll."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _work(self):
+        while True:
+            try:
+                ran = await self.run_once()
+            except Exception:
+                logger.exception('job worker could not claim a job')
+                ran = False
+            if ran:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def schedule(self, kind: str, run_after: float) -> Optional[int]:
+        """Queue a periodic job of `kind` to run from `run_after`, unless one is already waiting to run."""
+        async with self.sessionmaker() as db:
+            if await db.scalar(select(Jobs.id).where(Jobs.kind == kind, Jobs.status.in_(ACTIVE)).limit(1)):
+                return None
+            job_id = await enqueue(db, kind, run_after=run_after)
+            await db.commit()
+        return job_id
+
+    async def _schedule_next(self, kind: str):
+        try:
+            await self.schedule(kind, time.time() + self.schedules[kind])
+        except Exception:
+            logger.warning('could not schedule the next %s job', kind, exc_info=True)
+
+    async def claim(self) -> Optional[JobContext]:
+        """Take the oldest runnable job: queued and due, or running on a lapsed lease."""
+        now = time.time()
+        runnable = or_(
+            and_(Jobs.status == QUEUED, Jobs.run_after <= now),
+            and_(Jobs.status == RUNNING, Jobs.locked_until < now),
+        )
+        async with self.sessionmaker() as db:
+            job_id = await db.scalar(select(Jobs.id).where(runnable).order_by(Jobs.id).limit(1))
+            if job_id is None:
+                return None
+            # Another worker may have claimed it since the select; then nothing matches.
+            row = (await db.execute(
+                update(Jobs).where(Jobs.id == job_id, runnable)
+                .values(status=RUNNING, attempts=Jobs.attempts + 1, locked_until=now + self.lease_seconds)
+                .returning(Jobs.id, Jobs.kind, Jobs.owner_id, Jobs.payload, Jobs.attempts, Jobs.max_attempts,
+                           Jobs.total)
+            )).first()
+            await db.commit()
+        return JobContext(self, row) if row is not None else None
+
+    async def run_once(self) -> bool:
+        """Claim and run one job; False if there was none to run."""
+        job = await self.claim()
+        if job is None:
+            return False
+        if job.attempts > job.max_attempts:
+            # It kept dying without raising (the worker was killed each time).
+            await self._finish(job, FAILED, 'the job was abandoned by its worker too many times')
+            return True
+        run = self.handlers.get(job.kind)
+        started = time.perf_counter()
+        try:
+            if run is None:
+                raise LookupError(f'no handler for job kind {job.kind!r}')
+            await run(job)
+        except asyncio.CancelledError:
+            await asyncio.shield(self._release(job))
+            raise
+        except Exception as e:
+            logger.exception('job %s (%s) failed on attempt %d', job.id, job.kind, job.attempts)
+            await self._failed(job, f'{type(e).__name__}: {e}'[:MAX_ERROR_LENGTH])
+        else:
+            await self._finish(job, SUCCEEDED)
+        finally:
+            JOB_SECONDS.observe(time.perf_counter() - started, job.kind)
+        return True
+
+    async def _update(self, job: JobContext, **values):
+        async with self.sessionmaker() as db:
+            await db.execute(update(Jobs).where(job._current()).values(**values))
+            await db.commit()
+
+    async def _finish(self, job: JobContext, result: str, error: Optional[str] = None):
+        await self._update(job, status=result, error=error, locked_until=None)
+        JOBS_FINISHED.inc(job.kind, result)
+        if job.kind in self.schedules:
+            await self._schedule_next(job.kind)
+
+    async def _failed(self, job: JobContext, error: str):
+        if job.attempts >= job.max_attempts:
+            await self._finish(job, FAILED, error)
+            return
+        delay = self.retry_seconds * 2 ** (job.attempts - 1)
+        await self._update(job, status=QUEUED, error=error, locked_until=None, run_after=time.time() + delay)
+        JOBS_FINISHED.inc(job.kind, 'retried')
+
+    async def _release(self, job: JobContext):
+        # Shutting down is not the job's fault: give the attempt back.
+        try:
+            await self._update(job, status=QUEUED, locked_until=None, run_after=time.time(),
+                               attempts=Jobs.attempts - 1)
+        except Exception:
+            logger.warning('could not release job %s; it runs again when its lease lapses', job.id, exc_info=True)
+
+
+runner = JobRunner(database.SessionLocal)
@@ -1,14 +1,20 @@
-import os
-from dotenv import load_dotenv
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from backend.database import engine
-from backend import models
-from backend.routers import auth, todos, admin, user
+from backend import replicas, shards, sql_profiler
+from backend.metrics import MetricsMiddleware
+from backend.routers import auth, todos, admin, user, jobs, metrics, health
+from backend.startup import lifespan
 
-load_dotenv()
+# ---- Startup ----
+# Importing this module does no I/O (settings are loaded once, by
+# backend.database); schema creation and warm-up run in the lifespan, see
+# backend/startup.py.
 
-app = FastAPI()
+# orjson renders every JSON response; todo lists also skip jsonable_encoder
+# (see backend/serializers.py).
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # ---- CORS ----
 
@@ -25,13 +31,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination cursor for keyset-paged listings, ETag for revalidation
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
-# ---- DB ----
-models.Base.metadata.create_all(bind=engine)
+# ---- SQL profiling (opt-in, SQL_PROFILE=1) ----
+if sql_profiler.SQL_PROFILE:
+    # Reads may go to replicas and todo writes to shards; count those too.
+    for profiled in (engine, *replicas.reads.engines(), *shards.cluster.engines):
+        sql_profiler.install(profiled)
+    app.add_middleware(sql_profiler.SQLProfilerMiddleware)
+
+# ---- Metrics ----
+# Added last so it is the outermost middleware and times the whole request.
+app.add_middleware(MetricsMiddleware)
 
 # ---- Routers ----
 app.include_router(auth.router)
 app.include_router(todos.router)
 app.include_router(admin.router)
 app.include_router(user.router)
+app.include_router(jobs.router)
+app.include_router(metrics.router)
+app.include_router(health.router)
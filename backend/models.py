@@ -1,5 +1,5 @@
 from backend.database import Base
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import DDL, BigInteger, Column, DateTime, Float, Integer, LargeBinary, String, Boolean, ForeignKey, Index, Text, event, func, text
 
 class Users(Base):
     __tablename__ = 'users'
@@ -12,13 +12,184 @@ class Users(Base):
     is_active = Column(Boolean, default=True)
     role = Column(String)
     phone_number = Column(String, nullable=True)
+    # Bumped by every write to the user or their todos; drives ETags and the todo cache.
+    version = Column(Integer, nullable=False, default=0, server_default='0')
+    # The newest version whose tombstones were pruned (see TodoTombstones);
+    # delta syncs from before it start over.
+    tombstone_horizon = Column(Integer, nullable=False, default=0, server_default='0')
+
+# Todo ids are 64-bit: shard k hands them out from k << SHARD_ID_BITS (see
+# backend/shards.py). SQLite's INTEGER PRIMARY KEY is 64-bit already, and
+# only that exact type can be AUTOINCREMENT.
+TODO_ID = BigInteger().with_variant(Integer, 'sqlite')
 
 class Todos(Base):
     __tablename__ = 'todos'
 
-    id =  Column(Integer, primary_key=True, index=True) 
+    id =  Column(TODO_ID, primary_key=True, index=True) 
     title = Column(String)
     description = Column(String)
-    priority = Column(Integer)
+    # Never NULL, so the priority sort pages through the (owner_id, priority, id) index.
+    priority = Column(Integer, nullable=False, default=0, server_default='0')
     complete = Column(Boolean, default=False)
     owner_id = Column(Integer, ForeignKey('users.id'))
+    # The owner's version when this todo was last written; /todo/changes
+    # returns the todos written after the client's last sync.
+    version = Column(Integer, nullable=False, default=0, server_default='0')
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=func.now(), onupdate=func.now(),
+                        server_default=func.now())
+
+    # Every todo query is scoped to an owner: single-item routes and keyset
+    # pages use (owner_id, id) or, sorted by priority, (owner_id, priority,
+    # id), filtered listings use (owner_id, complete, priority), and paging
+    # through open items only touches incomplete rows. Admin listings span
+    # owners, so their priority sort has an index of its own.
+    __table_args__ = (
+        Index('ix_todos_owner_id_id', 'owner_id', 'id'),
+        Index('ix_todos_owner_id_priority_id', 'owner_id', 'priority', 'id'),
+        Index('ix_todos_priority_id', 'priority', 'id'),
+        Index('ix_todos_owner_id_complete_priority', 'owner_id', 'complete', 'priority'),
+        Index(
+            'ix_todos_owner_id_open', 'owner_id', 'id',
+            postgresql_where=text('NOT complete'),
+            sqlite_where=text('complete = 0'),
+        ),
+        Index('ix_todos_owner_id_version', 'owner_id', 'version'),
+        # Ids are never reused, and shards can start theirs at an offset
+        # through sqlite_sequence (see backend/shards.py).
+        {'sqlite_autoincrement': True},
+    )
+
+class TodoCounts(Base):
+    """How many of an owner's todos share a (priority, complete).
+
+    Kept up by triggers on todos: see TODO_COUNTS_REMOVE_SQL and TODO_COUNTS_ADD_SQL.
+    """
+    __tablename__ = 'todo_counts'
+
+    owner_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    priority = Column(Integer, primary_key=True)
+    complete = Column(Boolean, primary_key=True)
+    count = Column(Integer, nullable=False, default=0, server_default='0')
+
+class TodoTombstones(Base):
+    """A deleted todo, kept so delta sync can tell clients to drop it.
+
+    Kept for TOMBSTONE_RETENTION_SECONDS (backend/routers/todos.py), then
+    pruned; the owner's tombstone_horizon records how far.
+    """
+    __tablename__ = 'todo_tombstones'
+
+    id = Column(Integer, primary_key=True)
+    todo_id = Column(TODO_ID, nullable=False)
+    owner_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    version = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), nullable=False, default=func.now(), server_default=func.now())
+
+    __table_args__ = (
+        Index('ix_todo_tombstones_owner_id_version', 'owner_id', 'version'),
+        Index('ix_todo_tombstones_deleted_at', 'deleted_at'),
+    )
+
+class RefreshTokens(Base):
+    """One refresh session: the hash of its current token; see backend/refresh_tokens.py."""
+    __tablename__ = 'refresh_tokens'
+
+    id = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    token_hash = Column(LargeBinary(32), nullable=False)
+    # Unix time; every rotation pushes it out again.
+    expires_at = Column(Integer, nullable=False)
+
+class Jobs(Base):
+    """A queued or finished background job; see backend/jobs.py."""
+    __tablename__ = 'jobs'
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    # Who may see the job's status. Not a foreign key: an account deletion
+    # job outlives its owner's row.
+    owner_id = Column(Integer, nullable=True, index=True)
+    payload = Column(Text, nullable=False, default='{}', server_default='{}')
+    status = Column(String, nullable=False, default='queued', server_default='queued')
+    attempts = Column(Integer, nullable=False, default=0, server_default='0')
+    max_attempts = Column(Integer, nullable=False)
+    progress = Column(Integer, nullable=False, default=0, server_default='0')
+    total = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+    # Unix times: when a queued job may next run, and when a running job's
+    # lease lapses and another worker may take it over.
+    run_after = Column(Float, nullable=False)
+    locked_until = Column(Float, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=func.now(), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=func.now(), onupdate=func.now(),
+                        server_default=func.now())
+
+    __table_args__ = (
+        Index('ix_jobs_status_run_after', 'status', 'run_after'),
+    )
+
+
+
+# ---- Full-text search over title and description ----
+# Postgres indexes a tsvector expression with GIN; queries must repeat the
+# expression verbatim for the planner to use the index. SQLite keeps an FTS5
+# external-content table in step with todos through triggers.
+SEARCH_VECTOR_SQL = "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, ''))"
+
+SQLITE_SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS todos_fts USING fts5("
+    "title, description, content='todos', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS todos_fts_insert AFTER INSERT ON todos BEGIN "
+    "INSERT INTO todos_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS todos_fts_delete AFTER DELETE ON todos BEGIN "
+    "INSERT INTO todos_fts(todos_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS todos_fts_update AFTER UPDATE OF title, description ON todos BEGIN "
+    "INSERT INTO todos_fts(todos_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO todos_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+)
+
+event.listen(Todos.__table__, 'after_create', DDL(
+    f'CREATE INDEX IF NOT EXISTS ix_todos_search ON todos USING gin ({SEARCH_VECTOR_SQL})'
+).execute_if(dialect='postgresql'))
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(Todos.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+event.listen(Todos.__table__, 'before_drop', DDL('DROP TABLE IF EXISTS todos_fts').execute_if(dialect='sqlite'))
+
+
+# ---- Maintained todo counts ----
+# Triggers move one todo between (owner, priority, complete) buckets on every
+# insert, delete and relevant update, so stats never scan todos and no write
+# path has to read old values first. The statements are valid in both
+# Postgres and SQLite; only the trigger wrappers differ.
+TODO_COUNTS_REMOVE_SQL = (
+    "UPDATE todo_counts SET count = count - 1 WHERE owner_id = old.owner_id "
+    "AND priority = coalesce(old.priority, 0) AND complete = coalesce(old.complete, false)"
+)
+TODO_COUNTS_ADD_SQL = (
+    "INSERT INTO todo_counts (owner_id, priority, complete, count) "
+    "SELECT new.owner_id, coalesce(new.priority, 0), coalesce(new.complete, false), 1 "
+    "WHERE new.owner_id IS NOT NULL "
+    "ON CONFLICT (owner_id, priority, complete) DO UPDATE SET count = todo_counts.count + 1"
+)
+
+POSTGRES_COUNTS_DDL = (
+    "CREATE OR REPLACE FUNCTION todo_counts_sync() RETURNS trigger AS $$ BEGIN "
+    f"IF TG_OP <> 'INSERT' THEN {TODO_COUNTS_REMOVE_SQL}; END IF; "
+    f"IF TG_OP <> 'DELETE' THEN {TODO_COUNTS_ADD_SQL}; END IF; "
+    "RETURN NULL; END $$ LANGUAGE plpgsql",
+    "CREATE OR REPLACE TRIGGER todo_counts_sync AFTER INSERT OR DELETE OR UPDATE OF owner_id, priority, complete "
+    "ON todos FOR EACH ROW EXECUTE FUNCTION todo_counts_sync()",
+)
+
+SQLITE_COUNTS_DDL = (
+    f"CREATE TRIGGER IF NOT EXISTS todo_counts_insert AFTER INSERT ON todos BEGIN {TODO_COUNTS_ADD_SQL}; END",
+    f"CREATE TRIGGER IF NOT EXISTS todo_counts_delete AFTER DELETE ON todos BEGIN {TODO_COUNTS_REMOVE_SQL}; END",
+    "CREATE TRIGGER IF NOT EXISTS todo_counts_update AFTER UPDATE OF owner_id, priority, complete ON todos BEGIN "
+    f"{TODO_COUNTS_REMOVE_SQL}; {TODO_COUNTS_ADD_SQL}; END",
+)
+
+for statement in POSTGRES_COUNTS_DDL:
+    event.listen(Todos.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+for statement in SQLITE_COUNTS_DDL:
+    event.listen(Todos.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
@@ -0,0 +1,97 @@
+"""
+Rotating refresh tokens.
+
+Access tokens stay short-lived; a refresh token trades for a new access token
+with an indexed lookup instead of an Argon2 verify. A token is
+`<session id>.<secret>`. The store keeps one row per session holding only the
+SHA-256 of the session's current secret, so it grows with signed-in devices,
+not with refreshes.
+
+Every refresh rotates the secret with a conditional UPDATE. Presenting a
+secret that is no longer current means it leaked or was replayed: the session
+is deleted, which also locks out whoever holds the newest token, and both
+sides have to log in again. Logout deletes the session; a password change or
+account deletion deletes all of the user's sessions.
+"""
+
+import hashlib
+import os
+import secrets
+import time
+from typing import Optional
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.metrics import Counter
+from backend.models import RefreshTokens
+
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv('REFRESH_TOKEN_EXPIRE_DAYS', '14'))
+REFRESH_TOKEN_EXPIRE_SECONDS = REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
+
+REFRESH_TOTAL = Counter('auth_refresh_total', 'Refresh token exchanges by outcome.', ('result',))
+
+
+def _digest(secret: str) -> bytes:
+    return hashlib.sha256(secret.encode()).digest()
+
+
+def _split(token: str):
+    session_id, _, secret = token.partition('.')
+    if not session_id or not secret:
+        return None, None
+    return session_id, secret
+
+
+async def issue(db: AsyncSession, user_id: int) -> str:
+    """Open a session for the user and return its first token. The caller commits."""
+    now = int(time.time())
+    # Sweep the user's lapsed sessions while we are writing anyway.
+    await db.execute(delete(RefreshTokens).where(RefreshTokens.user_id == user_id, RefreshTokens.expires_at <= now))
+    session_id = secrets.token_hex(16)
+    secret = secrets.token_urlsafe(32)
+    await db.execute(insert(RefreshTokens).values(
+        id=session_id, user_id=user_id, token_hash=_digest(secret),
+        expires_at=now + REFRESH_TOKEN_EXPIRE_SECONDS,
+    ))
+    return f'{session_id}.{secret}'
+
+
+async def rotate(db: AsyncSession, token: str) -> Optional[tuple]:
+    """Exchange a token for (user_id, new token), or None if it is not current. The caller commits."""
+    session_id, secret = _split(token)
+    if session_id is None:
+        REFRESH_TOTAL.inc('invalid')
+        return None
+    now = int(time.time())
+    new_secret = secrets.token_urlsafe(32)
+    # Only one of two concurrent refreshes with the same token can match here.
+    user_id = await db.scalar(
+        update(RefreshTokens)
+        .where(RefreshTokens.id == session_id, RefreshTokens.token_hash == _digest(secret),
+               RefreshTokens.expires_at > now)
+        .values(token_hash=_digest(new_secret), expires_at=now + REFRESH_TOKEN_EXPIRE_SECONDS)
+        .returning(RefreshTokens.user_id)
+    )
+    if user_id is not None:
+        REFRESH_TOTAL.inc('rotated')
+        return user_id, f'{session_id}.{new_secret}'
+    # The session exists but the secret is stale (or it expired): revoke it.
+    revoked = await db.execute(delete(RefreshTokens).where(RefreshTokens.id == session_id))
+    REFRESH_TOTAL.inc('revoked' if revoked.rowcount else 'invalid')
+    return None
+
+
+async def revoke(db: AsyncSession, token: str):
+    """End the token's session, if the token is current. The caller commits."""
+    session_id, secret = _split(token)
+    if session_id is not None:
+        await db.execute(delete(RefreshTokens).where(
+            RefreshTokens.id == session_id, RefreshTokens.token_hash == _digest(secret),
+        ))
+
+
+async def revoke_all(db: AsyncSession, user_id: int):
+    """End every session of the user. The caller commits."""
+    await db.execute(delete(RefreshTokens).where(RefreshTokens.user_id == user_id))
+
@@ -0,0 +1,165 @@
+"""
+Read-replica routing.
+
+Read-only endpoints on the main database take their session from `reads`
+(directly through `get_read_db`, or via the todo and admin routers for shard
+0, see backend/shards.py) instead of their router's `get_db`. With
+DATABASE_REPLICA_URLS set (comma-separated), those sessions go to the
+replicas in round-robin. Everything else, and every read
+when no replica is configured, stays on the primary engine in
+backend/database.py.
+
+A replica that fails to connect is skipped for REPLICA_RETRY_SECONDS and the
+read falls back to the primary. Replicas lag, so a user who has just written
+reads from the primary for READ_YOUR_WRITES_SECONDS. Every write calls
+note_write once it commits, which the worker that served it sees at once.
+Todo writes are also noted from the todo event stream (backend/events.py),
+keyed by the owner whose data changed, so the other workers pin that owner's
+reads too once the event reaches them.
+"""
+
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Annotated, Optional
+
+from fastapi import Depends
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from backend import database, events
+from backend.metrics import Counter
+from backend.routers.auth import get_current_user
+
+logger = logging.getLogger(__name__)
+
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+READ_YOUR_WRITES_SECONDS = float(os.getenv('READ_YOUR_WRITES_SECONDS', '5'))
+REPLICA_RETRY_SECONDS = float(os.getenv('REPLICA_RETRY_SECONDS', '10'))
+# Expired read-your-writes entries are swept once this many are tracked.
+MAX_TRACKED_WRITERS = 10_000
+
+READ_SESSIONS = Counter('db_read_sessions_total', 'Read-only sessions by where they were served.', ('target',))
+
+
+class Replica:
+    def __init__(self, name: str, sessionmaker, engine=None):
+        self.name = name
+        self.sessionmaker = sessionmaker
+        self.engine = engine
+        self.down_until = 0.0
+
+
+class ReadRouter:
+    """Chooses the session for a read: a healthy replica, or the primary."""
+
+    def __init__(self, primary, replicas=(), read_your_writes_seconds: float = READ_YOUR_WRITES_SECONDS,
+                 retry_seconds: float = REPLICA_RETRY_SECONDS, clock=time.monotonic):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self.retry_seconds = retry_seconds
+        self.clock = clock
+        self._next = 0
+        self._recent_writers = {}
+
+    def note_write(self, user_id: int):
+        """Keep the user's reads on the primary until replicas have caught up."""
+        if not self.replicas:
+            return
+        now = self.clock()
+        if len(self._recent_writers) >= MAX_TRACKED_WRITERS:
+            self._recent_writers = {k: v for k, v in self._recent_writers.items() if v > now}
+        self._recent_writers[user_id] = now + self.read_your_writes_seconds
+
+    def _wrote_recently(self, user_id: Optional[int]) -> bool:
+        deadline = self._recent_writers.get(user_id)
+        if deadline is None:
+            return False
+        if deadline > self.clock():
+            return True
+        del self._recent_writers[user_id]
+        return False
+
+    def choose(self, user_id: Optional[int] = None) -> Optional[Replica]:
+        """The next healthy replica in turn, or None to read from the primary."""
+        if not self.replicas or self._wrote_recently(user_id):
+            return None
+        now = self.clock()
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[self._next % len(self.replicas)]
+            self._next += 1
+            if replica.down_until <= now:
+                return replica
+        return None
+
+    def engines(self) -> list:
+        """The replicas' engines (the primary's is backend.database.engine)."""
+        return [replica.engine for replica in self.replicas if replica.engine is not None]
+
+    def mark_down(self, replica: Replica):
+        replica.down_until = self.clock() + self.retry_seconds
+        logger.warning('read replica %s is unavailable; reading from the primary for %.0fs',
+                       replica.name, self.retry_seconds)
+
+    def status(self) -> list:
+        now = self.clock()
+        return [{'name': r.name, 'up': r.down_until <= now} for r in self.replicas]
+
+    async def dispose(self):
+        for replica in self.replicas:
+            if replica.engine is not None:
+                await replica.engine.dispose()
+
+    @asynccontextmanager
+    async def session(self, user_id: Optional[int] = None):
+        replica = self.choose(user_id)
+        if replica is not None:
+            db = replica.sessionmaker()
+            try:
+                # Connect up front, so an unreachable replica falls back
+                # before the endpoint runs any query.
+                await db.connection()
+            except (exc.DBAPIError, OSError):
+                await db.close()
+                self.mark_down(replica)
+            else:
+                READ_SESSIONS.inc('replica')
+                async with db:
+                    yield db
+                return
+        READ_SESSIONS.inc('primary')
+        async with self.primary() as db:
+            yield db
+
+
+def build_read_router() -> ReadRouter:
+    replicas = []
+    for i, url in enumerate(DATABASE_REPLICA_URLS):
+        url = database.async_database_url(url)
+        engine = create_async_engine(url, **database.engine_options(url))
+        replicas.append(Replica(f'replica-{i}', async_sessionmaker(
+            bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False,
+        ), engine))
+    return ReadRouter(database.SessionLocal, replicas)
+
+
+reads = build_read_router()
+
+
+def note_write(user_id: int):
+    """Pin the user's reads to the primary; call it after committing a write."""
+    reads.note_write(user_id)
+
+
+# Other workers learn of todo writes from their events.
+events.hub.listeners.append(note_write)
+
+
+async def get_read_db(user: Annotated[dict, Depends(get_current_user)]):
+    async with reads.session(user.get('id')) as db:
+        yield db
+
+
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
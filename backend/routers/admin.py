@@ -1,11 +1,18 @@
-from typing import Annotated, Optional
-from fastapi import APIRouter, Depends, HTTPException, Path
-from sqlalchemy.orm import Session
-from sqlalchemy import select
+from typing import Annotated, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from sqlalchemy import select, update, delete
 from backend.models import Todos
-from backend.database import SessionLocal
+from backend import events, replicas, shards
+from backend.replicas import note_write
+from backend.serializers import TodoResponse, todo_list_response, todo_select
+from backend.stats import combine_system_stats, system_counts
+from backend.versions import record_deletes
+from backend.export import FORMAT_PATTERN, export_response, export_select
+from backend.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, SORT_PATTERN, filter_todos, merge_pages, page_of, paginate,
+)
 from starlette import status
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from backend.routers.auth import get_current_user
 
 router = APIRouter( 
@@ -24,22 +31,73 @@ class TodoUpdateRequest(BaseModel):
     priority: Optional[int] = Field(default=None, gt=0, lt=5)
     complete: Optional[bool] = None
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+    @field_validator('priority')
+    @classmethod
+    def priority_not_null(cls, v: Optional[int]) -> int:
+        # Leave it out to keep it; every todo has a priority (see Todos).
+        if v is None:
+            raise ValueError('priority cannot be null')
+        return v
 
-db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
-@router.get('/todo', status_code=status.HTTP_200_OK)
-async def read_all(db: db_dependency, user: user_dependency):
-    """Retrieve all todos in the system. Requires admin role."""
+# Admin endpoints see every owner, so they get a session on every shard
+# (backend/shards.py) and fan out.
+async def get_db():
+    async with shards.cluster.all_sessions() as dbs:
+        yield dbs
+
+async def get_read_db(user: user_dependency):
+    async with shards.cluster.all_sessions(replicas.reads.session(user.get('id'))) as dbs:
+        yield dbs
+
+db_dependency = Annotated[list, Depends(get_db)]
+read_db_dependency = Annotated[list, Depends(get_read_db)]
+
+async def _bump_owner_of(dbs, todo_id: int):
+    try:
+        return await shards.bump_owner_of(dbs, todo_id)
+    except shards.DuplicateTodoId:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail='Todo id is ambiguous across shards; nothing was changed')
+
+async def _rows(db, stmt) -> list:
+    return (await db.execute(stmt)).all()
+
+@router.get('/todo', status_code=status.HTTP_200_OK, response_model=List[TodoResponse])
+async def read_all(db: read_db_dependency, user: user_dependency,
+                   complete: Optional[bool] = None,
+                   priority: Optional[int] = Query(default=None, gt=0, lt=6),
+                   sort: str = Query(default='id', pattern=SORT_PATTERN),
+                   limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                   after: Optional[str] = None):
+    """Retrieve one page of todos across the system. Requires admin role.
+
+    The cursor for the next page, if any, is sent in the `X-Next-Cursor` header.
+    """
+    if user is None or user.get('role') != 'admin':
+        raise HTTPException(status_code=403, detail='Not authorised')
+    stmt = paginate(filter_todos(todo_select(), complete, priority), sort, after, limit)
+    pages = await shards.gather(db, lambda shard_db: _rows(shard_db, stmt))
+    rows, next_cursor = page_of(merge_pages(pages, sort, limit), sort, limit)
+    return todo_list_response(rows, {'X-Next-Cursor': next_cursor} if next_cursor else None)
+
+@router.get('/todo/export', status_code=status.HTTP_200_OK)
+async def export_all(db: db_dependency, user: user_dependency,
+                     format: str = Query(default='ndjson', pattern=FORMAT_PATTERN),
+                     complete: Optional[bool] = None,
+                     priority: Optional[int] = Query(default=None, gt=0, lt=6)):
+    """Stream every todo in the system as NDJSON or CSV. Requires admin role."""
     if user is None or user.get('role') != 'admin':
         raise HTTPException(status_code=403, detail='Not authorised')
-    return db.scalars(select(Todos)).all()
+    return export_response(db, filter_todos(export_select(), complete, priority), format, 'all-todos')
+
+@router.get('/stats', status_code=status.HTTP_200_OK)
+async def stats(db: db_dependency, user: user_dependency):
+    """Totals, completion rate and per-priority counts across the system. Requires admin role."""
+    if user is None or user.get('role') != 'admin':
+        raise HTTPException(status_code=403, detail='Not authorised')
+    return combine_system_stats(await shards.gather(db, system_counts))
 
 @router.delete('/todo/{todo_id}', status_code=status.HTTP_204_NO_CONTENT)
 async def delete_by_id(user: user_dependency, db: db_dependency, todo_id: int):
@@ -47,24 +105,46 @@ async def delete_by_id(user: user_dependency, db: db_dependency, todo_id: int):
     if user is None or user.get('role') != 'admin':
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Not authorised to perform this action')
 
-    todo_item = db.scalar(select(Todos).where(Todos.id == todo_id))
-    if not todo_item:
+    # Bump the owner's version before touching the todo, in the same lock
+    # order as the owner's own writes; the bump also finds the owner.
+    db, owner_id, version = await _bump_owner_of(db, todo_id)
+    if owner_id is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Todo item not found')
-
-    db.delete(todo_item)
-    db.commit()
+    result = await db.execute(
+        delete(Todos).where(Todos.id == todo_id, Todos.owner_id == owner_id)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        # Deleted by its owner since the bump.
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Todo item not found')
+    await record_deletes(db, owner_id, [todo_id], version)
+    await db.commit()
+    await events.publish(owner_id, 'deleted', [todo_id], version)
+    note_write(user.get('id'))
 
 @router.put('/todo/{todo_id}', status_code=status.HTTP_204_NO_CONTENT)
 async def update_by_id(user: user_dependency, db: db_dependency, todo_update_request: TodoUpdateRequest, todo_id: int = Path(gt=0)):
     """Update any todo by ID. Requires admin role."""
     if user is None or user.get('role') != 'admin':
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Not authorised to perform this action')
-    todo_model = db.scalar(select(Todos).where(Todos.id == todo_id))
-
-    if todo_model is None:
+    values = todo_update_request.model_dump(exclude_unset=True)
+    if not values:
+        # Nothing to write; only say whether the todo exists.
+        found = await shards.gather(db, lambda shard_db: shard_db.scalar(select(Todos.id).where(Todos.id == todo_id)))
+        if not any(found):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Item not found')
+        return
+    db, owner_id, version = await _bump_owner_of(db, todo_id)
+    if owner_id is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Item not found')
-
-    for k, v in todo_update_request.model_dump(exclude_unset=True).items():
-        setattr(todo_model, k, v)
-
-    db.commit()
+    result = await db.execute(
+        update(Todos).where(Todos.id == todo_id, Todos.owner_id == owner_id).values(**values, version=version)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Item not found')
+    await db.commit()
+    await events.publish(owner_id, 'updated', [todo_id], version)
+    note_write(user.get('id'))
@@ -1,27 +1,27 @@
+import logging
 import os
 from datetime import datetime, timedelta, timezone
-from typing import Annotated, Optional
-from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from typing import Annotated, Optional, Union
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, Response
 from pydantic import BaseModel, field_validator
 import re
 from backend.models import Users
-from argon2 import PasswordHasher
-from argon2.exceptions import VerifyMismatchError
+from backend.hashing import hash_password, needs_rehash, verify_password
 from backend.database import SessionLocal
-from sqlalchemy.orm import Session
-from sqlalchemy import select
+from backend.token_cache import token_cache
+from backend import refresh_tokens, shards
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
 from starlette import status
 from fastapi.security import OAuth2PasswordRequestForm
 from jose import jwt, JWTError
-from dotenv import load_dotenv
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix='/auth', 
     tags=['auth']
 )
-ph = PasswordHasher()
 
 
 # Environment variables - fail loudly if SECRET_KEY is missing
@@ -40,16 +40,14 @@ COOKIE_SAMESITE = os.getenv('COOKIE_SAMESITE', 'lax').lower()
 SECURE_COOKIE = (ENV == "prod") or (COOKIE_SAMESITE == "none")
 
 ACCESS_TOKEN_EXPIRE_MINUTES = 20
+REFRESH_COOKIE = 'refresh_token'
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
 
 
 class CreateUserRequest(BaseModel):
@@ -78,18 +76,49 @@ class CreateUserRequest(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
 
 
-def authenticate_user(username: str, plain_password: str, db: Session):
-    user = db.scalar(select(Users).where(Users.username == username))
-    if not user:
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+class CookieSession(BaseModel):
+    ok: bool
+
+
+async def authenticate_user(username: str, plain_password: str, db: AsyncSession):
+    """
+    The user if the password matches, else None.
+
+    A hash made with older Argon2 parameters is replaced in the session's
+    transaction; the caller commits.
+    """
+    user = await db.scalar(select(Users).where(Users.username == username))
+    # Deactivated accounts (pending deletion) cannot log in.
+    if not user or not user.is_active:
         return None
 
-    try:
-        ph.verify(user.hashed_password, plain_password)
-        return user
-    except VerifyMismatchError:
+    if not await verify_password(user.hashed_password, plain_password):
         return None
+    if needs_rehash(user.hashed_password):
+        await _upgrade_hash(db, user, plain_password)
+    return user
+
+
+async def _upgrade_hash(db: AsyncSession, user: Users, plain_password: str):
+    try:
+        new_hash = await hash_password(plain_password)
+    except HTTPException:
+        # The hashing pool is saturated; the next login tries again.
+        return
+    # Unless the password changed in the meantime.
+    await db.execute(
+        update(Users)
+        .where(Users.id == user.id, Users.hashed_password == user.hashed_password)
+        .values(hashed_password=new_hash)
+        .execution_options(synchronize_session=False)
+    )
 
 
 def create_access_token(username: str, user_id: int, role: str, expires_delta: timedelta):
@@ -98,11 +127,54 @@ def create_access_token(username: str, user_id: int, role: str, expires_delta: t
     return jwt.encode(encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
+def _access_token_for(user: Users) -> str:
+    return create_access_token(
+        username=user.username,
+        user_id=user.id,
+        role=user.role,
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+    )
+
+
+async def _open_session(db: AsyncSession, user: Users) -> str:
+    refresh_token = await refresh_tokens.issue(db, user.id)
+    await db.commit()
+    return refresh_token
+
+
+def _set_auth_cookies(response: Response, access_token: str, refresh_token: str):
+    # Set httpOnly cookies with strict deploy-compatible attributes
+    response.set_cookie(
+        key="access_token",
+        value=access_token,
+        httponly=True,
+        path="/",
+        samesite="none",
+        secure=True,
+        max_age=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    )
+    # The refresh token is only ever sent to /auth.
+    response.set_cookie(
+        key=REFRESH_COOKIE,
+        value=refresh_token,
+        httponly=True,
+        path="/auth",
+        samesite="none",
+        secure=True,
+        max_age=refresh_tokens.REFRESH_TOKEN_EXPIRE_SECONDS,
+    )
+
+
 def decode_token(token: str) -> dict:
     """
     Decode a JWT token and return user info.
     Raises HTTPException on failure.
+
+    Tokens that verified once are served from the token cache until they expire.
     """
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get('sub')
@@ -113,7 +185,9 @@ def decode_token(token: str) -> dict:
                 status_code=status.HTTP_401_UNAUTHORIZED, 
                 detail='Could not validate the user.'
             )
-        return {'username': username, 'id': user_id, 'role': user_role}
+        claims = {'username': username, 'id': user_id, 'role': user_role}
+        token_cache.put(token, claims, payload.get('exp', 0))
+        return claims
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, 
@@ -144,13 +218,18 @@ async def create_user(db: db_dependency, create_user_request: CreateUserRequest)
         username=create_user_request.username,
         first_name=create_user_request.first_name,
         last_name=create_user_request.last_name,
-        hashed_password=ph.hash(create_user_request.password),
+        hashed_password=await hash_password(create_user_request.password),
         role=create_user_request.role,
         phone_number=create_user_request.phone_number,
         is_active=True
     )
     db.add(user_model)
-    db.commit()
+    await db.commit()
+    try:
+        await shards.cluster.ensure_owner(user_model.id, user_model.username)
+    except Exception:
+        # The user exists; their first todo write creates the stub instead.
+        logger.warning('creating the shard stub for user %s failed', user_model.id, exc_info=True)
 
 
 @router.post('/token', response_model=Token)
@@ -158,8 +237,8 @@ async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     db: db_dependency
 ):
-    """Existing Bearer token login - unchanged for backwards compatibility."""
-    user = authenticate_user(form_data.username, form_data.password, db)
+    """Bearer token login; also returns a refresh token for /auth/refresh."""
+    user = await authenticate_user(form_data.username, form_data.password, db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -167,14 +246,10 @@ async def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    token = create_access_token(
-        username=user.username,
-        user_id=user.id,
-        role=user.role,
-        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
-    )
+    token = _access_token_for(user)
+    refresh_token = await _open_session(db, user)
 
-    return {"access_token": token, "token_type": "bearer"}
+    return {"access_token": token, "token_type": "bearer", "refresh_token": refresh_token}
 
 
 @router.post('/login')
@@ -184,36 +259,71 @@ async def login_with_cookie(
     db: db_dependency
 ):
     """Cookie-based login for browser clients."""
-    user = authenticate_user(form_data.username, form_data.password, db)
+    user = await authenticate_user(form_data.username, form_data.password, db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
         )
 
-    token = create_access_token(
-        username=user.username,
-        user_id=user.id,
-        role=user.role,
-        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
-    )
-
-    # Set httpOnly cookie with strict deploy-compatible attributes
-    response.set_cookie(
-        key="access_token",
-        value=token,
-        httponly=True,
-        path="/",
-        samesite="none",
-        secure=True,
-        max_age=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-    )
+    token = _access_token_for(user)
+    refresh_token = await _open_session(db, user)
+    _set_auth_cookies(response, token, refresh_token)
 
     return {"ok": True}
 
 
+def _presented_refresh_token(request: Request, body: Optional[RefreshRequest]) -> Optional[str]:
+    if body is not None:
+        return body.refresh_token
+    return request.cookies.get(REFRESH_COOKIE)
+
+
+@router.post('/refresh', response_model=Union[Token, CookieSession])
+async def refresh_access_token(
+    request: Request,
+    response: Response,
+    db: db_dependency,
+    body: Annotated[Optional[RefreshRequest], Body()] = None,
+):
+    """
+    Trade a refresh token for a new access token and a new refresh token.
+
+    Bearer clients send the token in the body; browser clients send the
+    cookie set by /auth/login and get both cookies renewed, but, as with
+    /auth/login, never the tokens themselves. The old refresh token stops
+    working, and presenting it again ends the session.
+    """
+    presented = _presented_refresh_token(request, body)
+    rotated = await refresh_tokens.rotate(db, presented) if presented else None
+    user = await db.get(Users, rotated[0]) if rotated else None
+    if user is None or not user.is_active:
+        await db.commit()
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    await db.commit()
+
+    token = _access_token_for(user)
+    if body is None:
+        _set_auth_cookies(response, token, rotated[1])
+        return {"ok": True}
+    return {"access_token": token, "token_type": "bearer", "refresh_token": rotated[1]}
+
+
 @router.post('/logout')
-async def logout(response: Response):
+async def logout(
+    request: Request,
+    response: Response,
+    db: db_dependency,
+    body: Annotated[Optional[RefreshRequest], Body()] = None,
+):
+    presented = _presented_refresh_token(request, body)
+    if presented:
+        await refresh_tokens.revoke(db, presented)
+        await db.commit()
     response.delete_cookie(
         key="access_token",
         path="/",
@@ -221,5 +331,12 @@ async def logout(response: Response):
         samesite="none",
         secure=True,
     )
+    response.delete_cookie(
+        key=REFRESH_COOKIE,
+        path="/auth",
+        httponly=True,
+        samesite="none",
+        secure=True,
+    )
     return {"ok": True}
 
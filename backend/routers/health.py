@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from starlette import status
+from backend import database, replicas, startup
+
+router = APIRouter(prefix='/health', tags=['health'])
+
+
+@router.get('/ready')
+async def ready():
+    """Report pool utilization, checkout wait, replica state and startup timings; 503 while the pool is saturated.
+
+    Reads pool counters only, so a saturated worker answers without waiting
+    for a connection.
+    """
+    health = {**database.pool_health(), 'replicas': replicas.reads.status(), 'startup': startup.timings}
+    code = status.HTTP_200_OK if health['ready'] else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(health, status_code=code)
@@ -0,0 +1,50 @@
+from datetime import datetime
+from typing import Annotated, Optional
+from fastapi import APIRouter, Depends, HTTPException, Path
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend import jobs
+from backend.models import Jobs
+from starlette import status
+from pydantic import BaseModel
+from backend.routers.auth import get_current_user
+
+router = APIRouter(
+    prefix='/jobs',
+    tags=['jobs']
+)
+
+
+class JobOutput(BaseModel):
+    id: int
+    kind: str
+    status: str
+    attempts: int
+    progress: int
+    total: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+# Jobs are read from the database the runner claims them from.
+async def get_db():
+    async with jobs.runner.sessionmaker() as db:
+        yield db
+
+
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+user_dependency = Annotated[dict, Depends(get_current_user)]
+
+
+@router.get('/{job_id}', status_code=status.HTTP_200_OK, response_model=JobOutput)
+async def read_job(db: db_dependency, user: user_dependency, job_id: int = Path(gt=0)):
+    """Report a background job's status and progress. Owners see their own jobs; admins see all."""
+    if user is None:
+        raise HTTPException(status_code=401, detail='Unauthorised')
+    job = await db.get(Jobs, job_id)
+    if job is None or (job.owner_id != user.get('id') and user.get('role') != 'admin'):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Job not found')
+    return job
@@ -0,0 +1,10 @@
+from fastapi import APIRouter, Response
+from backend.metrics import CONTENT_TYPE, REGISTRY
+
+router = APIRouter(tags=['metrics'])
+
+
+@router.get('/metrics', include_in_schema=False)
+async def metrics():
+    """Expose request, pool and hashing metrics in the Prometheus text format."""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
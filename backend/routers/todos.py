@@ -1,44 +1,271 @@
-from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, Path
-from sqlalchemy.orm import Session
-from sqlalchemy import select, and_
-from backend.models import Todos
-from backend.database import SessionLocal
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, and_, insert, update, delete
+from backend.models import Todos, TodoTombstones, Users
+from backend import events
+from backend import jobs, replicas, shards
+from backend.cache import todo_cache
+from backend.versions import (
+    bump_version, etag_matches, make_etag, not_modified, owner_version, prune_tombstones, query_digest,
+    record_deletes, sync_point,
+)
+from backend.export import FORMAT_PATTERN, export_response, export_select
+from backend.serializers import TodoResponse, dump_todos, todo_dicts, todo_list_response, todo_select
+from backend.stats import owner_stats
+from backend.search import DEFAULT_SEARCH_LIMIT, search_terms, search_todos
+from backend.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, SORT_PATTERN, filter_todos, page_of, paginate, sort_todos,
+)
 from starlette import status
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from .auth import get_current_user
 
 router = APIRouter()
 
+# Delta sync remembers deletes this long; a client that last synced earlier starts over.
+TOMBSTONE_RETENTION_SECONDS = float(os.getenv('TOMBSTONE_RETENTION_SECONDS', str(30 * 24 * 3600)))
+TOMBSTONE_PRUNE_SECONDS = float(os.getenv('TOMBSTONE_PRUNE_SECONDS', '3600'))
+TOMBSTONE_PRUNE_CHUNK_SIZE = int(os.getenv('TOMBSTONE_PRUNE_CHUNK_SIZE', '1000'))
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
-db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
+
+async def get_db(user: user_dependency):
+    """A session on the shard that homes the user's todos (see backend/shards.py)."""
+    async with shards.cluster.session(user.get('id')) as db:
+        yield db
+
+
+async def get_read_db(user: user_dependency):
+    """Like get_db for read-only endpoints; the main database's reads may go to its replicas."""
+    owner_id = user.get('id')
+    if shards.cluster.shard_for(owner_id) == 0:
+        async with replicas.reads.session(owner_id) as db:
+            yield db
+    else:
+        async with shards.cluster.session(owner_id) as db:
+            yield db
+
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
+
+
+async def bump_owner_version(db: AsyncSession, user: dict) -> int:
+    """bump_version for the user's todo write, creating their stub row on a shard that lacks it.
+
+    Only active owners can write: once delete_account has deactivated the
+    account (and its stub), the todos are the deletion job's alone.
+    """
+    owner_id = user.get('id')
+    version = await bump_version(db, owner_id, active_only=True)
+    if version is None and shards.cluster.shard_for(owner_id) != 0:
+        async with shards.cluster.sessionmakers[0]() as directory:
+            active = await directory.scalar(select(Users.id).where(Users.id == owner_id, Users.is_active))
+        if active is not None:
+            # Registration could not create the stub (see backend/shards.py).
+            await shards.add_stub(db, owner_id, user.get('username'))
+            version = await bump_version(db, owner_id, active_only=True)
+    if version is None:
+        # The account was deleted, or is being deleted.
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='User not found')
+    return version
+
 class TodoRequest(BaseModel):
     title:str = Field(min_length=3)
     description:str = Field(min_length=3, max_length=100)
     priority: int = Field(gt=0, lt=6)
     complete:bool = Field(default=False)
 
+MAX_BATCH_SIZE = 500
+TODO_FIELDS = tuple(TodoRequest.model_fields)
+
+class TodoOperation(BaseModel):
+    op: Literal['create', 'update', 'delete']
+    id: Optional[int] = Field(default=None, gt=0)
+    todo: Optional[TodoRequest] = None
+
+    @model_validator(mode='after')
+    def check_fields(self):
+        if self.op != 'create' and self.id is None:
+            raise ValueError(f'{self.op} requires an id')
+        if self.op != 'delete' and self.todo is None:
+            raise ValueError(f'{self.op} requires a todo')
+        return self
+
+class TodoBatchRequest(BaseModel):
+    operations: List[TodoOperation] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+async def _cached_todo_list(db: AsyncSession, owner_id: int, version: int) -> bytes:
+    """The owner's full todo list as JSON, served from the todo cache when it is current."""
+    payload = await todo_cache.get_list(owner_id, version)
+    if payload is None:
+        rows = (await db.execute(sort_todos(todo_select().where(Todos.owner_id == owner_id), 'id'))).all()
+        payload = dump_todos(rows)
+        await todo_cache.set_list(owner_id, version, payload)
+    return payload
+
+
+@router.get('/', status_code=status.HTTP_200_OK, response_model=List[TodoResponse])
+async def read_all(user: user_dependency, db: read_db_dependency, request: Request,
+                   complete: Optional[bool] = None,
+                   priority: Optional[int] = Query(default=None, gt=0, lt=6),
+                   sort: str = Query(default='id', pattern=SORT_PATTERN),
+                   limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+                   after: Optional[str] = None):
+    """Retrieve todos belonging to the authenticated user.
+
+    Without `limit` or `after` the whole (filtered) list is returned. Otherwise
+    one keyset page is returned and the cursor for the next page, if any, is
+    sent in the `X-Next-Cursor` header. A matching `If-None-Match` gets a 304.
+    """
+    owner_id = user.get('id')
+    version = await owner_version(db, owner_id)
+    etag = make_etag('todos', owner_id, version, query_digest(request))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    if limit is None and after is None and complete is None and priority is None and sort == 'id':
+        payload = await _cached_todo_list(db, owner_id, version)
+        return Response(content=payload, media_type='application/json', headers={'ETag': etag})
+
+    headers = {'ETag': etag}
+    stmt = filter_todos(todo_select().where(Todos.owner_id == owner_id), complete, priority)
+    if limit is None and after is None:
+        return todo_list_response((await db.execute(sort_todos(stmt, sort))).all(), headers)
+
+    limit = limit or DEFAULT_PAGE_SIZE
+    rows = (await db.execute(paginate(stmt, sort, after, limit))).all()
+    rows, next_cursor = page_of(rows, sort, limit)
+    if next_cursor:
+        headers['X-Next-Cursor'] = next_cursor
+    return todo_list_response(rows, headers)
 
-@router.get('/', status_code=status.HTTP_200_OK)
-async def read_all(user: user_dependency, db: db_dependency):
-    """Retrieve all todos belonging to the authenticated user."""
-    return db.scalars(select(Todos).where(Todos.owner_id == user.get('id'))).all()
+@router.get('/todo/export', status_code=status.HTTP_200_OK)
+async def export_todos(user: user_dependency, db: db_dependency,
+                       format: str = Query(default='ndjson', pattern=FORMAT_PATTERN),
+                       complete: Optional[bool] = None,
+                       priority: Optional[int] = Query(default=None, gt=0, lt=6)):
+    """Stream every todo belonging to the authenticated user as NDJSON or CSV."""
+    stmt = filter_todos(export_select().where(Todos.owner_id == user.get('id')), complete, priority)
+    return export_response(db, stmt, format, 'todos')
 
-@router.get('/todo/{todo_id}', status_code=status.HTTP_200_OK)
-async def todo_by_id(user: user_dependency, db: db_dependency, todo_id: int = Path(gt=0)):
+@router.get('/todo/changes', status_code=status.HTTP_200_OK)
+async def changes(user: user_dependency, db: db_dependency, request: Request, response: Response,
+                  since: Optional[int] = Query(default=None, ge=0)):
+    """Return the todos written and the ids deleted after version `since`.
+
+    Clients store the returned `version` and pass it as `since` next time.
+    Without `since`, with one newer than the server's, or with one from before
+    the tombstones kept (TOMBSTONE_RETENTION_SECONDS), `reset` is true and
+    `todos` is the whole list. Apply `deleted` before upserting `todos`.
+    """
+    owner_id = user.get('id')
+    version, horizon = await sync_point(db, owner_id)
+    etag = make_etag('changes', owner_id, version, query_digest(request))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers['ETag'] = etag
+
+    reset = since is None or since > version or since < horizon
+    if not reset and since == version:
+        return {'version': version, 'reset': False, 'todos': [], 'deleted': []}
+
+    stmt = todo_select().where(Todos.owner_id == owner_id)
+    if not reset:
+        stmt = stmt.where(Todos.version > since)
+    rows = (await db.execute(stmt.order_by(Todos.version, Todos.id))).all()
+    deleted = []
+    if not reset:
+        # Ids can be reused after a delete; a live row supersedes its tombstone.
+        live = {row.id for row in rows}
+        deleted = list(dict.fromkeys(
+            todo_id for todo_id in (await db.scalars(
+                select(TodoTombstones.todo_id)
+                .where(TodoTombstones.owner_id == owner_id, TodoTombstones.version > since)
+                .order_by(TodoTombstones.version)
+            )).all() if todo_id not in live
+        ))
+    return {'version': version, 'reset': reset, 'todos': todo_dicts(rows), 'deleted': deleted}
+
+@jobs.periodic('prune_tombstones', TOMBSTONE_PRUNE_SECONDS)
+async def prune_tombstones_job(job: jobs.JobContext):
+    """Drop the tombstones older than TOMBSTONE_RETENTION_SECONDS on every shard, a chunk per transaction.
+
+    Progress counts tombstones pruned.
+    """
+    before = datetime.now(timezone.utc) - timedelta(seconds=TOMBSTONE_RETENTION_SECONDS)
+    done = 0
+    async with shards.cluster.all_sessions() as dbs:
+        for db in dbs:
+            while True:
+                pruned = await prune_tombstones(db, before, TOMBSTONE_PRUNE_CHUNK_SIZE)
+                if not pruned:
+                    break
+                done += pruned
+                await job.progress(done)
+
+@router.get('/todo/stats', status_code=status.HTTP_200_OK)
+async def todo_stats(user: user_dependency, db: db_dependency, request: Request, response: Response):
+    """Totals, completion rate and per-priority counts for the authenticated user."""
+    owner_id = user.get('id')
+    etag = make_etag('stats', owner_id, await owner_version(db, owner_id))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers['ETag'] = etag
+    return await owner_stats(db, owner_id)
+
+@router.get('/todo/events', status_code=status.HTTP_200_OK)
+async def todo_events(user: user_dependency):
+    """Stream the authenticated user's todo changes as Server-Sent Events.
+
+    Each `todo` event names the change type, the todo ids and the new version;
+    fetch the rows with /todo/changes. An `overflow` event means the client fell
+    behind and should resync before reconnecting.
+    """
+    if not events.hub.has_room(user.get('id')):
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail='Too many event streams')
+    return StreamingResponse(events.hub.connect(user.get('id')), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@router.get('/todo/search', status_code=status.HTTP_200_OK, response_model=List[TodoResponse])
+async def search(user: user_dependency, db: db_dependency, request: Request,
+                 q: str = Query(min_length=1, max_length=200),
+                 complete: Optional[bool] = None,
+                 priority: Optional[int] = Query(default=None, gt=0, lt=6),
+                 limit: int = Query(default=DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_PAGE_SIZE)):
+    """Full-text search over the authenticated user's todo titles and descriptions.
+
+    Every word of `q` matches as a prefix and all must match; results are
+    ranked best first and combine with the `complete`/`priority` filters.
+    """
+    owner_id = user.get('id')
+    etag = make_etag('search', owner_id, await owner_version(db, owner_id), query_digest(request))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    terms = search_terms(q)
+    rows = []
+    if terms:
+        stmt = filter_todos(todo_select().where(Todos.owner_id == owner_id), complete, priority)
+        rows = (await db.execute(search_todos(stmt, db.bind.dialect.name, terms).limit(limit))).all()
+    return todo_list_response(rows, {'ETag': etag})
+
+@router.get('/todo/{todo_id}', status_code=status.HTTP_200_OK, response_model=TodoResponse)
+async def todo_by_id(user: user_dependency, db: read_db_dependency, request: Request, response: Response,
+                     todo_id: int = Path(gt=0)):
     """Retrieve a specific todo by ID for the authenticated user."""
     if user is None:
         raise HTTPException(status_code=401, detail='Not authenticated')
-    todo_item = db.scalar(select(Todos).where(and_(Todos.id == todo_id, Todos.owner_id == user.get('id'))))
+    etag = make_etag('todo', todo_id, await owner_version(db, user.get('id')))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers['ETag'] = etag
+    todo_item = await db.scalar(select(Todos).where(and_(Todos.id == todo_id, Todos.owner_id == user.get('id'))))
     if todo_item is not None:
         return todo_item
     raise HTTPException(status_code=404, detail='Todo not found')
@@ -48,31 +275,118 @@ async def create_todo(user: user_dependency, db: db_dependency, todo_request: To
     """Create a new todo for the authenticated user."""
     if user is None:
         raise HTTPException(status_code=401, detail='Not authenticated')
-    todo_model = Todos(**todo_request.model_dump(), owner_id=user.get('id'))
+    version = await bump_owner_version(db, user)
+    todo_model = Todos(**todo_request.model_dump(), owner_id=user.get('id'), version=version)
     db.add(todo_model)
-    db.commit()
+    await db.commit()
+    replicas.note_write(user.get('id'))
+    await events.publish(user.get('id'), 'created', [todo_model.id], version)
 
 @router.put('/todo/{todo_id}', status_code=status.HTTP_204_NO_CONTENT)
 async def update_todo(user: user_dependency, db: db_dependency, todo_request: TodoRequest, todo_id: int = Path(gt=0)):
     """Update an existing todo by ID for the authenticated user."""
     if user is None:
         raise HTTPException(status_code=401, detail='Not authenticated')
-    todo_model = db.scalar(select(Todos).where(and_(Todos.id == todo_id, Todos.owner_id == user.get('id'))))
-
-    if todo_model is None:
+    version = await bump_owner_version(db, user)
+    result = await db.execute(
+        update(Todos)
+        .where(and_(Todos.id == todo_id, Todos.owner_id == user.get('id')))
+        .values(**todo_request.model_dump(), version=version)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
         raise HTTPException(status_code=404, detail='Item not found')
-
-    for k, v in todo_request.model_dump().items():
-        setattr(todo_model, k, v)
-    db.commit()
+    await db.commit()
+    replicas.note_write(user.get('id'))
+    await events.publish(user.get('id'), 'updated', [todo_id], version)
 
 @router.delete('/todo/{todo_id}', status_code=status.HTTP_204_NO_CONTENT)
 async def todo_delete(user: user_dependency, db: db_dependency, todo_id: int = Path(gt=0)):
     """Delete a todo by ID for the authenticated user."""
     if user is None:
         raise HTTPException(status_code=403, detail='Not authorised to perform this action')
-    todo_model = db.scalar(select(Todos).where(and_(Todos.id == todo_id, Todos.owner_id == user.get('id'))))
-    if todo_model is None:
+    version = await bump_owner_version(db, user)
+    result = await db.execute(
+        delete(Todos)
+        .where(and_(Todos.id == todo_id, Todos.owner_id == user.get('id')))
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
         raise HTTPException(status_code=404, detail='Item not found')
-    db.delete(todo_model)
-    db.commit()
+    await record_deletes(db, user.get('id'), [todo_id], version)
+    await db.commit()
+    replicas.note_write(user.get('id'))
+    await events.publish(user.get('id'), 'deleted', [todo_id], version)
+
+@router.post('/todo/batch', status_code=status.HTTP_200_OK)
+async def batch_todos(user: user_dependency, db: db_dependency, batch: TodoBatchRequest):
+    """Apply a list of create/update/delete operations in one transaction.
+
+    Operations are judged in order, so an update after a delete of the same todo
+    is a 404. Each operation gets its own result; the statements are issued once
+    per kind, not once per item.
+    """
+    if user is None:
+        raise HTTPException(status_code=401, detail='Not authenticated')
+    owner_id = user.get('id')
+    operations = batch.operations
+
+    # Bump first, as every writer does: the owner's row stays locked until
+    # commit, so the todos read as owned here cannot be deleted under us.
+    version = await bump_owner_version(db, user)
+    targets = {o.id for o in operations if o.op != 'create'}
+    owned = set()
+    if targets:
+        owned = set((await db.scalars(
+            select(Todos.id).where(and_(Todos.owner_id == owner_id, Todos.id.in_(targets)))
+        )).all())
+
+    results, creates, updates, deletes = [], [], {}, set()
+    for index, operation in enumerate(operations):
+        result = {'index': index, 'op': operation.op, 'id': operation.id}
+        if operation.op == 'create':
+            creates.append(result)
+            result['status'] = status.HTTP_201_CREATED
+        elif operation.id not in owned:
+            result['status'] = status.HTTP_404_NOT_FOUND
+        elif operation.op == 'update':
+            updates[operation.id] = {'id': operation.id, **operation.todo.model_dump()}
+            result['status'] = status.HTTP_204_NO_CONTENT
+        else:
+            owned.discard(operation.id)
+            updates.pop(operation.id, None)
+            deletes.add(operation.id)
+            result['status'] = status.HTTP_204_NO_CONTENT
+        results.append(result)
+
+    if not (creates or updates or deletes):
+        # Nothing to write; give the version back.
+        await db.rollback()
+        return {'results': results}
+    if creates:
+        rows = [{**operations[r['index']].todo.model_dump(), 'owner_id': owner_id, 'version': version}
+                for r in creates]
+        # One multi-row INSERT. RETURNING order is not guaranteed, so new ids are
+        # matched back by content; identical todos are interchangeable.
+        inserted = await db.execute(
+            insert(Todos).values(rows).returning(Todos.id, *(getattr(Todos, f) for f in TODO_FIELDS))
+        )
+        ids_by_content = {}
+        for row in inserted:
+            ids_by_content.setdefault(tuple(row[1:]), []).append(row.id)
+        for result, row in zip(creates, rows):
+            result['id'] = ids_by_content[tuple(row[f] for f in TODO_FIELDS)].pop()
+    if updates:
+        await db.execute(update(Todos), [{**values, 'version': version} for values in updates.values()])
+    if deletes:
+        await db.execute(
+            delete(Todos).where(and_(Todos.owner_id == owner_id, Todos.id.in_(deletes)))
+        )
+        await record_deletes(db, owner_id, deletes, version)
+    await db.commit()
+    replicas.note_write(owner_id)
+    for kind, ids in (('created', [r['id'] for r in creates]), ('updated', list(updates)),
+                      ('deleted', sorted(deletes))):
+        if ids:
+            await events.publish(owner_id, kind, ids, version)
+    return {'results': results}
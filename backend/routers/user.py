@@ -1,22 +1,27 @@
+import os
 from typing import Annotated, Optional
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import select
-from backend.models import Users, Todos
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, func, update
+from backend.models import Jobs, Users, Todos, TodoCounts, TodoTombstones
 from backend.database import SessionLocal
+from backend.versions import bump_version, etag_matches, make_etag, not_modified, owner_version
 from starlette import status
 from pydantic import BaseModel, Field, field_validator
 import re
 from backend.routers.auth import get_current_user, create_access_token
-from argon2 import PasswordHasher
-from argon2.exceptions import VerifyMismatchError
+from backend.hashing import hash_password, verify_password
+from backend.refresh_tokens import revoke_all
+from backend.replicas import note_write, read_db_dependency
+from backend import jobs, shards
 
 router = APIRouter(
     prefix='/user', 
     tags=['user']
 )
 
-ph = PasswordHasher()
+# Todos and tombstones deleted per transaction by the account deletion job.
+ACCOUNT_DELETE_CHUNK_SIZE = int(os.getenv('ACCOUNT_DELETE_CHUNK_SIZE', '1000'))
 
 class UserOutput(BaseModel):
     id: int
@@ -54,22 +59,30 @@ class UserUpdateRequest(BaseModel):
     last_name:Optional[str] = None
     phone_number: Optional[str] = None
 
-def get_db():
-    db = SessionLocal()
-    try:
+class DeleteAccountResponse(BaseModel):
+    job_id: int
+    status_url: str
+
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
     
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
 @router.get('/get_user', status_code=status.HTTP_200_OK, response_model=UserOutput)
-async def get_user_info(db: db_dependency, user: user_dependency):
+async def get_user_info(db: read_db_dependency, user: user_dependency, request: Request, response: Response):
     """Retrieve the authenticated user's profile information."""
     if user is None:
         raise HTTPException(status_code=403, detail='User not authorised')
-    user_data = db.scalar(select(Users).where(Users.id == user.get('id')))
+    version = await owner_version(db, user.get('id'))
+    if version is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='User not found')
+    etag = make_etag('user', user.get('id'), version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers['ETag'] = etag
+    user_data = await db.scalar(select(Users).where(Users.id == user.get('id')))
     if user_data is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='User not found')
     return user_data
@@ -79,18 +92,20 @@ async def change_password(db: db_dependency, user: user_dependency, change_passw
     """Change the authenticated user's password."""
     if user is None:
         raise HTTPException(status_code=403, detail='User not authorised')
-    user_data = db.scalar(select(Users).where(Users.id == user.get('id')))
+    user_data = await db.scalar(select(Users).where(Users.id == user.get('id')))
     if user_data is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='User not found')
     if change_password_request.old_password == change_password_request.new_password:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='New password must be different from the old password')
-    try:
-        ph.verify(user_data.hashed_password, change_password_request.old_password)
-    except VerifyMismatchError:
+    if not await verify_password(user_data.hashed_password, change_password_request.old_password):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Your request is invalid')
-    new_hashed_password = ph.hash(change_password_request.new_password)
+    new_hashed_password = await hash_password(change_password_request.new_password)
     user_data.hashed_password = new_hashed_password
-    db.commit()
+    await bump_version(db, user_data.id)
+    # Signed-in devices have to log in again with the new password.
+    await revoke_all(db, user_data.id)
+    await db.commit()
+    note_write(user_data.id)
     
 
 @router.put('/update_user', status_code=status.HTTP_204_NO_CONTENT)
@@ -98,29 +113,98 @@ async def update_user_data(db: db_dependency, user_request: UserUpdateRequest, u
     """Update the authenticated user's profile information."""
     if user is None:
         raise HTTPException(status_code=401, detail='Unauthorised')
-    user_data = db.scalar(select(Users).where(Users.id == user.get('id')))
+    user_data = await db.scalar(select(Users).where(Users.id == user.get('id')))
     if user_data is None:
         raise HTTPException(status_code=401, detail='Unauthorised')
 
     for k, v in user_request.model_dump(exclude_unset=True).items():
         setattr(user_data, k, v)
-    db.commit()
+    await bump_version(db, user_data.id)
+    await db.commit()
+    note_write(user_data.id)
 
 
-@router.delete('/delete_account', status_code=status.HTTP_204_NO_CONTENT)
-async def delete_account(db: db_dependency, user: user_dependency):
-    """Permanently delete the authenticated user's account and all associated data."""
+@router.delete('/delete_account', status_code=status.HTTP_202_ACCEPTED, response_model=DeleteAccountResponse)
+async def delete_account(db: db_dependency, user: user_dependency, response: Response):
+    """Permanently delete the authenticated user's account and all associated data.
+
+    The account is deactivated and signed out everywhere at once; its data is
+    deleted by a background job, whose status the returned URL reports.
+    """
     if user is None:
         raise HTTPException(status_code=401, detail='Unauthorised')
     
     user_id = user.get('id')
-    user_data = db.scalar(select(Users).where(Users.id == user_id))
+    user_data = await db.scalar(select(Users).where(Users.id == user_id))
     if user_data is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='User not found')
-    
-    # Delete all todos associated with the user
-    db.query(Todos).filter(Todos.owner_id == user_id).delete()
-    
-    # Delete the user account
-    db.delete(user_data)
-    db.commit()
+
+    # Asking again while the deletion is under way returns the same job.
+    job_id = await db.scalar(select(Jobs.id).where(
+        Jobs.owner_id == user_id, Jobs.kind == 'delete_account', Jobs.status.in_(jobs.ACTIVE),
+    ))
+    if job_id is None:
+        job_id = await jobs.enqueue(db, 'delete_account', owner_id=user_id)
+    user_data.is_active = False
+    await bump_version(db, user_id)
+    await revoke_all(db, user_id)
+    await db.commit()
+    # The job deactivates the stub too, should this fail.
+    await _deactivate_stub(user_id)
+    jobs.runner.wake()
+    note_write(user_id)
+
+    status_url = f'/jobs/{job_id}'
+    response.headers['Location'] = status_url
+    return {'job_id': job_id, 'status_url': status_url}
+
+
+async def _deactivate_stub(owner_id: int):
+    """Deactivate the owner's stub row on their shard, so no todo write gets in (see bump_owner_version)."""
+    if shards.cluster.shard_for(owner_id) == 0:
+        return
+    async with shards.cluster.session(owner_id) as db:
+        await db.execute(update(Users).where(Users.id == owner_id).values(is_active=False))
+        await db.commit()
+
+
+async def _delete_in_chunks(db: AsyncSession, model, owner_id: int, job: jobs.JobContext,
+                            done: Optional[int] = None):
+    """Every chunk renews the job's lease; with `done`, the rows also count as progress."""
+    while True:
+        chunk = select(model.id).where(model.owner_id == owner_id).order_by(model.id).limit(ACCOUNT_DELETE_CHUNK_SIZE)
+        result = await db.execute(delete(model).where(model.id.in_(chunk.scalar_subquery())))
+        await db.commit()
+        if not result.rowcount:
+            return
+        if done is None:
+            await job.renew()
+        else:
+            done += result.rowcount
+            await job.progress(done)
+
+
+@jobs.handler('delete_account')
+async def delete_account_job(job: jobs.JobContext):
+    """Delete a deactivated account: its todos a chunk per transaction, then the rest.
+
+    Progress counts todos. A retry carries on from whatever is left.
+    """
+    user_id = job.owner_id
+    await _deactivate_stub(user_id)
+    async with shards.cluster.session(user_id) as todo_db:
+        remaining = await todo_db.scalar(select(func.count()).select_from(Todos).where(Todos.owner_id == user_id))
+        total = job.total if job.total is not None else remaining
+        await job.progress(total - remaining, total)
+        await _delete_in_chunks(todo_db, Todos, user_id, job, total - remaining)
+        await _delete_in_chunks(todo_db, TodoTombstones, user_id, job)
+        await todo_db.execute(delete(TodoCounts).where(TodoCounts.owner_id == user_id))
+        if shards.cluster.shard_for(user_id) != 0:
+            # The owner's stub row on their shard.
+            await todo_db.execute(delete(Users).where(Users.id == user_id))
+        await todo_db.commit()
+
+    async with shards.cluster.sessionmakers[0]() as db:
+        await revoke_all(db, user_id)
+        await db.execute(delete(Users).where(Users.id == user_id))
+        await db.commit()
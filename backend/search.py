@@ -0,0 +1,45 @@
+"""
+Ranked full-text search over an owner's todos.
+
+Matches title and description, every term as a prefix, all terms required.
+Postgres answers from the GIN index on SEARCH_VECTOR_SQL and ranks with
+ts_rank_cd; SQLite answers from the todos_fts FTS5 table and ranks with bm25.
+Both are plain filters on a select over Todos, so owner scoping and the
+listing filters compose with them.
+"""
+
+import re
+
+from fastapi import HTTPException
+from sqlalchemy import column, func, literal_column, table
+from starlette import status
+
+from backend.models import SEARCH_VECTOR_SQL, Todos
+
+DEFAULT_SEARCH_LIMIT = 50
+MAX_SEARCH_TERMS = 8
+
+_TERM = re.compile(r'\w+')
+_SEARCH_VECTOR = literal_column(SEARCH_VECTOR_SQL)
+_todos_fts = table('todos_fts', column('rowid'))
+
+
+def search_terms(query: str) -> list:
+    """The words of a user query, lowercased; punctuation and operators are dropped."""
+    return _TERM.findall(query.lower())[:MAX_SEARCH_TERMS]
+
+
+def search_todos(stmt, dialect: str, terms: list):
+    """Restrict a select over Todos to rows matching every term, best match first."""
+    if dialect == 'postgresql':
+        query = func.to_tsquery(literal_column("'english'"), ' & '.join(f'{t}:*' for t in terms))
+        return (stmt.where(_SEARCH_VECTOR.op('@@')(query))
+                .order_by(func.ts_rank_cd(_SEARCH_VECTOR, query).desc(), Todos.id))
+    if dialect == 'sqlite':
+        match = ' '.join(f'"{t}"*' for t in terms)
+        return (stmt.join(_todos_fts, _todos_fts.c.rowid == Todos.id)
+                .where(literal_column('todos_fts').op('MATCH')(match))
+                .order_by(func.bm25(literal_column('todos_fts')), Todos.id))
+    raise HTTPException(
+        status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=f'Full-text search is not supported on {dialect}',
+    )
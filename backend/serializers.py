@@ -0,0 +1,53 @@
+"""
+Todo response models and the fast list path.
+
+Single todos are returned through the TodoResponse model, which Pydantic
+validates from attributes in compiled code instead of FastAPI's reflective
+jsonable_encoder. Lists skip ORM instances entirely: they select the response
+columns as Core rows and orjson encodes those tuples straight to bytes.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import select
+
+from backend.models import Todos
+
+
+class TodoResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    title: Optional[str] = None
+    description: Optional[str] = None
+    priority: Optional[int] = None
+    complete: Optional[bool] = None
+    owner_id: Optional[int] = None
+    version: int = 0
+    updated_at: Optional[datetime] = None
+
+
+TODO_KEYS = tuple(TodoResponse.model_fields)
+TODO_COLUMNS = tuple(getattr(Todos, key) for key in TODO_KEYS)
+
+
+def todo_select():
+    """A select of the response columns; filter, sort and paginate it like select(Todos)."""
+    return select(*TODO_COLUMNS)
+
+
+def todo_dicts(rows) -> list:
+    """Core rows from todo_select() as plain dicts, for composite responses."""
+    return [dict(zip(TODO_KEYS, row)) for row in rows]
+
+
+def dump_todos(rows) -> bytes:
+    return orjson.dumps(todo_dicts(rows))
+
+
+def todo_list_response(rows, headers: Optional[dict] = None) -> Response:
+    return Response(content=dump_todos(rows), media_type='application/json', headers=headers)
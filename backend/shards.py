@@ -0,0 +1,255 @@
+"""
+Owner-sharded todo storage.
+
+Each owner's todos, tombstones and counts live on one shard, chosen by the
+ShardMap from the owner id. Shard 0 is the main database (DATABASE_URL). It
+also holds the directory: the full users rows that auth and the profile
+endpoints read. DATABASE_SHARD_URLS (comma-separated) adds shards 1..N-1.
+Their engines are built like the main one, from the DB_* settings in
+backend/database.py.
+
+A shard keeps a stub users row (id, username, version) for every owner it
+homes. Todo writes bump the stub's version in the shard transaction, exactly
+as they bump the real row on shard 0, so versions, ETags and delta sync work
+unchanged inside a shard.
+
+Todo ids must not collide across shards, because admin endpoints address
+todos by id alone. Shard k hands out 64-bit ids from k << SHARD_ID_BITS
+upwards. prepare_shard seeds the id sequence: create_schema runs it outside
+prod, and in prod `python -m backend.shards prepare` does, after the
+migrations (`check` reports without changing anything). Startup logs an
+error for a shard that was never prepared, and admin writes refuse an id
+found on more than one shard.
+
+The stub row is created at registration; if that fails, the owner's first
+todo write on the shard creates it (add_stub).
+
+Owners are spread by id modulo the shard count. SHARD_PINS ("owner:shard,...")
+places owners explicitly, e.g. a large tenant whose data was moved to a
+dedicated shard. Owners below SHARD_FROM_OWNER_ID stay on shard 0, so shards
+can be added to a database that already has users.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from backend import database, versions
+from backend.models import Users
+
+logger = logging.getLogger(__name__)
+
+DATABASE_SHARD_URLS = [url.strip() for url in os.getenv('DATABASE_SHARD_URLS', '').split(',') if url.strip()]
+SHARD_PINS = os.getenv('SHARD_PINS', '')
+SHARD_FROM_OWNER_ID = int(os.getenv('SHARD_FROM_OWNER_ID', '0'))
+SHARD_ID_BITS = 40
+
+
+def parse_pins(value: str) -> dict:
+    pins = {}
+    for item in value.split(','):
+        if item.strip():
+            owner_id, _, shard = item.partition(':')
+            pins[int(owner_id)] = int(shard)
+    return pins
+
+
+class ShardMap:
+    """Which shard homes an owner."""
+
+    def __init__(self, count: int, pins: Optional[dict] = None, from_owner_id: int = 0):
+        self.count = count
+        self.pins = pins or {}
+        self.from_owner_id = from_owner_id
+        for shard in self.pins.values():
+            if not 0 <= shard < count:
+                raise ValueError(f'SHARD_PINS names shard {shard}, but there are {count}')
+
+    def shard_for(self, owner_id: int) -> int:
+        if owner_id in self.pins:
+            return self.pins[owner_id]
+        if owner_id < self.from_owner_id:
+            return 0
+        return owner_id % self.count
+
+
+class ShardCluster:
+    """A sessionmaker per shard (index 0 is the main database) and the map between them."""
+
+    def __init__(self, sessionmakers, shard_map: Optional[ShardMap] = None, engines=()):
+        self.sessionmakers = list(sessionmakers)
+        self.map = shard_map or ShardMap(len(self.sessionmakers))
+        self.engines = list(engines)
+
+    def __len__(self):
+        return len(self.sessionmakers)
+
+    def shard_for(self, owner_id: int) -> int:
+        return self.map.shard_for(owner_id)
+
+    @asynccontextmanager
+    async def session(self, owner_id: int, main: Optional[AsyncSession] = None):
+        """A session on the owner's shard; `main` itself when that is shard 0 and one is open."""
+        index = self.shard_for(owner_id)
+        if index == 0 and main is not None:
+            yield main
+            return
+        async with self.sessionmakers[index]() as db:
+            yield db
+
+    @asynccontextmanager
+    async def all_sessions(self, main=None):
+        """One session per shard, in shard order; `main`, a session context, stands in for shard 0."""
+        async with AsyncExitStack() as stack:
+            contexts = [main if main is not None else self.sessionmakers[0]()]
+            contexts += [make() for make in self.sessionmakers[1:]]
+            yield [await stack.enter_async_context(context) for context in contexts]
+
+    async def ensure_owner(self, owner_id: int, username: str):
+        """Create the owner's stub row on their shard, if that is not shard 0."""
+        index = self.shard_for(owner_id)
+        if index == 0:
+            return
+        async with self.sessionmakers[index]() as db:
+            # merge() keeps this idempotent, and safe against a stub left by
+            # a registration whose main-database commit failed.
+            await db.merge(Users(id=owner_id, username=username, version=0))
+            await db.commit()
+
+    async def dispose(self):
+        for engine in self.engines:
+            await engine.dispose()
+
+
+async def gather(dbs, fn):
+    """Run `fn(db)` on every shard session concurrently; results in shard order."""
+    return await asyncio.gather(*(fn(db) for db in dbs))
+
+
+class DuplicateTodoId(Exception):
+    """A todo id exists on more than one shard: a shard's id sequence was never prepared."""
+
+
+async def bump_owner_of(dbs, todo_id: int):
+    """(shard session, owner id, version) after bumping the todo's owner on its shard; (None, None, None) if absent.
+
+    Every shard is asked at once; only the one holding the todo should match.
+    Raises DuplicateTodoId otherwise, before anything is committed.
+    """
+    found = await gather(dbs, lambda db: versions.bump_owner_of(db, todo_id))
+    matches = [(db, *bumped) for db, bumped in zip(dbs, found) if bumped is not None]
+    if len(matches) > 1:
+        logger.error('todo id %s exists on %d shards; run `python -m backend.shards prepare`', todo_id, len(matches))
+        raise DuplicateTodoId(todo_id)
+    return matches[0] if matches else (None, None, None)
+
+
+async def add_stub(db: AsyncSession, owner_id: int, username: str):
+    """Insert the owner's stub row in the session's transaction, unless it exists."""
+    if db.bind.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    await db.execute(insert(Users).values(id=owner_id, username=username, version=0).on_conflict_do_nothing())
+
+
+async def prepare_shard(conn, index: int):
+    """Start shard `index`'s todo ids at index << SHARD_ID_BITS (no-op for shard 0)."""
+    if index == 0:
+        return
+    base = index << SHARD_ID_BITS
+    if conn.dialect.name == 'postgresql':
+        await conn.execute(text(
+            "SELECT setval(pg_get_serial_sequence('todos', 'id'), "
+            "GREATEST(:base, (SELECT coalesce(max(id), 0) FROM todos)))"
+        ), {'base': base})
+    elif conn.dialect.name == 'sqlite':
+        # Todos is declared with sqlite_autoincrement, so the next id is
+        # one past the todos row in sqlite_sequence.
+        await conn.execute(text("UPDATE sqlite_sequence SET seq = max(seq, :base) WHERE name = 'todos'"), {'base': base})
+        await conn.execute(text(
+            "INSERT INTO sqlite_sequence (name, seq) SELECT 'todos', :base "
+            "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'todos')"
+        ), {'base': base})
+
+
+async def next_todo_id(conn) -> int:
+    """Where the shard's todo id sequence stands (0 if it never moved)."""
+    if conn.dialect.name == 'postgresql':
+        return await conn.scalar(text(
+            "SELECT coalesce(pg_sequence_last_value(pg_get_serial_sequence('todos', 'id')::regclass), 0)"
+        ))
+    return await conn.scalar(text("SELECT coalesce(max(seq), 0) FROM sqlite_sequence WHERE name = 'todos'"))
+
+
+async def unprepared_shards(engines) -> list:
+    """Indexes of the shards (engines 1..N) whose id sequence is below their range."""
+    unprepared = []
+    for index, engine in enumerate(engines, start=1):
+        async with engine.connect() as conn:
+            if await next_todo_id(conn) < index << SHARD_ID_BITS:
+                unprepared.append(index)
+    return unprepared
+
+
+async def check_shards():
+    """Log an error for every configured shard whose ids could collide with another's."""
+    unprepared = await unprepared_shards(cluster.engines)
+    if unprepared:
+        logger.error('shards %s have unseeded todo ids; run `python -m backend.shards prepare`', unprepared)
+    return unprepared
+
+
+async def prepare_shards(engines):
+    for index, engine in enumerate(engines, start=1):
+        async with engine.begin() as conn:
+            await prepare_shard(conn, index)
+
+
+def build_cluster() -> ShardCluster:
+    sessionmakers, engines = [database.SessionLocal], []
+    for url in DATABASE_SHARD_URLS:
+        url = database.async_database_url(url)
+        engine = create_async_engine(url, **database.engine_options(url))
+        engines.append(engine)
+        sessionmakers.append(async_sessionmaker(
+            bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False,
+        ))
+    shard_map = ShardMap(len(sessionmakers), parse_pins(SHARD_PINS), SHARD_FROM_OWNER_ID)
+    return ShardCluster(sessionmakers, shard_map, engines)
+
+
+cluster = build_cluster()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Seed or check the todo id ranges of DATABASE_SHARD_URLS.')
+    parser.add_argument('command', choices=('prepare', 'check'),
+                        help='prepare: seed every shard (idempotent); check: list unseeded shards')
+    args = parser.parse_args(argv)
+
+    async def run():
+        try:
+            if args.command == 'prepare':
+                await prepare_shards(cluster.engines)
+            return await unprepared_shards(cluster.engines)
+        finally:
+            await cluster.dispose()
+
+    unprepared = asyncio.run(run())
+    if unprepared:
+        print(f'unseeded shards: {unprepared}', file=sys.stderr)
+        return 1
+    print(f'{len(cluster.engines)} shard(s) seeded')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+Opt-in per-request SQL profiling.
+
+With SQL_PROFILE=1 the cursor events of every engine the app queries (the
+primary, its read replicas and the todo shards) time every statement and
+attribute it to the request being served (through a context variable set by
+SQLProfilerMiddleware). Each response gets a `Server-Timing: db;...` header,
+statements slower than SQL_SLOW_QUERY_MS are logged with their normalized SQL,
+and a request that runs the same statement shape SQL_REPEAT_THRESHOLD times
+or more is logged as a likely N+1.
+
+`record_queries` captures statements on engines regardless of request
+context; the tests use it to pin an exact query budget per endpoint.
+"""
+
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+SQL_PROFILE = os.getenv('SQL_PROFILE', '0') == '1'
+SQL_SLOW_QUERY_MS = float(os.getenv('SQL_SLOW_QUERY_MS', '100'))
+SQL_REPEAT_THRESHOLD = int(os.getenv('SQL_REPEAT_THRESHOLD', '5'))
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'\?|%s|%\(\w+\)s|\$\d+|:\w+')
+_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=1024)
+def normalize(sql: str) -> str:
+    """Reduce a statement to its shape: literals and placeholders become `?`, IN lists collapse."""
+    shape = _STRING.sub('?', sql)
+    shape = _PLACEHOLDER.sub('?', shape)
+    shape = _NUMBER.sub('?', shape)
+    shape = _LIST.sub('(?...)', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+
+class QueryProfile:
+    """The statements one request (or one recorded block) executed."""
+
+    def __init__(self, label: str = ''):
+        self.label = label
+        self.statements = []
+
+    def record(self, statement: str, seconds: float):
+        self.statements.append((statement, seconds))
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(seconds for _, seconds in self.statements)
+
+    def repeated(self, threshold: int = SQL_REPEAT_THRESHOLD) -> dict:
+        """Statement shapes run at least `threshold` times."""
+        shapes = Counter(normalize(statement) for statement, _ in self.statements)
+        return {shape: n for shape, n in shapes.items() if n >= threshold}
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.total_seconds * 1000:.2f};desc="{self.count} queries"'
+
+    def report(self) -> str:
+        lines = [f'{self.count} queries, {self.total_seconds * 1000:.2f} ms']
+        lines.extend(f'  {seconds * 1000:8.2f} ms  {normalize(statement)}' for statement, seconds in self.statements)
+        return '\n'.join(lines)
+
+
+_current: ContextVar[Optional[QueryProfile]] = ContextVar('sql_profile', default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('sql_profiler_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['sql_profiler_started'].pop()
+    profile = _current.get()
+    if profile is not None:
+        profile.record(statement, elapsed)
+    if elapsed * 1000 >= SQL_SLOW_QUERY_MS:
+        logger.warning('slow query %.1f ms%s: %s', elapsed * 1000,
+                       f' in {profile.label}' if profile is not None else '', normalize(statement))
+
+
+def install(engine):
+    """Time every statement on `engine` (an Engine or AsyncEngine)."""
+    sync_engine = getattr(engine, 'sync_engine', engine)
+    if not event.contains(sync_engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(sync_engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(sync_engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+@contextmanager
+def record_queries(*engines):
+    """Collect every statement the engines run inside the block, from any task or thread."""
+    sync_engines = [getattr(engine, 'sync_engine', engine) for engine in engines]
+    profile = QueryProfile()
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        profile.record(statement, 0.0)
+
+    for sync_engine in sync_engines:
+        event.listen(sync_engine, 'after_cursor_execute', after)
+    try:
+        yield profile
+    finally:
+        for sync_engine in sync_engines:
+            event.remove(sync_engine, 'after_cursor_execute', after)
+
+
+class SQLProfilerMiddleware:
+    """Pure ASGI middleware attributing statements to the request that ran them."""
+
+    def __init__(self, app, repeat_threshold: int = SQL_REPEAT_THRESHOLD):
+        self.app = app
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        profile = QueryProfile(f"{scope['method']} {scope['path']}")
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                headers = list(message.get('headers', []))
+                headers.append((b'server-timing', profile.server_timing().encode()))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        token = _current.set(profile)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            for shape, n in profile.repeated(self.repeat_threshold).items():
+                logger.warning('possible N+1 in %s: %d x %s', profile.label, n, shape)
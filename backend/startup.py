@@ -0,0 +1,98 @@
+"""
+Application startup and shutdown.
+
+Importing the app does no I/O: the engine connects lazily and nothing runs
+until the lifespan starts. The lifespan creates the schema only outside prod
+(Alembic owns it there), then warms the connection pool and the Argon2
+threads concurrently so the first requests do not pay for either. Warming is
+best effort: a database that is down at boot is logged, not fatal, and the
+worker starts serving health checks and metrics straight away. The
+background job workers (backend/jobs.py) start last and stop first.
+
+How long each phase took is kept in `timings` (reported by /health/ready)
+and exported as app_startup_seconds.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+from backend import database, events, hashing, jobs, models, replicas, shards
+from backend.metrics import Gauge
+
+logger = logging.getLogger(__name__)
+
+ENV = os.getenv('ENV', 'dev')
+DB_CREATE_SCHEMA = os.getenv('DB_CREATE_SCHEMA', '0' if ENV == 'prod' else '1') == '1'
+# Connections opened at boot; defaults to the steady-state pool size.
+STARTUP_WARM_CONNECTIONS = int(os.getenv(
+    'STARTUP_WARM_CONNECTIONS', '0' if database.DB_PGBOUNCER else str(database.DB_POOL_SIZE),
+))
+STARTUP_WARM_TIMEOUT = float(os.getenv('STARTUP_WARM_TIMEOUT', '10'))
+
+STARTUP_SECONDS = Gauge('app_startup_seconds', 'Duration of each startup phase.', ('phase',))
+
+timings = {}
+
+
+async def _timed(phase: str, coro):
+    started = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        elapsed = time.perf_counter() - started
+        timings[phase] = round(elapsed * 1000, 1)
+        STARTUP_SECONDS.set(elapsed, phase)
+
+
+async def create_schema():
+    for index, engine in enumerate([database.engine, *shards.cluster.engines]):
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+            await shards.prepare_shard(conn, index)
+
+
+async def _warm(phase: str, coro):
+    try:
+        await _timed(phase, asyncio.wait_for(coro, STARTUP_WARM_TIMEOUT))
+    except Exception:
+        logger.warning('startup warm-up of %s failed; continuing cold', phase, exc_info=True)
+
+
+async def startup():
+    timings.clear()
+    started = time.perf_counter()
+    if DB_CREATE_SCHEMA:
+        await _timed('schema', create_schema())
+    phases = [
+        _warm('pool', database.warm_pool(STARTUP_WARM_CONNECTIONS)),
+        _warm('hasher', hashing.warm_up()),
+        _timed('broker', events.broker.start(events.hub)),
+    ]
+    if not DB_CREATE_SCHEMA and shards.cluster.engines:
+        # Migrations own the shards here; make sure their ids were seeded.
+        phases.append(_warm('shards', shards.check_shards()))
+    await asyncio.gather(*phases)
+    await jobs.runner.start()
+    elapsed = time.perf_counter() - started
+    timings['total'] = round(elapsed * 1000, 1)
+    STARTUP_SECONDS.set(elapsed, 'total')
+    logger.info('startup finished in %.1f ms: %s', elapsed * 1000, timings)
+
+
+async def shutdown():
+    await jobs.runner.stop()
+    await events.broker.stop()
+    await database.engine.dispose()
+    await replicas.reads.dispose()
+    await shards.cluster.dispose()
+    await asyncio.to_thread(hashing.shutdown)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await startup()
+    yield
+    await shutdown()
@@ -0,0 +1,64 @@
+"""
+Todo statistics from the maintained counts.
+
+todo_counts holds at most one row per (owner, priority, complete), kept in
+step with todos by triggers (see backend/models.py). An owner's stats are a
+primary key range read of a handful of rows, and the system-wide stats
+aggregate those rows, never the todos themselves.
+"""
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.models import TodoCounts
+
+
+def summarize(rows) -> dict:
+    """Totals, completion rate and per-priority counts from (priority, complete, count) rows."""
+    by_priority = {}
+    for priority, complete, count in rows:
+        if count <= 0:
+            continue
+        bucket = by_priority.setdefault(priority, {'priority': priority, 'total': 0, 'completed': 0})
+        bucket['total'] += count
+        if complete:
+            bucket['completed'] += count
+    total = sum(b['total'] for b in by_priority.values())
+    completed = sum(b['completed'] for b in by_priority.values())
+    return {
+        'total': total,
+        'completed': completed,
+        'open': total - completed,
+        'completion_rate': round(completed / total, 4) if total else 0.0,
+        'by_priority': [by_priority[p] for p in sorted(by_priority)],
+    }
+
+
+async def owner_stats(db: AsyncSession, owner_id: int) -> dict:
+    rows = await db.execute(
+        select(TodoCounts.priority, TodoCounts.complete, TodoCounts.count).where(TodoCounts.owner_id == owner_id)
+    )
+    return summarize(rows.all())
+
+
+async def system_counts(db: AsyncSession) -> tuple:
+    """(per-(priority, complete) totals, owners with todos) for one database."""
+    rows = await db.execute(
+        select(TodoCounts.priority, TodoCounts.complete, func.sum(TodoCounts.count))
+        .group_by(TodoCounts.priority, TodoCounts.complete)
+    )
+    owners = await db.scalar(
+        select(func.count(func.distinct(TodoCounts.owner_id))).where(TodoCounts.count > 0)
+    )
+    return rows.all(), owners
+
+
+def combine_system_stats(parts) -> dict:
+    """System stats from the system_counts of every shard; an owner lives on one shard only."""
+    stats = summarize(row for rows, _ in parts for row in rows)
+    stats['owners'] = sum(owners for _, owners in parts)
+    return stats
+
+
+async def system_stats(db: AsyncSession) -> dict:
+    return combine_system_stats([await system_counts(db)])
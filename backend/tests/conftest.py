@@ -5,25 +5,57 @@ This module provides shared fixtures and configuration for all backend tests,
 including database setup, test client, and authentication helpers.
 """
 
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 
+from backend.cache import MemoryStore, todo_cache
 from backend.database import Base
 from backend.main import app
-from backend.routers import auth, todos, user, admin
+from backend.sql_profiler import record_queries
+from backend import jobs, replicas, shards
+from backend.routers import auth, user
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+# The app talks to the database through aiosqlite while the tests inspect it
+# with a plain sync session, so both share one temporary SQLite file.
+SQLALCHEMY_DATABASE_PATH = os.path.join(tempfile.mkdtemp(), "test.db")
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{SQLALCHEMY_DATABASE_PATH}"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
+    poolclass=NullPool,
+)
+
+async_engine = create_async_engine(
+    f"sqlite+aiosqlite:///{SQLALCHEMY_DATABASE_PATH}",
+    poolclass=NullPool,
+)
+
+# Job workers poll in the background; their own engine keeps those queries
+# out of query_budget counts.
+jobs_engine = create_async_engine(
+    f"sqlite+aiosqlite:///{SQLALCHEMY_DATABASE_PATH}",
+    poolclass=NullPool,
 )
 
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+TestingJobsSessionLocal = async_sessionmaker(
+    bind=jobs_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 
 
 @pytest.fixture(scope="function")
@@ -39,20 +71,83 @@ def db_session():
 
 @pytest.fixture(scope="function")
 def client(db_session):
-    def override_get_db():
-        yield db_session
+    async def override_get_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
 
     app.dependency_overrides[auth.get_db] = override_get_db
-    app.dependency_overrides[todos.get_db] = override_get_db
     app.dependency_overrides[user.get_db] = override_get_db
-    app.dependency_overrides[admin.get_db] = override_get_db
+    # Each test starts from an empty database, so it also starts from an empty cache.
+    todo_cache.store = MemoryStore()
+    todo_cache.metrics.reset()
+    # Todo and admin sessions come from the shard cluster and reads from the
+    # replica router: both get the test database alone. test_shards and
+    # test_replicas add shards and replicas.
+    primary_shards, primary_reads, primary_runner = shards.cluster, replicas.reads, jobs.runner
+    shards.cluster = shards.ShardCluster([TestingAsyncSessionLocal])
+    replicas.reads = replicas.ReadRouter(TestingAsyncSessionLocal)
+    jobs.runner = jobs.JobRunner(TestingJobsSessionLocal, poll_seconds=0.05, retry_seconds=0)
 
     with TestClient(app) as test_client:
         yield test_client
 
+    shards.cluster, replicas.reads, jobs.runner = primary_shards, primary_reads, primary_runner
     app.dependency_overrides.clear()
 
 
+@pytest.fixture
+def query_budget():
+    """Assert that a block issues exactly `expected` SQL statements through the app, on any of its databases."""
+
+    @contextmanager
+    def budget(expected):
+        with record_queries(async_engine, *replicas.reads.engines(), *shards.cluster.engines) as profile:
+            yield profile
+        assert profile.count == expected, profile.report()
+
+    return budget
+
+
+@pytest.fixture
+def wait_for_job(client):
+    """Poll GET /jobs/{id} until the job has finished; returns its final status."""
+
+    def wait(headers, job_id, timeout=10):
+        deadline = time.monotonic() + timeout
+        while True:
+            response = client.get(f"/jobs/{job_id}", headers=headers)
+            assert response.status_code == 200, response.text
+            job = response.json()
+            if job["status"] not in ("queued", "running"):
+                return job
+            assert time.monotonic() < deadline, job
+            time.sleep(0.02)
+
+    return wait
+
+
+@pytest.fixture
+def hold_jobs(monkeypatch):
+    """Keep jobs of a kind from running until the returned event is set (at the latest, at teardown)."""
+    gates = []
+
+    def hold(kind):
+        gate = threading.Event()
+        run = jobs.HANDLERS[kind]
+
+        async def held(job):
+            await asyncio.to_thread(gate.wait, 10)
+            await run(job)
+
+        monkeypatch.setitem(jobs.HANDLERS, kind, held)
+        gates.append(gate)
+        return gate
+
+    yield hold
+    for gate in gates:
+        gate.set()
+
+
 @pytest.fixture
 def test_user_data():
     return {
@@ -81,3 +176,39 @@ def authenticated_client(client, test_user_data):
     )
     assert resp.status_code == 200, resp.text
     return client
+
+
+def _bearer_headers(client, user_data):
+    client.post("/auth/", json=user_data)
+    response = client.post(
+        "/auth/token",
+        data={
+            "username": user_data["username"],
+            "password": user_data["password"],
+        },
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def auth_headers(client, test_user_data):
+    """Get authentication headers for a test user."""
+    return _bearer_headers(client, test_user_data)
+
+
+@pytest.fixture
+def admin_headers(client):
+    """Get authentication headers for an admin user."""
+    return _bearer_headers(
+        client,
+        {
+            "username": "adminuser",
+            "email": "admin@example.com",
+            "first_name": "Admin",
+            "last_name": "User",
+            "role": "admin",
+            "password": "AdminPassword123!",
+        },
+    )
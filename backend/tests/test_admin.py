@@ -0,0 +1,78 @@
+"""
+Admin endpoint tests.
+
+Tests for the admin-only todo update and delete endpoints.
+"""
+
+from fastapi import status
+
+
+def _seed_todo(db_session, title="Admin target"):
+    from backend.models import Todos, Users
+
+    owner = db_session.query(Users).filter(Users.username == "testuser").first()
+    todo = Todos(title=title, description="Seeded", priority=2, complete=False, owner_id=owner.id)
+    db_session.add(todo)
+    db_session.commit()
+    return todo.id
+
+
+def _fetch_todo(db_session, todo_id):
+    from backend.models import Todos
+
+    db_session.expire_all()
+    return db_session.query(Todos).filter(Todos.id == todo_id).first()
+
+
+class TestAdminEndpoints:
+    """Test suite for admin endpoints."""
+
+    def test_partial_update(self, client, db_session, auth_headers, admin_headers):
+        """Test admins can update only some fields of any user's todo."""
+        todo_id = _seed_todo(db_session)
+
+        response = client.put(f"/admin/todo/{todo_id}", json={"complete": True}, headers=admin_headers)
+
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        todo = _fetch_todo(db_session, todo_id)
+        assert todo.complete is True
+        assert todo.title == "Admin target"
+
+    def test_update_cannot_clear_priority(self, client, db_session, auth_headers, admin_headers):
+        """Test an explicit null priority is rejected rather than written."""
+        todo_id = _seed_todo(db_session)
+
+        response = client.put(f"/admin/todo/{todo_id}", json={"priority": None}, headers=admin_headers)
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert _fetch_todo(db_session, todo_id).priority == 2
+
+    def test_empty_update_still_checks_existence(self, client, db_session, auth_headers, admin_headers):
+        """Test an update with no fields is a no-op for existing todos and a 404 otherwise."""
+        todo_id = _seed_todo(db_session)
+
+        assert client.put(f"/admin/todo/{todo_id}", json={}, headers=admin_headers).status_code == status.HTTP_204_NO_CONTENT
+        assert client.put("/admin/todo/99999", json={}, headers=admin_headers).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_update_nonexistent_todo(self, client, admin_headers):
+        """Test updating a missing todo returns 404."""
+        response = client.put("/admin/todo/99999", json={"title": "Nobody"}, headers=admin_headers)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_delete(self, client, db_session, auth_headers, admin_headers):
+        """Test admins can delete any user's todo, and a second delete is a 404."""
+        todo_id = _seed_todo(db_session)
+
+        response = client.delete(f"/admin/todo/{todo_id}", headers=admin_headers)
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert _fetch_todo(db_session, todo_id) is None
+
+        response = client.delete(f"/admin/todo/{todo_id}", headers=admin_headers)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_writes_require_admin(self, client, db_session, auth_headers):
+        """Test non-admin users cannot use the admin write endpoints."""
+        todo_id = _seed_todo(db_session)
+
+        assert client.delete(f"/admin/todo/{todo_id}", headers=auth_headers).status_code == status.HTTP_403_FORBIDDEN
+        assert client.put(f"/admin/todo/{todo_id}", json={}, headers=auth_headers).status_code == status.HTTP_403_FORBIDDEN
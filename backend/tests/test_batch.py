@@ -0,0 +1,102 @@
+"""
+Batch todo endpoint tests.
+
+Tests for applying create/update/delete operations through POST /todo/batch.
+"""
+
+from fastapi import status
+
+
+def _todo(title, priority=1, complete=False):
+    return {"title": title, "description": "Batched", "priority": priority, "complete": complete}
+
+
+def _batch(client, headers, operations):
+    return client.post("/todo/batch", json={"operations": operations}, headers=headers)
+
+
+class TestBatchEndpoint:
+    """Test suite for the batch endpoint."""
+
+    def test_batch_create_is_one_insert(self, client, auth_headers, query_budget):
+        """Test a batch's statement count does not grow with its size: the version bump and one INSERT."""
+        with query_budget(2):
+            _batch(client, auth_headers, [{"op": "create", "todo": _todo(f"Todo {i}")} for i in range(50)])
+
+    def test_batch_locks_the_owner_before_reading_targets(self, client, auth_headers, query_budget):
+        """Test the version bump precedes the ownership check, so a concurrent delete waits for the batch."""
+        created = _batch(client, auth_headers, [{"op": "create", "todo": _todo("Target")}])
+        todo_id = created.json()["results"][0]["id"]
+
+        with query_budget(3) as profile:
+            _batch(client, auth_headers, [{"op": "update", "id": todo_id, "todo": _todo("Renamed")},
+                                          {"op": "delete", "id": todo_id + 1}])
+
+        kinds = [statement.split()[0].upper() for statement, _ in profile.statements]
+        assert kinds[:2] == ["UPDATE", "SELECT"]
+        assert "users" in profile.statements[0][0]
+
+    def test_batch_of_misses_writes_nothing(self, client, db_session, auth_headers):
+        """Test a batch whose every operation is a 404 leaves the owner's version alone."""
+        from backend.models import Users
+
+        before = db_session.query(Users.version).filter(Users.username == "testuser").scalar()
+
+        response = _batch(client, auth_headers, [{"op": "delete", "id": 999999}])
+
+        assert [r["status"] for r in response.json()["results"]] == [404]
+        db_session.expire_all()
+        assert db_session.query(Users.version).filter(Users.username == "testuser").scalar() == before
+
+    def test_batch_create_returns_ids_in_order(self, client, auth_headers):
+        """Test created todos get their ids back in request order."""
+        response = _batch(client, auth_headers, [{"op": "create", "todo": _todo(f"Todo {i}")} for i in range(5)])
+
+        assert response.status_code == status.HTTP_200_OK
+        results = response.json()["results"]
+        assert [r["status"] for r in results] == [201] * 5
+
+        listed = {t["id"]: t["title"] for t in client.get("/", headers=auth_headers).json()}
+        assert [listed[r["id"]] for r in results] == [f"Todo {i}" for i in range(5)]
+
+    def test_mixed_batch_applies_in_one_call(self, client, auth_headers):
+        """Test updates and deletes are applied and reported per item."""
+        created = _batch(client, auth_headers, [{"op": "create", "todo": _todo(f"Todo {i}")} for i in range(3)])
+        a, b, c = (r["id"] for r in created.json()["results"])
+
+        response = _batch(client, auth_headers, [
+            {"op": "update", "id": a, "todo": _todo("Renamed", priority=5, complete=True)},
+            {"op": "delete", "id": b},
+            {"op": "update", "id": b, "todo": _todo("Too late")},
+            {"op": "delete", "id": 99999},
+            {"op": "create", "todo": _todo("New")},
+        ])
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [r["status"] for r in response.json()["results"]] == [204, 204, 404, 404, 201]
+
+        listed = {t["id"]: t for t in client.get("/", headers=auth_headers).json()}
+        assert b not in listed
+        assert listed[a]["title"] == "Renamed"
+        assert listed[a]["complete"] is True
+        assert listed[c]["title"] == "Todo 2"
+        assert len(listed) == 3
+
+    def test_batch_cannot_touch_other_users_todos(self, client, auth_headers, admin_headers):
+        """Test ids owned by someone else are reported as not found and left alone."""
+        created = _batch(client, admin_headers, [{"op": "create", "todo": _todo("Admin's")}])
+        admin_todo = created.json()["results"][0]["id"]
+
+        response = _batch(client, auth_headers, [
+            {"op": "update", "id": admin_todo, "todo": _todo("Hijacked")},
+            {"op": "delete", "id": admin_todo},
+        ])
+
+        assert [r["status"] for r in response.json()["results"]] == [404, 404]
+        assert client.get(f"/todo/{admin_todo}", headers=admin_headers).json()["title"] == "Admin's"
+
+    def test_invalid_operations_are_rejected(self, client, auth_headers):
+        """Test malformed operations and empty batches fail validation."""
+        assert _batch(client, auth_headers, []).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert _batch(client, auth_headers, [{"op": "delete"}]).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert _batch(client, auth_headers, [{"op": "update", "id": 1}]).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
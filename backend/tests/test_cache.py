@@ -0,0 +1,172 @@
+"""
+Todo read cache tests.
+
+Tests for the per-owner todo list cache and its versioned keys.
+"""
+
+import fnmatch
+import time
+
+from backend.cache import MemoryStore, RedisStore, TodoCache, todo_cache
+
+
+class FakeRedis:
+    """Just enough of redis.asyncio.Redis for RedisStore."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        value = self.data.get(key)
+        if value is None or (value[1] is not None and value[1] <= time.monotonic()):
+            return None
+        return value[0]
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = (value, time.monotonic() + ex if ex else None)
+
+    async def scan_iter(self, match=None, count=None):
+        for key in list(self.data):
+            if match is None or fnmatch.fnmatchcase(key, match):
+                yield key
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+def _todo(title):
+    return {"title": title, "description": "Cached", "priority": 1, "complete": False}
+
+
+def _seed(db_session):
+    from backend.models import Todos, Users
+
+    owner = db_session.query(Users).filter(Users.username == "testuser").first()
+    return Todos(title="Seeded", description="Cached", priority=1, complete=False, owner_id=owner.id)
+
+
+class TestTodoCache:
+    """Test suite for the todo cache."""
+
+    def test_repeat_reads_are_hits(self, client, auth_headers):
+        """Test the second unfiltered list read is served from the cache."""
+        client.post("/todo/batch", json={"operations": [{"op": "create", "todo": _todo("One")}]}, headers=auth_headers)
+        todo_cache.metrics.reset()
+
+        first = client.get("/", headers=auth_headers)
+        second = client.get("/", headers=auth_headers)
+
+        assert first.json() == second.json()
+        assert [t["title"] for t in second.json()] == ["One"]
+        assert todo_cache.metrics.snapshot()["misses"] == 1
+        assert todo_cache.metrics.snapshot()["hits"] == 1
+
+    def test_filtered_reads_bypass_the_cache(self, client, auth_headers):
+        """Test filtered and paged reads always go to the database."""
+        todo_cache.metrics.reset()
+
+        client.get("/", params={"complete": "false"}, headers=auth_headers)
+        client.get("/", params={"limit": 5}, headers=auth_headers)
+
+        assert todo_cache.metrics.snapshot()["hits"] == 0
+        assert todo_cache.metrics.snapshot()["misses"] == 0
+
+    def test_user_writes_invalidate(self, client, auth_headers):
+        """Test create, update and delete are visible on the next read."""
+        assert client.get("/", headers=auth_headers).json() == []
+
+        created = client.post("/todo/batch", json={"operations": [{"op": "create", "todo": _todo("New")}]}, headers=auth_headers)
+        todo_id = created.json()["results"][0]["id"]
+        assert [t["title"] for t in client.get("/", headers=auth_headers).json()] == ["New"]
+
+        client.put(f"/todo/{todo_id}", json=_todo("Renamed"), headers=auth_headers)
+        assert [t["title"] for t in client.get("/", headers=auth_headers).json()] == ["Renamed"]
+
+        client.delete(f"/todo/{todo_id}", headers=auth_headers)
+        assert client.get("/", headers=auth_headers).json() == []
+
+    def test_admin_writes_invalidate_the_owner(self, client, auth_headers, admin_headers):
+        """Test admin updates and deletes invalidate the todo owner's cache."""
+        created = client.post("/todo/batch", json={"operations": [{"op": "create", "todo": _todo("Mine")}]}, headers=auth_headers)
+        todo_id = created.json()["results"][0]["id"]
+        client.get("/", headers=auth_headers)
+
+        client.put(f"/admin/todo/{todo_id}", json={"complete": True}, headers=admin_headers)
+        assert client.get("/", headers=auth_headers).json()[0]["complete"] is True
+
+        client.delete(f"/admin/todo/{todo_id}", headers=admin_headers)
+        assert client.get("/", headers=auth_headers).json() == []
+
+    def test_out_of_band_writes_are_not_served(self, client, db_session, auth_headers):
+        """Test a write that bumps the version, from any worker, misses the old entry."""
+        from backend.models import Users
+
+        client.get("/", headers=auth_headers)
+        db_session.add(_seed(db_session))
+        user = db_session.query(Users).filter(Users.username == "testuser").first()
+        user.version += 1
+        db_session.commit()
+
+        assert [t["title"] for t in client.get("/", headers=auth_headers).json()] == ["Seeded"]
+
+    async def test_memory_store_respects_ttl_and_size(self):
+        """Test the in-process store expires entries and evicts the oldest."""
+        cache = TodoCache(MemoryStore(max_entries=2), ttl=60)
+        await cache.set_list(1, 0, b"[1]")
+        await cache.set_list(2, 0, b"[2]")
+        await cache.set_list(3, 0, b"[3]")
+
+        assert await cache.get_list(1, 0) is None
+        assert await cache.get_list(3, 0) == b"[3]"
+
+        store = MemoryStore()
+        await store.set("short", b"x", ttl=0.01)
+        time.sleep(0.02)
+        assert await store.get("short") is None
+
+    async def test_oversized_payloads_are_not_cached(self):
+        """Test lists over the payload cap are skipped."""
+        cache = TodoCache(MemoryStore(), max_payload_bytes=4)
+
+        await cache.set_list(1, 0, b"[1,2,3]")
+
+        assert await cache.get_list(1, 0) is None
+        assert cache.metrics.snapshot()["skipped"] == 1
+
+    async def test_redis_store_roundtrip(self):
+        """Test the Redis store keeps one entry per owner version."""
+        cache = TodoCache(RedisStore(client=FakeRedis()))
+        await cache.set_list(1, 3, b"[]")
+
+        assert await cache.get_list(1, 3) == b"[]"
+        assert await cache.get_list(1, 4) is None
+
+    async def test_redis_store_clears_only_its_keys(self):
+        """Test clearing the Redis store leaves keys outside its prefix."""
+        redis = FakeRedis()
+        store = RedisStore(client=redis, prefix="cache:")
+        for i in range(3):
+            await store.set(f"todos:list:{i}:0", b"[]")
+        await redis.set("session:1", b"keep")
+
+        await store.clear()
+
+        assert list(redis.data) == ["session:1"]
+        assert await store.get("todos:list:0:0") is None
+
+    async def test_store_errors_fall_back_to_misses(self):
+        """Test a failing store never raises into the request."""
+
+        class BrokenStore(MemoryStore):
+            async def get(self, key):
+                raise ConnectionError("down")
+
+            async def set(self, key, value, ttl=None):
+                raise ConnectionError("down")
+
+        cache = TodoCache(BrokenStore())
+
+        assert await cache.get_list(1, 0) is None
+        await cache.set_list(1, 0, b"[]")
+        assert cache.metrics.snapshot()["errors"] == 2
@@ -0,0 +1,74 @@
+"""
+Conditional GET tests.
+
+Tests for ETag / If-None-Match handling on todo and profile reads.
+"""
+
+from fastapi import status
+
+
+def _todo(title):
+    return {"title": title, "description": "Tagged", "priority": 1, "complete": False}
+
+
+def _create(client, headers, title):
+    response = client.post("/todo/batch", json={"operations": [{"op": "create", "todo": _todo(title)}]}, headers=headers)
+    return response.json()["results"][0]["id"]
+
+
+def _revalidate(client, url, headers, etag, **kwargs):
+    return client.get(url, headers={**headers, "If-None-Match": etag}, **kwargs)
+
+
+class TestConditionalGets:
+    """Test suite for ETag revalidation."""
+
+    def test_list_not_modified_until_a_write(self, client, auth_headers):
+        """Test GET / answers 304 for a current ETag and 200 after a change."""
+        _create(client, auth_headers, "First")
+        first = client.get("/", headers=auth_headers)
+        etag = first.headers["ETag"]
+
+        again = _revalidate(client, "/", auth_headers, etag)
+        assert again.status_code == status.HTTP_304_NOT_MODIFIED
+        assert again.headers["ETag"] == etag
+        assert again.content == b""
+
+        _create(client, auth_headers, "Second")
+        changed = _revalidate(client, "/", auth_headers, etag)
+        assert changed.status_code == status.HTTP_200_OK
+        assert changed.headers["ETag"] != etag
+        assert len(changed.json()) == 2
+
+    def test_list_variants_have_their_own_etags(self, client, auth_headers):
+        """Test a filtered listing does not revalidate against the full list's ETag."""
+        etag = client.get("/", headers=auth_headers).headers["ETag"]
+
+        filtered = _revalidate(client, "/", auth_headers, etag, params={"complete": "true"})
+
+        assert filtered.status_code == status.HTTP_200_OK
+        assert filtered.headers["ETag"] != etag
+
+    def test_single_todo_changes_with_owner_version(self, client, auth_headers, admin_headers):
+        """Test GET /todo/{id} revalidates and admin writes change its ETag."""
+        todo_id = _create(client, auth_headers, "Mine")
+        etag = client.get(f"/todo/{todo_id}", headers=auth_headers).headers["ETag"]
+
+        assert _revalidate(client, f"/todo/{todo_id}", auth_headers, etag).status_code == status.HTTP_304_NOT_MODIFIED
+
+        client.put(f"/admin/todo/{todo_id}", json={"complete": True}, headers=admin_headers)
+        response = _revalidate(client, f"/todo/{todo_id}", auth_headers, etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["complete"] is True
+
+    def test_profile_changes_with_user_updates(self, client, auth_headers):
+        """Test GET /user/get_user revalidates and profile updates change its ETag."""
+        etag = client.get("/user/get_user", headers=auth_headers).headers["ETag"]
+
+        assert _revalidate(client, "/user/get_user", auth_headers, etag).status_code == status.HTTP_304_NOT_MODIFIED
+        assert _revalidate(client, "/user/get_user", auth_headers, f"W/{etag}").status_code == status.HTTP_304_NOT_MODIFIED
+
+        client.put("/user/update_user", json={"first_name": "Renamed"}, headers=auth_headers)
+        response = _revalidate(client, "/user/get_user", auth_headers, etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["first_name"] == "Renamed"
@@ -0,0 +1,195 @@
+"""
+Todo event push tests.
+
+Tests for the pub/sub hub, the brokers and the GET /todo/events stream.
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from backend import events
+from backend.events import OVERFLOW, Hub, LocalBroker, RedisBroker, Subscription, TooManyConnections, encode_event
+
+
+class FakePubSub:
+    """Just enough of redis.asyncio's PubSub for RedisBroker."""
+
+    def __init__(self, messages, drop_after=None):
+        self.messages = messages
+        self.drop_after = drop_after
+        self.subscribed = set()
+
+    async def subscribe(self, channel):
+        self.subscribed.add(channel)
+
+    async def unsubscribe(self, channel):
+        self.subscribed.discard(channel)
+
+    async def listen(self):
+        yield {"type": "subscribe", "data": 1}
+        delivered = 0
+        while True:
+            if delivered == self.drop_after:
+                raise ConnectionError("Connection closed by server.")
+            yield {"type": "message", "data": await self.messages.get()}
+            delivered += 1
+
+
+class FakeRedis:
+    def __init__(self, drop_after=None):
+        self.messages = asyncio.Queue()
+        self.drop_after = drop_after
+        self.subscriptions = 0
+
+    def pubsub(self):
+        self.subscriptions += 1
+        # Only the first connection drops.
+        return FakePubSub(self.messages, self.drop_after if self.subscriptions == 1 else None)
+
+    async def publish(self, channel, payload):
+        await self.messages.put(payload)
+
+
+def _todo(title):
+    return {"title": title, "description": "Pushed", "priority": 1, "complete": False}
+
+
+class TestHub:
+    """Test suite for fan-out, limits and brokers."""
+
+    async def test_events_reach_only_the_owner(self):
+        """Test every connection of the owner gets the event and nobody else does."""
+        hub = Hub()
+        first, second, other = hub.subscribe(1), hub.subscribe(1), hub.subscribe(2)
+
+        hub.dispatch(1, encode_event(1, "created", [5], 3))
+
+        for subscription in (first, second):
+            assert json.loads(await subscription.get(0.1)) == {"owner_id": 1, "type": "created", "ids": [5], "version": 3}
+        assert await other.get(0.01) is None
+
+    async def test_slow_consumer_overflows_instead_of_growing(self):
+        """Test a full queue is dropped and replaced by a single overflow marker."""
+        subscription = Subscription(1, max_queued=2)
+
+        assert subscription.offer(b"a") and subscription.offer(b"b")
+        assert subscription.offer(b"c") is False
+
+        assert await subscription.get(0.1) is OVERFLOW
+        assert subscription.offer(b"d") is False
+
+    async def test_queue_is_bounded_by_bytes(self):
+        """Test the byte limit applies independently of the event count."""
+        subscription = Subscription(1, max_queued=100, max_queued_bytes=10)
+
+        assert subscription.offer(b"x" * 6)
+        assert await subscription.get(0.1) == b"x" * 6
+        assert subscription.offer(b"x" * 6)
+        assert subscription.offer(b"x" * 6) is False
+
+    def test_connections_per_owner_are_limited(self):
+        """Test one owner cannot open unbounded streams."""
+        hub = Hub(max_connections_per_owner=2)
+        hub.subscribe(1)
+        hub.subscribe(1)
+
+        with pytest.raises(TooManyConnections):
+            hub.subscribe(1)
+        hub.subscribe(2)
+
+    async def test_stream_emits_sse_and_unsubscribes(self):
+        """Test the stream frames events, ends on overflow and releases the connection."""
+        hub = Hub(heartbeat=0.01, max_stream_seconds=1)
+        subscription = hub.subscribe(1)
+        hub.dispatch(1, b'{"type":"created"}')
+        hub.dispatch(1, b"x" * events.EVENTS_MAX_QUEUED_BYTES)
+
+        chunks = [chunk async for chunk in hub.stream(subscription)]
+
+        assert chunks[0].startswith(b"retry:")
+        assert chunks[-1].startswith(b"event: overflow")
+        assert hub.connections(1) == 0
+        assert hub.overflows == 1
+
+    async def test_redis_broker_relays_to_the_local_hub(self):
+        """Test events published through Redis reach the subscribing worker's hub."""
+        hub = Hub()
+        broker = RedisBroker(client=FakeRedis())
+        await broker.start(hub)
+        subscription = hub.subscribe(7)
+
+        await broker.publish(7, encode_event(7, "deleted", [1, 2], 9))
+
+        assert json.loads(await subscription.get(1))["ids"] == [1, 2]
+        await broker.stop()
+
+    async def test_redis_broker_resubscribes_after_a_drop(self):
+        """Test a dropped Redis connection is re-established and open streams are told to resync."""
+        hub = Hub()
+        client = FakeRedis(drop_after=1)
+        broker = RedisBroker(client=client, reconnect_seconds=0.01)
+        await broker.start(hub)
+        before = hub.subscribe(7)
+
+        # The connection drops after relaying this; the stream is ended.
+        await broker.publish(7, encode_event(7, "created", [1], 1))
+        assert await before.get(1) is OVERFLOW
+
+        after = hub.subscribe(7)
+        await broker.publish(7, encode_event(7, "created", [2], 2))
+        assert json.loads(await after.get(1))["ids"] == [2]
+        assert (client.subscriptions, broker.reconnects) == (2, 1)
+        await broker.stop()
+
+    async def test_stream_subscribes_only_once_started(self):
+        """Test a connection takes a slot when its stream starts, and one over the limit ends at once."""
+        hub = Hub(heartbeat=0.01, max_stream_seconds=0.05, max_connections_per_owner=1)
+        never_started = hub.connect(1)
+        assert hub.connections(1) == 0
+        await never_started.aclose()
+
+        stream = hub.connect(1)
+        assert (await anext(stream)).startswith(b"retry:")
+        assert hub.connections(1) == 1 and not hub.has_room(1)
+        assert [chunk async for chunk in hub.connect(1)] == []
+        await stream.aclose()
+        assert hub.connections(1) == 0
+
+    async def test_local_broker_before_start_drops_events(self):
+        """Test publishing without a started broker is a no-op."""
+        await LocalBroker().publish(1, b"{}")
+
+
+class TestEventStream:
+    """Test suite for GET /todo/events."""
+
+    def test_writes_are_pushed_to_the_stream(self, client, auth_headers, monkeypatch):
+        """Test a committed write reaches an open stream of the same user."""
+        monkeypatch.setattr(events.hub, "heartbeat", 0.1)
+        monkeypatch.setattr(events.hub, "max_stream_seconds", 1.0)
+        body = {}
+
+        def listen():
+            body["text"] = client.get("/todo/events", headers=auth_headers).text
+
+        listener = threading.Thread(target=listen)
+        listener.start()
+        deadline = time.monotonic() + 5
+        while events.hub.connections() == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        created = client.post("/todo/batch", json={"operations": [{"op": "create", "todo": _todo("Pushed")}]}, headers=auth_headers)
+        listener.join(timeout=10)
+
+        todo_id = created.json()["results"][0]["id"]
+        data = [json.loads(line[len("data: "):]) for line in body["text"].splitlines() if line.startswith("data: {\"")]
+        assert [(d["type"], d["ids"]) for d in data] == [("created", [todo_id])]
+        assert events.hub.connections() == 0
+
+    def test_stream_requires_authentication(self, client):
+        """Test the stream uses the same bearer authentication as the API."""
+        assert client.get("/todo/events").status_code == 401
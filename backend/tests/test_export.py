@@ -0,0 +1,69 @@
+"""
+Todo export tests.
+
+Tests for the streaming NDJSON/CSV export endpoints.
+"""
+
+import csv
+import io
+import json
+
+from fastapi import status
+
+from backend import export
+
+
+def _seed_todos(db_session, username, count):
+    from backend.models import Todos, Users
+
+    owner_id = db_session.query(Users).filter(Users.username == username).first().id
+    db_session.add_all(
+        Todos(title=f"Todo {i}", description="Seeded", priority=i % 5 + 1, complete=i % 2 == 0, owner_id=owner_id)
+        for i in range(count)
+    )
+    db_session.commit()
+
+
+class TestExport:
+    """Test suite for the export endpoints."""
+
+    def test_ndjson_export_spans_batches(self, client, db_session, auth_headers, monkeypatch):
+        """Test every row is exported once when the export is read in several batches."""
+        monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 2)
+        _seed_todos(db_session, "testuser", 5)
+
+        response = client.get("/todo/export", headers=auth_headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [r["title"] for r in rows] == [f"Todo {i}" for i in range(5)]
+        assert set(rows[0]) == set(export.EXPORT_FIELDS)
+
+    def test_csv_export_with_filter(self, client, db_session, auth_headers):
+        """Test CSV output has a header row and honours the filters."""
+        _seed_todos(db_session, "testuser", 6)
+
+        response = client.get("/todo/export", params={"format": "csv", "complete": "false"}, headers=auth_headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert len(rows) == 3
+        assert all(r["complete"] == "False" for r in rows)
+
+    def test_export_is_owner_scoped(self, client, db_session, auth_headers, admin_headers):
+        """Test users export only their own todos while admins export everything."""
+        _seed_todos(db_session, "testuser", 2)
+        _seed_todos(db_session, "adminuser", 3)
+
+        mine = client.get("/todo/export", headers=auth_headers)
+        everything = client.get("/admin/todo/export", headers=admin_headers)
+
+        assert len(mine.text.splitlines()) == 2
+        assert len(everything.text.splitlines()) == 5
+
+    def test_admin_export_requires_admin(self, client, auth_headers):
+        """Test non-admin users cannot export every todo."""
+        response = client.get("/admin/todo/export", headers=auth_headers)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -0,0 +1,129 @@
+"""
+Password hashing subsystem tests.
+
+Tests for the bounded Argon2 executor used by the auth and user routers.
+"""
+
+import asyncio
+
+import pytest
+from argon2 import PasswordHasher
+from fastapi import HTTPException
+
+from backend import hashing
+from backend.benchmarks.calibrate_argon2 import calibrate, env_lines
+from backend.models import Users
+
+# Cheaper than the configured parameters, as a hash from an older deployment.
+OLD_HASHER = PasswordHasher(time_cost=1, memory_cost=8192, parallelism=1)
+
+
+class TestHashing:
+    """Test suite for the hashing helpers."""
+
+    async def test_hash_and_verify_roundtrip(self):
+        """Test a hashed password verifies and a wrong one does not."""
+        hashed = await hashing.hash_password("SecurePassword123!")
+
+        assert hashed != "SecurePassword123!"
+        assert await hashing.verify_password(hashed, "SecurePassword123!") is True
+        assert await hashing.verify_password(hashed, "WrongPassword123!") is False
+
+    async def test_event_loop_stays_responsive(self):
+        """Test other coroutines keep running while hashes are in progress."""
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(ticker())
+        await asyncio.gather(*(hashing.hash_password("SecurePassword123!") for _ in range(4)))
+        task.cancel()
+
+        assert ticks > 4
+
+    async def test_metrics_record_operations(self):
+        """Test hash and verify calls are counted and the queue drains."""
+        hashing.metrics.reset()
+
+        hashed = await hashing.hash_password("SecurePassword123!")
+        await hashing.verify_password(hashed, "SecurePassword123!")
+
+        snapshot = hashing.metrics.snapshot()
+        assert snapshot["ops"]["hash"]["count"] == 1
+        assert snapshot["ops"]["verify"]["count"] == 1
+        assert snapshot["queue_depth"] == 0
+        assert snapshot["in_flight"] == 0
+
+    async def test_full_queue_sheds_load(self, monkeypatch):
+        """Test callers are rejected with 503 once the wait queue is full."""
+        hashing.metrics.reset()
+        monkeypatch.setattr(hashing, "HASH_MAX_QUEUE", 0)
+
+        with pytest.raises(HTTPException) as exc:
+            await hashing.hash_password("SecurePassword123!")
+
+        assert exc.value.status_code == 503
+        assert hashing.metrics.snapshot()["rejected"] == 1
+
+    def test_needs_rehash_compares_with_configured_parameters(self):
+        """Test only hashes made with other parameters need rehashing."""
+        assert hashing.needs_rehash(hashing.ph.hash("SecurePassword123!")) is False
+        assert hashing.needs_rehash(OLD_HASHER.hash("SecurePassword123!")) is True
+
+    def test_login_rehashes_outdated_hash(self, client, test_user_data, db_session):
+        """Test logging in migrates a stored hash to the configured parameters."""
+        client.post("/auth/", json=test_user_data)
+        user = db_session.query(Users).filter_by(username=test_user_data["username"]).one()
+        user.hashed_password = OLD_HASHER.hash(test_user_data["password"])
+        db_session.commit()
+
+        response = client.post("/auth/token", data={
+            "username": test_user_data["username"], "password": test_user_data["password"],
+        })
+
+        assert response.status_code == 200
+        db_session.expire_all()
+        stored = db_session.query(Users).filter_by(username=test_user_data["username"]).one().hashed_password
+        assert not hashing.needs_rehash(stored)
+        assert hashing.ph.verify(stored, test_user_data["password"])
+
+    def test_failed_login_keeps_outdated_hash(self, client, test_user_data, db_session):
+        """Test a wrong password never rewrites the stored hash."""
+        client.post("/auth/", json=test_user_data)
+        user = db_session.query(Users).filter_by(username=test_user_data["username"]).one()
+        old_hash = OLD_HASHER.hash(test_user_data["password"])
+        user.hashed_password = old_hash
+        db_session.commit()
+
+        response = client.post("/auth/token", data={"username": test_user_data["username"], "password": "Wrong123!"})
+
+        assert response.status_code == 401
+        db_session.expire_all()
+        assert db_session.query(Users).filter_by(username=test_user_data["username"]).one().hashed_password == old_hash
+
+    def test_calibrate_picks_strongest_setting_within_target(self):
+        """Test calibration keeps the most memory passes that verify within the target."""
+        # Pretend a verify costs 1 ms per MiB-pass, plus a little per lane.
+        def measure(time_cost, memory_cost, parallelism, samples):
+            return (memory_cost // 1024 * time_cost + parallelism) / 1000
+
+        report = calibrate(100, memory_mib=(16, 32, 64), parallelism=(1, 2), measure=measure)
+
+        assert report["chosen"] == {"time_cost": 3, "memory_cost": 32 * 1024, "parallelism": 1, "verify_ms": 97.0}
+        assert env_lines(report["chosen"]).splitlines() == [
+            "ARGON2_TIME_COST=3", "ARGON2_MEMORY_COST=32768", "ARGON2_PARALLELISM=1",
+        ]
+
+    def test_calibrate_respects_memory_budget(self):
+        """Test settings that would not fit concurrent hashes in memory are skipped."""
+        report = calibrate(
+            1000, memory_mib=(16, 64), parallelism=(1,), concurrency=4, max_memory_mib=100,
+            measure=lambda t, m, p, samples: 0.001 * t,
+        )
+
+        assert {m["memory_cost"] for m in report["measurements"]} == {16 * 1024}
+        assert report["chosen"]["memory_cost"] == 16 * 1024
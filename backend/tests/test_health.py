@@ -0,0 +1,75 @@
+"""
+Health endpoint and pool configuration tests.
+
+Tests for /health/ready and the DB_* engine options.
+"""
+
+import time
+
+from fastapi import status
+from sqlalchemy.engine import make_url
+
+from backend import database
+
+
+class TestHealth:
+    """Test suite for readiness and pool settings."""
+
+    def test_ready_reports_pool_and_checkout_wait(self, client):
+        """Test an idle worker is ready and reports its pool."""
+        response = client.get("/health/ready")
+
+        assert response.status_code == status.HTTP_200_OK
+        body = response.json()
+        assert body["ready"] is True
+        assert body["mode"] == "pool"
+        assert body["pool"]["capacity"] == database.DB_POOL_SIZE + database.DB_MAX_OVERFLOW
+        assert 0 <= body["pool"]["utilization"] < 1
+        assert set(body["checkout_wait"]) == {"window_s", "count", "mean_ms", "max_ms"}
+
+    def test_saturated_pool_is_not_ready(self, client, monkeypatch):
+        """Test high utilization turns readiness into a 503."""
+        monkeypatch.setattr(database, "pool_stats", lambda: {
+            "size": 5, "checked_in": 0, "checked_out": 15, "overflow": 10, "capacity": 15,
+        })
+
+        response = client.get("/health/ready")
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.json()["pool"]["utilization"] == 1.0
+
+    def test_slow_checkouts_are_not_ready_until_they_age_out(self, client, monkeypatch):
+        """Test a recent slow checkout fails readiness and an old one does not."""
+        monkeypatch.setattr(database, "_recent_checkouts", database.deque(maxlen=8))
+        database._recent_checkouts.append((time.perf_counter(), 2.0))
+
+        assert client.get("/health/ready").status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+        monkeypatch.setattr(database, "DB_READY_WINDOW", 0.0)
+        assert client.get("/health/ready").status_code == status.HTTP_200_OK
+
+    def test_pool_options_come_from_settings(self, monkeypatch):
+        """Test pool sizing and pre-ping follow the DB_* settings."""
+        monkeypatch.setattr(database, "DB_POOL_SIZE", 20)
+        monkeypatch.setattr(database, "DB_MAX_OVERFLOW", 0)
+        monkeypatch.setattr(database, "DB_POOL_PRE_PING", True)
+
+        options = database.engine_options(make_url("postgresql+asyncpg://u:p@db/app"))
+
+        assert options["poolclass"] is database.InstrumentedQueuePool
+        assert options["pool_size"] == 20
+        assert options["max_overflow"] == 0
+        assert options["pool_pre_ping"] is True
+
+    def test_pgbouncer_mode_disables_pooling_and_prepared_statements(self, monkeypatch):
+        """Test PgBouncer mode uses no pool and no statement cache."""
+        monkeypatch.setattr(database, "DB_PGBOUNCER", True)
+
+        options = database.engine_options(make_url("postgresql+asyncpg://u:p@bouncer/app"))
+
+        assert options["poolclass"] is database.InstrumentedNullPool
+        assert "pool_size" not in options
+        assert options["connect_args"]["statement_cache_size"] == 0
+        assert options["connect_args"]["prepared_statement_cache_size"] == 0
+        name = options["connect_args"]["prepared_statement_name_func"]
+        assert name() != name()
@@ -0,0 +1,240 @@
+"""
+Background job tests.
+
+Tests for the job runner (claiming, retries, leases, shutdown) and the
+account deletion job behind DELETE /user/delete_account.
+"""
+
+import asyncio
+import time
+
+from fastapi import status
+
+from backend import jobs
+from backend.models import Jobs, Todos, Users
+from backend.routers import user
+from backend.tests.conftest import TestingJobsSessionLocal, _bearer_headers
+
+
+def _runner(handlers, **options):
+    # No workers: the tests drive it with run_once.
+    options.setdefault('retry_seconds', 0)
+    return jobs.JobRunner(TestingJobsSessionLocal, concurrency=0, handlers=handlers, **options)
+
+
+async def _enqueue(kind, payload=None, owner_id=None, **options):
+    async with TestingJobsSessionLocal() as db:
+        job_id = await jobs.enqueue(db, kind, payload, owner_id, **options)
+        await db.commit()
+    return job_id
+
+
+def _job(db_session, job_id):
+    db_session.expire_all()
+    return db_session.get(Jobs, job_id)
+
+
+class TestJobRunner:
+    """Test suite for the job runner."""
+
+    async def test_runs_a_job_and_records_progress(self, db_session):
+        """Test a claimed job gets its payload, and its progress and outcome are stored."""
+        seen = []
+
+        async def count(job):
+            seen.append(job.payload)
+            await job.progress(3, 3)
+
+        runner = _runner({'count': count})
+        job_id = await _enqueue('count', {'to': 3}, owner_id=7)
+
+        assert await runner.run_once() is True
+        assert await runner.run_once() is False
+
+        job = _job(db_session, job_id)
+        assert seen == [{'to': 3}]
+        assert (job.status, job.attempts, job.progress, job.total, job.owner_id) == ('succeeded', 1, 3, 3, 7)
+        assert job.locked_until is None
+
+    async def test_failed_attempts_are_retried(self, db_session):
+        """Test a job that raises is queued again, keeping the error, and succeeds later."""
+        calls = []
+
+        async def flaky(job):
+            calls.append(job.attempts)
+            if len(calls) == 1:
+                raise RuntimeError('database went away')
+
+        runner = _runner({'flaky': flaky})
+        job_id = await _enqueue('flaky')
+
+        await runner.run_once()
+        job = _job(db_session, job_id)
+        assert (job.status, job.error) == ('queued', 'RuntimeError: database went away')
+
+        await runner.run_once()
+        assert calls == [1, 2]
+        assert _job(db_session, job_id).status == 'succeeded'
+
+    async def test_retries_back_off(self, db_session):
+        """Test the retry delay doubles with each attempt."""
+        async def broken(job):
+            raise ValueError('no')
+
+        runner = _runner({'broken': broken}, retry_seconds=60)
+        job_id = await _enqueue('broken')
+
+        await runner.run_once()
+        first = _job(db_session, job_id).run_after - time.time()
+        assert 55 < first <= 60
+        assert await runner.run_once() is False
+
+    async def test_gives_up_after_max_attempts(self, db_session):
+        """Test a job that keeps failing ends up failed."""
+        async def broken(job):
+            raise ValueError('no')
+
+        runner = _runner({'broken': broken})
+        job_id = await _enqueue('broken', max_attempts=2)
+
+        assert await runner.run_once() is True
+        assert await runner.run_once() is True
+        assert await runner.run_once() is False
+
+        job = _job(db_session, job_id)
+        assert (job.status, job.attempts, job.error) == ('failed', 2, 'ValueError: no')
+
+    async def test_unknown_kind_fails(self, db_session):
+        """Test a job nobody handles fails instead of blocking the queue."""
+        job_id = await _enqueue('mystery', max_attempts=1)
+
+        await _runner({}).run_once()
+
+        job = _job(db_session, job_id)
+        assert job.status == 'failed'
+        assert 'mystery' in job.error
+
+    async def test_a_job_is_claimed_once(self, db_session):
+        """Test concurrent workers never both claim the same job."""
+        await _enqueue('noop')
+        runner = _runner({})
+
+        claims = await asyncio.gather(*(runner.claim() for _ in range(5)))
+
+        assert len([c for c in claims if c is not None]) == 1
+
+    async def test_lapsed_lease_is_taken_over(self, db_session):
+        """Test a job whose worker died runs again once its lease lapses."""
+        done = []
+
+        async def work(job):
+            done.append(job.attempts)
+
+        dead = _runner({}, lease_seconds=-1)
+        job_id = await _enqueue('work')
+        assert await dead.claim() is not None
+
+        await _runner({'work': work}).run_once()
+
+        assert done == [2]
+        assert _job(db_session, job_id).status == 'succeeded'
+
+    async def test_periodic_jobs_queue_the_next_run(self, db_session):
+        """Test a scheduled kind is queued once at a time, and each run queues the next."""
+        runs = []
+
+        async def tick(job):
+            runs.append(job.id)
+
+        runner = _runner({'tick': tick}, schedules={'tick': 60, 'unhandled': 60})
+        assert runner.schedules == {'tick': 60}
+        first = await runner.schedule('tick', time.time())
+        assert await runner.schedule('tick', time.time()) is None
+
+        assert await runner.run_once() is True
+        assert await runner.run_once() is False
+
+        db_session.expire_all()
+        queued = db_session.query(Jobs).filter(Jobs.kind == 'tick', Jobs.status == 'queued').one()
+        assert runs == [first]
+        assert queued.run_after > time.time() + 50
+
+    async def test_stop_requeues_a_running_job(self, db_session):
+        """Test shutting down mid-job hands the attempt back."""
+        started = asyncio.Event()
+
+        async def slow(job):
+            started.set()
+            await asyncio.sleep(60)
+
+        runner = jobs.JobRunner(TestingJobsSessionLocal, concurrency=1, poll_seconds=0.05, handlers={'slow': slow})
+        job_id = await _enqueue('slow')
+        await runner.start()
+        await asyncio.wait_for(started.wait(), 5)
+        await runner.stop()
+
+        job = _job(db_session, job_id)
+        assert (job.status, job.attempts) == ('queued', 0)
+
+
+class TestDeleteAccountJob:
+    """Test suite for account deletion through the job runner."""
+
+    def test_deletes_in_chunks_with_progress(self, client, db_session, auth_headers, test_user_data, monkeypatch,
+                                             wait_for_job):
+        """Test the account is deactivated at once and its todos deleted chunk by chunk."""
+        monkeypatch.setattr(user, "ACCOUNT_DELETE_CHUNK_SIZE", 2)
+        for i in range(5):
+            assert client.post("/todo", json={"title": f"Todo {i}", "description": "Chunked", "priority": 1},
+                               headers=auth_headers).status_code == status.HTTP_201_CREATED
+
+        response = client.delete("/user/delete_account", headers=auth_headers)
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        body = response.json()
+        assert response.headers["location"] == body["status_url"] == f"/jobs/{body['job_id']}"
+        login = client.post("/auth/token", data={"username": test_user_data["username"],
+                                                 "password": test_user_data["password"]})
+        assert login.status_code == status.HTTP_401_UNAUTHORIZED
+
+        job = wait_for_job(auth_headers, body["job_id"])
+        assert (job["kind"], job["status"], job["progress"], job["total"]) == ("delete_account", "succeeded", 5, 5)
+        db_session.expire_all()
+        assert db_session.query(Todos).count() == 0
+        assert db_session.query(Users).filter(Users.username == test_user_data["username"]).count() == 0
+
+    def test_job_status_is_owner_scoped(self, client, auth_headers, admin_headers, wait_for_job):
+        """Test only the job's owner and admins can see it."""
+        other = _bearer_headers(client, {
+            "username": "otheruser", "email": "other@example.com", "first_name": "Other", "last_name": "User",
+            "role": "user", "password": "OtherPassword123!",
+        })
+        job_id = client.delete("/user/delete_account", headers=auth_headers).json()["job_id"]
+
+        assert client.get(f"/jobs/{job_id}", headers=other).status_code == status.HTTP_404_NOT_FOUND
+        assert client.get(f"/jobs/{job_id}", headers=admin_headers).status_code == status.HTTP_200_OK
+        assert client.get("/jobs/999", headers=auth_headers).status_code == status.HTTP_404_NOT_FOUND
+        wait_for_job(auth_headers, job_id)
+
+    def test_tombstone_purge_renews_the_lease(self, client, auth_headers, monkeypatch, wait_for_job):
+        """Test purging tombstones keeps the lease alive without touching the todo progress."""
+        monkeypatch.setattr(user, "ACCOUNT_DELETE_CHUNK_SIZE", 2)
+        for i in range(4):
+            assert client.post("/todo", json={"title": f"Todo {i}", "description": "Gone", "priority": 1},
+                               headers=auth_headers).status_code == status.HTTP_201_CREATED
+        for todo in client.get("/", headers=auth_headers).json():
+            assert client.delete(f"/todo/{todo['id']}", headers=auth_headers).status_code == \
+                status.HTTP_204_NO_CONTENT
+        renewals = []
+        renew = jobs.JobContext.renew
+
+        async def counting_renew(job, **values):
+            renewals.append(values)
+            await renew(job, **values)
+
+        monkeypatch.setattr(jobs.JobContext, "renew", counting_renew)
+
+        job = wait_for_job(auth_headers, client.delete("/user/delete_account", headers=auth_headers).json()["job_id"])
+
+        assert (job["status"], job["progress"], job["total"]) == ("succeeded", 0, 0)
+        assert renewals.count({}) == 2
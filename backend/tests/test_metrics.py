@@ -0,0 +1,72 @@
+"""
+Metrics endpoint tests.
+
+Tests for the Prometheus-style registry and the /metrics endpoint.
+"""
+
+from fastapi import status
+
+from backend.metrics import HTTP_LATENCY, HTTP_REQUESTS, Counter, Histogram, Registry
+
+
+class TestMetrics:
+    """Test suite for metrics collection and exposition."""
+
+    def test_requests_are_labelled_by_route_template(self, client, auth_headers):
+        """Test two ids on one route share a single route-template label."""
+        before = HTTP_REQUESTS.value("GET", "/todo/{todo_id}", "404")
+
+        client.get("/todo/1", headers=auth_headers)
+        client.get("/todo/2", headers=auth_headers)
+
+        assert HTTP_REQUESTS.value("GET", "/todo/{todo_id}", "404") == before + 2
+        assert HTTP_LATENCY.count("GET", "/todo/{todo_id}", "404") >= 2
+
+    def test_unmatched_paths_share_one_label(self, client):
+        """Test unknown URLs do not create a label per path."""
+        before = HTTP_REQUESTS.value("GET", "unmatched", "404")
+
+        client.get("/no/such/path")
+
+        assert HTTP_REQUESTS.value("GET", "unmatched", "404") == before + 1
+
+    def test_metrics_endpoint_exposes_all_families(self, client, test_user_data):
+        """Test /metrics serves request, pool and Argon2 metrics as Prometheus text."""
+        client.post("/auth/", json=test_user_data)
+
+        response = client.get("/metrics")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        body = response.text
+        assert '# TYPE http_request_duration_seconds histogram' in body
+        assert 'http_requests_total{method="POST",route="/auth/",status="201"}' in body
+        assert 'http_requests_in_flight{method="GET"} 1' in body
+        assert "db_pool_checked_out" in body
+        assert "db_pool_checkout_wait_seconds_count" in body
+        assert 'argon2_duration_seconds_count{op="hash"}' in body
+        assert "argon2_queue_depth" in body
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test the rendered histogram follows the exposition format."""
+        registry = Registry()
+        histogram = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0), registry=registry)
+        histogram.observe(0.05, "/")
+        histogram.observe(0.5, "/")
+        histogram.observe(5, "/")
+
+        lines = histogram.render()
+
+        assert 'latency_seconds_bucket{route="/",le="0.1"} 1' in lines
+        assert 'latency_seconds_bucket{route="/",le="1.0"} 2' in lines
+        assert 'latency_seconds_bucket{route="/",le="+Inf"} 3' in lines
+        assert 'latency_seconds_count{route="/"} 3' in lines
+        assert 'latency_seconds_sum{route="/"} 5.55' in lines
+
+    def test_label_values_are_escaped(self):
+        """Test quotes, backslashes and newlines in label values are escaped."""
+        registry = Registry()
+        counter = Counter("odd_total", "Odd labels.", ("value",), registry=registry)
+        counter.inc('a"b\\c\nd')
+
+        assert 'odd_total{value="a\\"b\\\\c\\nd"} 1' in registry.render()
@@ -0,0 +1,153 @@
+"""
+Listing pagination tests.
+
+Tests for keyset pagination, filters and ordering on GET / and GET /admin/todo.
+"""
+
+from fastapi import status
+
+
+def _seed_todos(db_session, owner_id, count):
+    from backend.models import Todos
+
+    db_session.add_all(
+        Todos(
+            title=f"Todo {i}",
+            description="Seeded",
+            priority=i % 5 + 1,
+            complete=i % 2 == 0,
+            owner_id=owner_id,
+        )
+        for i in range(count)
+    )
+    db_session.commit()
+
+
+def _owner_id(db_session, username):
+    from backend.models import Users
+
+    return db_session.query(Users).filter(Users.username == username).first().id
+
+
+class TestPagination:
+    """Test suite for paginated todo listings."""
+
+    def test_unpaged_list_returns_everything(self, client, db_session, auth_headers):
+        """Test GET / without limit/after still returns the full list."""
+        _seed_todos(db_session, _owner_id(db_session, "testuser"), 7)
+
+        response = client.get("/", headers=auth_headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()) == 7
+        assert "X-Next-Cursor" not in response.headers
+
+    def test_pages_cover_every_row_once(self, client, db_session, auth_headers):
+        """Test following X-Next-Cursor walks the list without gaps or repeats."""
+        _seed_todos(db_session, _owner_id(db_session, "testuser"), 7)
+
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 3}
+            if cursor:
+                params["after"] = cursor
+            response = client.get("/", params=params, headers=auth_headers)
+            assert response.status_code == status.HTTP_200_OK
+            seen.extend(t["id"] for t in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+
+        assert len(seen) == 7
+        assert seen == sorted(seen)
+
+    def test_filters_and_descending_priority_sort(self, client, db_session, auth_headers):
+        """Test complete/priority filters and a compound descending sort."""
+        _seed_todos(db_session, _owner_id(db_session, "testuser"), 10)
+
+        response = client.get("/", params={"complete": "true"}, headers=auth_headers)
+        assert all(t["complete"] for t in response.json())
+        assert len(response.json()) == 5
+
+        response = client.get("/", params={"priority": 2}, headers=auth_headers)
+        assert [t["priority"] for t in response.json()] == [2, 2]
+
+        first = client.get("/", params={"sort": "-priority", "limit": 4}, headers=auth_headers)
+        rest = client.get(
+            "/",
+            params={"sort": "-priority", "limit": 100, "after": first.headers["X-Next-Cursor"]},
+            headers=auth_headers,
+        )
+        keys = [(t["priority"], t["id"]) for t in first.json() + rest.json()]
+        assert len(keys) == 10
+        assert keys == sorted(keys, reverse=True)
+
+    def test_cursor_from_another_sort_is_rejected(self, client, db_session, auth_headers):
+        """Test a cursor is only valid for the sort that produced it."""
+        _seed_todos(db_session, _owner_id(db_session, "testuser"), 3)
+
+        response = client.get("/", params={"limit": 1}, headers=auth_headers)
+        cursor = response.headers["X-Next-Cursor"]
+
+        response = client.get("/", params={"sort": "priority", "after": cursor}, headers=auth_headers)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        response = client.get("/", params={"after": "not-a-cursor"}, headers=auth_headers)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_todos_saved_without_priority_page_as_priority_0(self, client, db_session, auth_headers):
+        """Test a todo written without a priority gets 0, and priority pages step through it."""
+        from backend.models import Todos
+
+        owner_id = _owner_id(db_session, "testuser")
+        db_session.add_all(
+            Todos(title=f"Todo {i}", description="Seeded", owner_id=owner_id, **({} if i % 2 else {"priority": 2}))
+            for i in range(6)
+        )
+        db_session.commit()
+        assert db_session.query(Todos).filter(Todos.priority == 0).count() == 3
+
+        for sort in ("priority", "-priority"):
+            seen, cursor = [], None
+            while True:
+                params = {"sort": sort, "limit": 2, **({"after": cursor} if cursor else {})}
+                response = client.get("/", params=params, headers=auth_headers)
+                assert response.status_code == status.HTTP_200_OK
+                seen.extend((t["priority"], t["id"]) for t in response.json())
+                cursor = response.headers.get("X-Next-Cursor")
+                if cursor is None:
+                    break
+            assert seen == sorted(seen, reverse=sort.startswith("-"))
+            assert len(seen) == 6
+
+    def test_cursor_values_must_be_integers(self, client, db_session, auth_headers):
+        """Test a forged cursor with values of the wrong type is a 400, not a database error."""
+        from backend.pagination import encode_cursor
+
+        for values in (["x", 1], [1.5, 2], [True, 1], [None, 1]):
+            response = client.get(
+                "/", params={"sort": "priority", "after": encode_cursor("priority", values)}, headers=auth_headers,
+            )
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_admin_listing_is_paged_by_default(self, client, db_session, auth_headers, admin_headers):
+        """Test GET /admin/todo returns bounded pages across all owners."""
+        _seed_todos(db_session, _owner_id(db_session, "testuser"), 4)
+        _seed_todos(db_session, _owner_id(db_session, "adminuser"), 4)
+
+        first = client.get("/admin/todo", params={"limit": 5}, headers=admin_headers)
+        assert first.status_code == status.HTTP_200_OK
+        assert len(first.json()) == 5
+
+        rest = client.get(
+            "/admin/todo",
+            params={"limit": 5, "after": first.headers["X-Next-Cursor"]},
+            headers=admin_headers,
+        )
+        assert len(rest.json()) == 3
+        assert "X-Next-Cursor" not in rest.headers
+
+    def test_admin_listing_requires_admin(self, client, auth_headers):
+        """Test non-admin users cannot list every todo."""
+        response = client.get("/admin/todo", headers=auth_headers)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
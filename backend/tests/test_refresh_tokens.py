@@ -0,0 +1,164 @@
+"""
+Refresh token tests.
+
+Tests for /auth/refresh rotation, reuse detection and revocation.
+"""
+
+from unittest.mock import patch
+
+from fastapi import status
+
+from backend import refresh_tokens
+from backend.models import RefreshTokens
+
+
+def _register(client, user_data):
+    assert client.post("/auth/", json=user_data).status_code == status.HTTP_201_CREATED
+
+
+def _login(client, user_data):
+    response = client.post(
+        "/auth/token",
+        data={"username": user_data["username"], "password": user_data["password"]},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    return response.json()
+
+
+def _refresh(client, refresh_token):
+    return client.post("/auth/refresh", json={"refresh_token": refresh_token})
+
+
+class TestRefreshTokens:
+    """Test suite for the refresh token flow."""
+
+    def test_login_returns_refresh_token(self, client, test_user_data, db_session):
+        """Test login opens a session that stores only a hash of the token."""
+        _register(client, test_user_data)
+        tokens = _login(client, test_user_data)
+
+        assert tokens["refresh_token"]
+        stored = db_session.query(RefreshTokens).one()
+        assert len(stored.token_hash) == 32
+        assert tokens["refresh_token"].split(".", 1)[1].encode() not in stored.token_hash
+
+    def test_refresh_mints_access_token_without_hashing(self, client, test_user_data):
+        """Test a refresh returns working tokens and never runs Argon2."""
+        _register(client, test_user_data)
+        tokens = _login(client, test_user_data)
+
+        with patch("backend.routers.auth.verify_password") as verify:
+            response = _refresh(client, tokens["refresh_token"])
+
+        assert response.status_code == status.HTTP_200_OK
+        verify.assert_not_called()
+        data = response.json()
+        assert data["token_type"] == "bearer"
+        assert data["refresh_token"] != tokens["refresh_token"]
+        me = client.get("/user/get_user", headers={"Authorization": f"Bearer {data['access_token']}"})
+        assert me.json()["username"] == test_user_data["username"]
+
+    def test_cookie_refresh_keeps_tokens_out_of_the_body(self, client, test_user_data):
+        """Test a cookie refresh renews the HttpOnly cookies and returns neither token."""
+        _register(client, test_user_data)
+        tokens = _login(client, test_user_data)
+        client.cookies.set("refresh_token", tokens["refresh_token"])
+
+        response = client.post("/auth/refresh", headers={"Origin": "https://evil.vercel.app"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"ok": True}
+        assert tokens["refresh_token"] not in response.text
+        cookies = response.headers.get_list("set-cookie")
+        assert any(c.startswith("access_token=") and "HttpOnly" in c for c in cookies)
+        assert any(c.startswith("refresh_token=") and "HttpOnly" in c for c in cookies)
+
+    def test_refresh_query_budget(self, client, test_user_data, query_budget):
+        """Test a refresh is one conditional UPDATE plus a primary key lookup."""
+        _register(client, test_user_data)
+        tokens = _login(client, test_user_data)
+
+        with query_budget(2):
+            assert _refresh(client, tokens["refresh_token"]).status_code == status.HTTP_200_OK
+
+    def test_reused_token_revokes_session(self, client, test_user_data, db_session):
+        """Test presenting a rotated token ends the session for both holders."""
+        _register(client, test_user_data)
+        tokens = _login(client, test_user_data)
+        rotated = _refresh(client, tokens["refresh_token"]).json()["refresh_token"]
+
+        assert _refresh(client, tokens["refresh_token"]).status_code == status.HTTP_401_UNAUTHORIZED
+        assert _refresh(client, rotated).status_code == status.HTTP_401_UNAUTHORIZED
+        assert db_session.query(RefreshTokens).count() == 0
+        assert refresh_tokens.REFRESH_TOTAL.value("revoked") >= 1
+
+    def test_invalid_and_missing_tokens(self, client, test_user_data):
+        """Test garbage, unknown sessions and a missing token are rejected."""
+        _register(client, test_user_data)
+        _login(client, test_user_data)
+
+        assert _refresh(client, "garbage").status_code == status.HTTP_401_UNAUTHORIZED
+        assert _refresh(client, "0" * 32 + ".secret").status_code == status.HTTP_401_UNAUTHORIZED
+        assert client.post("/auth/refresh").status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_expired_token_is_rejected(self, client, test_user_data, db_session):
+        """Test a session past its expiry cannot be refreshed."""
+        _register(client, test_user_data)
+        tokens = _login(client, test_user_data)
+        db_session.query(RefreshTokens).update({"expires_at": 0})
+        db_session.commit()
+
+        assert _refresh(client, tokens["refresh_token"]).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_login_sweeps_expired_sessions(self, client, test_user_data, db_session):
+        """Test lapsed sessions are deleted at the user's next login."""
+        _register(client, test_user_data)
+        _login(client, test_user_data)
+        db_session.query(RefreshTokens).update({"expires_at": 0})
+        db_session.commit()
+
+        _login(client, test_user_data)
+
+        db_session.expire_all()
+        assert db_session.query(RefreshTokens).count() == 1
+
+    def test_logout_revokes_session(self, client, test_user_data):
+        """Test logging out with a refresh token ends that session only."""
+        _register(client, test_user_data)
+        first = _login(client, test_user_data)
+        second = _login(client, test_user_data)
+
+        assert client.post("/auth/logout", json={"refresh_token": first["refresh_token"]}).status_code == 200
+
+        assert _refresh(client, first["refresh_token"]).status_code == status.HTTP_401_UNAUTHORIZED
+        assert _refresh(client, second["refresh_token"]).status_code == status.HTTP_200_OK
+
+    def test_password_change_revokes_all_sessions(self, client, test_user_data):
+        """Test changing the password signs out every device."""
+        _register(client, test_user_data)
+        first = _login(client, test_user_data)
+        second = _login(client, test_user_data)
+
+        response = client.patch(
+            "/user/change_password",
+            json={"old_password": test_user_data["password"], "new_password": "NewPassword456!"},
+            headers={"Authorization": f"Bearer {first['access_token']}"},
+        )
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+
+        assert _refresh(client, first["refresh_token"]).status_code == status.HTTP_401_UNAUTHORIZED
+        assert _refresh(client, second["refresh_token"]).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_delete_account_removes_sessions(self, client, test_user_data, db_session, wait_for_job):
+        """Test deleting the account leaves no refresh sessions behind."""
+        _register(client, test_user_data)
+        tokens = _login(client, test_user_data)
+
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        response = client.delete("/user/delete_account", headers=headers)
+
+        # Revoked in the request, before the deletion job has run.
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert db_session.query(RefreshTokens).count() == 0
+        wait_for_job(headers, response.json()["job_id"])
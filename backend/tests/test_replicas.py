@@ -0,0 +1,173 @@
+"""
+Read-replica routing tests.
+
+A second SQLite file stands in for the replica; `_replicate` copies the
+primary into it the way streaming replication eventually would.
+"""
+
+import os
+import sqlite3
+import tempfile
+
+import pytest
+from fastapi import status
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from backend import events, replicas
+from backend.tests.conftest import SQLALCHEMY_DATABASE_PATH, TestingAsyncSessionLocal
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _sessionmaker(path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    return async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+def _replicate(replica_path):
+    with sqlite3.connect(SQLALCHEMY_DATABASE_PATH) as primary, sqlite3.connect(replica_path) as replica:
+        primary.backup(replica)
+
+
+@pytest.fixture
+def replica_path():
+    return os.path.join(tempfile.mkdtemp(), "replica.db")
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def read_router(client, replica_path, clock):
+    """Route the app's reads through one replica; the client fixture restores the primary-only router."""
+    router = replicas.ReadRouter(
+        TestingAsyncSessionLocal, [replicas.Replica("replica-0", _sessionmaker(replica_path))],
+        read_your_writes_seconds=5, retry_seconds=10, clock=clock,
+    )
+    replicas.reads = router
+    return router
+
+
+def _create(client, headers, title):
+    response = client.post("/todo", json={"title": title, "description": "Replicated", "priority": 2}, headers=headers)
+    assert response.status_code == status.HTTP_201_CREATED
+    return client.get("/", headers=headers).json()[-1]["id"]
+
+
+class TestReplicas:
+    """Test suite for read-replica routing."""
+
+    def test_reads_go_to_replica(self, client, auth_headers, read_router, replica_path, clock):
+        """Test reads are served by the replica once the read-your-writes window has passed."""
+        todo_id = _create(client, auth_headers, "Before replication")
+        _replicate(replica_path)
+        client.put(f"/todo/{todo_id}", json={"title": "After replication", "description": "Replicated",
+                                             "priority": 2}, headers=auth_headers)
+        clock.now += 6
+
+        # The replica has not seen the update yet.
+        assert client.get(f"/todo/{todo_id}", headers=auth_headers).json()["title"] == "Before replication"
+        assert client.get("/", headers=auth_headers).json()[0]["title"] == "Before replication"
+        assert client.get("/user/get_user", headers=auth_headers).status_code == status.HTTP_200_OK
+
+    def test_own_writes_are_read_from_primary(self, client, auth_headers, read_router, replica_path, clock):
+        """Test a user reads their own write straight away, then from the replica again."""
+        todo_id = _create(client, auth_headers, "Before replication")
+        _replicate(replica_path)
+        clock.now += 6
+
+        client.put(f"/todo/{todo_id}", json={"title": "Just written", "description": "Replicated",
+                                             "priority": 2}, headers=auth_headers)
+
+        assert client.get(f"/todo/{todo_id}", headers=auth_headers).json()["title"] == "Just written"
+        clock.now += 6
+        assert client.get(f"/todo/{todo_id}", headers=auth_headers).json()["title"] == "Before replication"
+
+    def test_own_todo_writes_pin_reads_without_the_event_stream(self, client, auth_headers, read_router,
+                                                                replica_path, clock, monkeypatch):
+        """Test the writing worker pins reads itself, even when publishing the event fails."""
+        todo_id = _create(client, auth_headers, "Before replication")
+        _replicate(replica_path)
+        clock.now += 6
+
+        async def unreachable(owner_id, message):
+            raise ConnectionError("broker is down")
+
+        monkeypatch.setattr(events.broker, "publish", unreachable)
+        batch = {"operations": [{"op": "update", "id": todo_id, "todo": {
+            "title": "Batched", "description": "Replicated", "priority": 2}}]}
+        assert client.post("/todo/batch", json=batch, headers=auth_headers).status_code == status.HTTP_200_OK
+
+        assert client.get(f"/todo/{todo_id}", headers=auth_headers).json()["title"] == "Batched"
+
+    def test_other_users_writes_do_not_pin_reads(self, read_router, clock):
+        """Test the read-your-writes window is per user."""
+        read_router.note_write(1)
+
+        assert read_router.choose(1) is None
+        assert read_router.choose(2) is read_router.replicas[0]
+
+    def test_profile_update_is_read_back(self, client, auth_headers, read_router, replica_path, clock):
+        """Test a profile change is visible to the user who made it."""
+        _replicate(replica_path)
+        clock.now += 6
+
+        client.put("/user/update_user", json={"first_name": "Renamed"}, headers=auth_headers)
+
+        assert client.get("/user/get_user", headers=auth_headers).json()["first_name"] == "Renamed"
+
+    def test_writes_never_reach_replica(self, client, auth_headers, read_router, replica_path, clock):
+        """Test writes land on the primary only."""
+        _replicate(replica_path)
+        _create(client, auth_headers, "Primary only")
+
+        with sqlite3.connect(replica_path) as replica:
+            assert replica.execute("SELECT count(*) FROM todos").fetchone() == (0,)
+
+    def test_round_robin_skips_replicas_that_are_down(self, clock):
+        """Test replicas are used in turn and a failed one sits out its retry window."""
+        a, b = replicas.Replica("a", None), replicas.Replica("b", None)
+        router = replicas.ReadRouter(None, [a, b], retry_seconds=10, clock=clock)
+
+        assert [router.choose() for _ in range(4)] == [a, b, a, b]
+        router.mark_down(a)
+        assert [router.choose() for _ in range(3)] == [b, b, b]
+        assert router.status() == [{"name": "a", "up": False}, {"name": "b", "up": True}]
+        clock.now += 11
+        assert {router.choose(), router.choose()} == {a, b}
+
+    def test_unreachable_replica_falls_back_to_primary(self, client, auth_headers, clock, caplog):
+        """Test a replica that cannot connect is marked down and the read is served by the primary."""
+        router = replicas.ReadRouter(
+            TestingAsyncSessionLocal,
+            [replicas.Replica("replica-0", _sessionmaker("/nonexistent/dir/replica.db"))],
+            clock=clock,
+        )
+        replicas.reads = router
+        _create(client, auth_headers, "Served by primary")
+        clock.now += 6
+
+        response = client.get("/", headers=auth_headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()[0]["title"] == "Served by primary"
+        assert router.status() == [{"name": "replica-0", "up": False}]
+        assert "read replica replica-0 is unavailable" in caplog.text
+        assert client.get("/health/ready").json()["replicas"] == [{"name": "replica-0", "up": False}]
+
+    def test_without_replicas_everything_reads_primary(self, clock):
+        """Test the default router never chooses a replica or tracks writers."""
+        router = replicas.ReadRouter(TestingAsyncSessionLocal, clock=clock)
+        router.note_write(1)
+
+        assert router.choose(1) is None
+        assert router._recent_writers == {}
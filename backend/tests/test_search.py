@@ -0,0 +1,104 @@
+"""
+Todo search tests.
+
+Tests for ranked full-text search through GET /todo/search.
+"""
+
+import pytest
+from fastapi import HTTPException, status
+from sqlalchemy import select
+
+from backend.models import Todos
+from backend.search import search_terms, search_todos
+
+
+def _todo(title, description="Nothing special", priority=1, complete=False):
+    return {"title": title, "description": description, "priority": priority, "complete": complete}
+
+
+def _create(client, headers, *todos):
+    response = client.post("/todo/batch", json={"operations": [{"op": "create", "todo": t} for t in todos]}, headers=headers)
+    return [r["id"] for r in response.json()["results"]]
+
+
+def _search(client, headers, **params):
+    response = client.get("/todo/search", params=params, headers=headers)
+    assert response.status_code == status.HTTP_200_OK, response.text
+    return [t["title"] for t in response.json()]
+
+
+class TestSearch:
+    """Test suite for todo search."""
+
+    def test_matches_title_and_description_by_prefix(self, client, auth_headers):
+        """Test every term matches as a word prefix in either field."""
+        _create(client, auth_headers,
+                _todo("Buy groceries", "Milk and bread"),
+                _todo("Call plumber", "About the kitchen sink"),
+                _todo("Write report", "Quarterly numbers"))
+
+        assert _search(client, auth_headers, q="groc") == ["Buy groceries"]
+        assert _search(client, auth_headers, q="kitch") == ["Call plumber"]
+        assert _search(client, auth_headers, q="milk bre") == ["Buy groceries"]
+        assert _search(client, auth_headers, q="milk plumber") == []
+
+    def test_results_are_ranked(self, client, auth_headers):
+        """Test a todo mentioning the term more often ranks first."""
+        _create(client, auth_headers,
+                _todo("Garden chores", "Water the plants"),
+                _todo("Garden layout", "Garden beds and garden paths"))
+
+        assert _search(client, auth_headers, q="garden") == ["Garden layout", "Garden chores"]
+
+    def test_combines_with_filters(self, client, auth_headers):
+        """Test complete and priority filters narrow the matches."""
+        _create(client, auth_headers,
+                _todo("Pay rent", priority=5, complete=True),
+                _todo("Pay bills", priority=5),
+                _todo("Pay back Sam", priority=2))
+
+        assert _search(client, auth_headers, q="pay", complete="false", priority=5) == ["Pay bills"]
+        assert len(_search(client, auth_headers, q="pay", limit=2)) == 2
+
+    def test_scoped_to_owner(self, client, auth_headers, admin_headers):
+        """Test another user's todos never match."""
+        _create(client, admin_headers, _todo("Secret plans"))
+
+        assert _search(client, auth_headers, q="secret") == []
+        assert _search(client, admin_headers, q="secret") == ["Secret plans"]
+
+    def test_index_follows_writes(self, client, auth_headers):
+        """Test updates and deletes are reflected in the search index."""
+        (todo_id,) = _create(client, auth_headers, _todo("Draft email"))
+
+        client.put(f"/todo/{todo_id}", json=_todo("Send invoice"), headers=auth_headers)
+        assert _search(client, auth_headers, q="draft") == []
+        assert _search(client, auth_headers, q="invoice") == ["Send invoice"]
+
+        client.delete(f"/todo/{todo_id}", headers=auth_headers)
+        assert _search(client, auth_headers, q="invoice") == []
+
+    def test_query_syntax_is_not_interpreted(self, client, auth_headers):
+        """Test FTS operators and quotes in the query are treated as plain words."""
+        _create(client, auth_headers, _todo("Fix NEAR bug"))
+
+        assert _search(client, auth_headers, q='"fix" OR -near*') == []
+        assert _search(client, auth_headers, q='fix" (near') == ["Fix NEAR bug"]
+        assert _search(client, auth_headers, q="!!!") == []
+
+    def test_postgres_query_uses_the_indexed_expression(self):
+        """Test the Postgres query repeats the GIN index expression verbatim."""
+        from sqlalchemy.dialects import postgresql
+
+        stmt = search_todos(select(Todos), "postgresql", search_terms("Buy Milk"))
+        sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+        assert "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, '')) @@ to_tsquery('english', 'buy:* & milk:*')" in sql
+        assert "ts_rank_cd" in sql
+
+    def test_unsupported_dialect_is_not_implemented(self):
+        """Test another database answers 501 rather than an unhandled error."""
+        with pytest.raises(HTTPException) as raised:
+            search_todos(select(Todos), "mysql", ["milk"])
+
+        assert raised.value.status_code == status.HTTP_501_NOT_IMPLEMENTED
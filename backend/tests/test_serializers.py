@@ -0,0 +1,39 @@
+"""
+Response serialization tests.
+
+Tests that the Core row + orjson list path matches the TodoResponse model.
+"""
+
+from sqlalchemy import select
+
+from backend.models import Todos
+from backend.serializers import TodoResponse, dump_todos, todo_select
+
+
+class TestSerializers:
+    """Test suite for todo response encoding."""
+
+    def test_list_path_matches_the_response_model(self, client, db_session, auth_headers):
+        """Test list and single-todo responses encode the same fields the same way."""
+        client.post("/todo/batch", json={"operations": [
+            {"op": "create", "todo": {"title": f"Todo {i}", "description": "Encoded", "priority": 1 + i, "complete": i == 1}}
+            for i in range(3)
+        ]}, headers=auth_headers)
+
+        listed = client.get("/", headers=auth_headers).json()
+        single = client.get(f"/todo/{listed[0]['id']}", headers=auth_headers).json()
+
+        expected = [TodoResponse.model_validate(t).model_dump(mode="json") for t in db_session.scalars(select(Todos).order_by(Todos.id))]
+        assert listed == expected
+        assert single == expected[0]
+        assert set(single) == set(TodoResponse.model_fields)
+
+    def test_dump_todos_encodes_core_rows(self, db_session):
+        """Test Core rows encode to a JSON array without ORM instances."""
+        db_session.add(Todos(title="Row", description="Core", priority=2, complete=False, owner_id=1))
+        db_session.commit()
+
+        rows = db_session.execute(todo_select()).all()
+
+        assert dump_todos(rows).startswith(b'[{"id":1,"title":"Row"')
+        assert dump_todos([]) == b"[]"
@@ -0,0 +1,253 @@
+"""
+Owner sharding tests.
+
+Two extra SQLite files stand in for shards 1 and 2; the test database is
+shard 0 and the user directory.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+
+import pytest
+from fastapi import status
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from backend import shards
+from backend.database import Base
+from backend.tests.conftest import SQLALCHEMY_DATABASE_PATH, TestingAsyncSessionLocal, _bearer_headers
+
+
+def _user(name, role="user"):
+    return {
+        "username": name, "email": f"{name}@example.com", "first_name": name, "last_name": "Sharded",
+        "role": role, "password": "SecurePassword123!",
+    }
+
+
+def _todo(title, priority=2):
+    return {"title": title, "description": "Sharded", "priority": priority}
+
+
+def _count(path, sql, *params):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(sql, params).fetchone()[0]
+
+
+@pytest.fixture
+async def shard_paths():
+    directory = tempfile.mkdtemp()
+    paths = [SQLALCHEMY_DATABASE_PATH]
+    for index in (1, 2):
+        path = os.path.join(directory, f"shard{index}.db")
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await shards.prepare_shard(conn, index)
+        await engine.dispose()
+        paths.append(path)
+    return paths
+
+
+@pytest.fixture
+def sharded(client, shard_paths):
+    """Three shards; the client fixture restores the single-database cluster."""
+    engines = [create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool) for path in shard_paths[1:]]
+    sessionmakers = [TestingAsyncSessionLocal] + [
+        async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+        for engine in engines
+    ]
+    shards.cluster = shards.ShardCluster(sessionmakers, engines=engines)
+    return shard_paths
+
+
+@pytest.fixture
+def users(client, sharded):
+    """Headers for users 1, 2 and 3, homed on shards 1, 2 and 0; user 3 is an admin."""
+    return [_bearer_headers(client, _user(name, role)) for name, role in
+            (("alice", "user"), ("bob", "user"), ("carol", "admin"))]
+
+
+class TestShards:
+    """Test suite for owner-sharded todo storage."""
+
+    def test_shard_map(self):
+        """Test modulo placement, pins, and owners kept on shard 0 below the cut-over id."""
+        shard_map = shards.ShardMap(3, pins={7: 2}, from_owner_id=5)
+
+        assert [shard_map.shard_for(i) for i in (1, 4, 5, 6, 7, 8)] == [0, 0, 2, 0, 2, 2]
+        assert shards.parse_pins("7:2, 9:1") == {7: 2, 9: 1}
+        with pytest.raises(ValueError):
+            shards.ShardMap(2, pins={1: 2})
+
+    def test_todos_live_on_owner_shard(self, client, users, sharded):
+        """Test each owner's todos and stub user row are on their shard, with ids from its range."""
+        for headers, title in zip(users, ("Alice's", "Bob's", "Carol's")):
+            assert client.post("/todo", json=_todo(title), headers=headers).status_code == status.HTTP_201_CREATED
+
+        for index, (path, title) in enumerate(zip(sharded, ("Carol's", "Alice's", "Bob's"))):
+            assert _count(path, "SELECT count(*) FROM todos") == 1
+            assert _count(path, "SELECT title FROM todos") == title
+            assert _count(path, "SELECT min(id) FROM todos") > index << shards.SHARD_ID_BITS
+        # The shard's users row is a stub; the directory keeps the profile.
+        assert _count(sharded[1], "SELECT count(*) FROM users WHERE id = 1 AND hashed_password IS NULL") == 1
+        assert _count(sharded[0], "SELECT count(*) FROM users") == 3
+
+    def test_owner_endpoints_on_a_shard(self, client, users):
+        """Test the owner's reads, writes, stats and sync all work against their shard."""
+        alice = users[0]
+        client.post("/todo", json=_todo("First"), headers=alice)
+        todo_id = client.get("/", headers=alice).json()[0]["id"]
+
+        client.put(f"/todo/{todo_id}", json={**_todo("Renamed"), "complete": True}, headers=alice)
+        assert client.get(f"/todo/{todo_id}", headers=alice).json()["title"] == "Renamed"
+        assert client.get("/todo/stats", headers=alice).json()["completed"] == 1
+        assert client.get("/todo/search", params={"q": "renamed"}, headers=alice).json()[0]["id"] == todo_id
+        assert client.delete(f"/todo/{todo_id}", headers=alice).status_code == status.HTTP_204_NO_CONTENT
+        assert client.get("/todo/changes", params={"since": 1}, headers=alice).json()["deleted"] == [todo_id]
+        assert client.get(f"/todo/{todo_id}", headers=users[1]).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_admin_list_merges_shards(self, client, users):
+        """Test the admin listing merges every shard in sort order and pages across them."""
+        for headers, priorities in zip(users, ((1, 4), (3,), (2, 5))):
+            for priority in priorities:
+                client.post("/todo", json=_todo(f"Priority {priority}", priority), headers=headers)
+        admin = users[2]
+
+        by_id = client.get("/admin/todo", headers=admin).json()
+        assert [t["id"] for t in by_id] == sorted(t["id"] for t in by_id)
+        assert len(by_id) == 5
+
+        first = client.get("/admin/todo", params={"sort": "-priority", "limit": 3}, headers=admin)
+        second = client.get("/admin/todo", params={"sort": "-priority", "limit": 3,
+                                                   "after": first.headers["X-Next-Cursor"]}, headers=admin)
+        assert [t["priority"] for t in first.json() + second.json()] == [5, 4, 3, 2, 1]
+        assert "X-Next-Cursor" not in second.headers
+
+    def test_admin_stats_and_export_cover_every_shard(self, client, users):
+        """Test system stats and the export add up all shards."""
+        for headers in users:
+            client.post("/todo", json=_todo("Counted"), headers=headers)
+        admin = users[2]
+
+        stats = client.get("/admin/stats", headers=admin).json()
+        assert (stats["total"], stats["owners"]) == (3, 3)
+        exported = [json.loads(line) for line in client.get("/admin/todo/export", headers=admin).text.splitlines()]
+        assert sorted(t["owner_id"] for t in exported) == [1, 2, 3]
+        assert [t["id"] for t in exported] == sorted(t["id"] for t in exported)
+
+    def test_admin_writes_find_the_todo_shard(self, client, users, sharded):
+        """Test admin update and delete by id reach the shard that holds the todo."""
+        bob, admin = users[1], users[2]
+        client.post("/todo", json=_todo("Bob's"), headers=bob)
+        todo_id = client.get("/", headers=bob).json()[0]["id"]
+
+        response = client.put(f"/admin/todo/{todo_id}", json={"title": "Moderated"}, headers=admin)
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert client.get(f"/todo/{todo_id}", headers=bob).json()["title"] == "Moderated"
+
+        assert client.delete(f"/admin/todo/{todo_id}", headers=admin).status_code == status.HTTP_204_NO_CONTENT
+        assert _count(sharded[2], "SELECT count(*) FROM todos") == 0
+        assert client.delete(f"/admin/todo/{todo_id}", headers=admin).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_delete_account_clears_shard(self, client, users, sharded, wait_for_job):
+        """Test deleting an account removes its todos and stub from its shard."""
+        alice = users[0]
+        client.post("/todo", json=_todo("Gone soon"), headers=alice)
+
+        response = client.delete("/user/delete_account", headers=alice)
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert wait_for_job(alice, response.json()["job_id"])["status"] == "succeeded"
+
+        assert _count(sharded[1], "SELECT count(*) FROM todos") == 0
+        assert _count(sharded[1], "SELECT count(*) FROM users") == 0
+        assert _count(sharded[0], "SELECT count(*) FROM users WHERE id = 1") == 0
+
+    def test_todo_ids_are_64_bit_on_postgres(self):
+        """Test todo ids (and tombstones' references to them) can hold a shard's offset on Postgres."""
+        from sqlalchemy.dialects import postgresql
+        from sqlalchemy.schema import CreateTable
+
+        from backend.models import Todos, TodoTombstones
+
+        assert "id BIGSERIAL" in str(CreateTable(Todos.__table__).compile(dialect=postgresql.dialect()))
+        assert "todo_id BIGINT" in str(CreateTable(TodoTombstones.__table__).compile(dialect=postgresql.dialect()))
+
+    async def test_unseeded_shards_are_found_and_prepared(self, db_session):
+        """Test the check names a shard created without its id offset, and prepare fixes it."""
+        path = os.path.join(tempfile.mkdtemp(), "fresh.db")
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        assert await shards.unprepared_shards([engine]) == [1]
+        await shards.prepare_shards([engine])
+        await shards.prepare_shards([engine])
+        assert await shards.unprepared_shards([engine]) == []
+        await engine.dispose()
+
+    def test_first_write_creates_a_missing_stub(self, client, users, sharded, monkeypatch):
+        """Test an owner whose stub was never created can still write; registration does not fail for it."""
+        async def unavailable(owner_id, username):
+            raise ConnectionError("shard is down")
+
+        monkeypatch.setattr(shards.cluster, "ensure_owner", unavailable)
+        dave = _bearer_headers(client, _user("dave"))
+        assert _count(sharded[1], "SELECT count(*) FROM users WHERE id = 4") == 0
+
+        assert client.post("/todo", json=_todo("Dave's"), headers=dave).status_code == status.HTTP_201_CREATED
+        assert _count(sharded[1], "SELECT version FROM users WHERE id = 4") == 1
+        assert _count(sharded[1], "SELECT count(*) FROM todos WHERE owner_id = 4") == 1
+
+    def test_deleted_owner_cannot_write(self, client, users, sharded, wait_for_job):
+        """Test a token that outlived its account does not bring the shard stub back."""
+        alice = users[0]
+        response = client.delete("/user/delete_account", headers=alice)
+        wait_for_job(alice, response.json()["job_id"])
+
+        assert client.post("/todo", json=_todo("Ghost"), headers=alice).status_code == status.HTTP_404_NOT_FOUND
+        assert _count(sharded[1], "SELECT count(*) FROM users") == 0
+
+    def test_no_writes_while_the_account_is_deleted(self, client, users, sharded, hold_jobs, wait_for_job):
+        """Test the deactivated owner's stub turns away todo writes and admin writes before the job runs."""
+        alice, admin = users[0], users[2]
+        client.post("/todo", json=_todo("Alice's"), headers=alice)
+        todo_id = client.get("/", headers=alice).json()[0]["id"]
+        gate = hold_jobs("delete_account")
+        response = client.delete("/user/delete_account", headers=alice)
+
+        assert _count(sharded[1], "SELECT is_active FROM users WHERE id = 1") == 0
+        assert client.post("/todo", json=_todo("Ghost"), headers=alice).status_code == status.HTTP_404_NOT_FOUND
+        assert client.delete(f"/todo/{todo_id}", headers=alice).status_code == status.HTTP_404_NOT_FOUND
+        assert client.put(f"/admin/todo/{todo_id}", json={"title": "Nope"},
+                          headers=admin).status_code == status.HTTP_404_NOT_FOUND
+        gate.set()
+
+        assert wait_for_job(alice, response.json()["job_id"])["status"] == "succeeded"
+        assert _count(sharded[1], "SELECT count(*) FROM todos") == 0
+
+    def test_query_budget_counts_shard_statements(self, client, users, sharded, query_budget):
+        """Test a write homed on a shard is budgeted like one on the main database."""
+        alice = users[0]
+        client.post("/todo", json=_todo("Alice's"), headers=alice)
+        todo_id = client.get("/", headers=alice).json()[0]["id"]
+
+        with query_budget(2) as profile:
+            client.put(f"/todo/{todo_id}", json=_todo("Renamed"), headers=alice)
+
+        assert [s.split()[0] for s, _ in profile.statements] == ["UPDATE", "UPDATE"]
+
+    def test_admin_writes_refuse_an_ambiguous_id(self, client, users, sharded):
+        """Test a todo id present on two shards is neither updated nor deleted."""
+        alice, admin = users[0], users[2]
+        client.post("/todo", json=_todo("Alice's"), headers=alice)
+        todo_id = client.get("/", headers=alice).json()[0]["id"]
+        with sqlite3.connect(sharded[2]) as conn:
+            conn.execute("INSERT INTO todos (id, title, owner_id, version) VALUES (?, 'Clash', 2, 1)", (todo_id,))
+
+        assert client.delete(f"/admin/todo/{todo_id}", headers=admin).status_code == status.HTTP_409_CONFLICT
+        assert client.put(f"/admin/todo/{todo_id}", json={"title": "Nope"}, headers=admin).status_code == status.HTTP_409_CONFLICT
+        assert _count(sharded[1], "SELECT title FROM todos") == "Alice's"
+        assert _count(sharded[2], "SELECT title FROM todos") == "Clash"
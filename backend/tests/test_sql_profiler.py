@@ -0,0 +1,119 @@
+"""
+SQL profiler tests.
+
+Tests for statement normalization, the per-request profiler middleware and
+the query budgets of the main todo endpoints.
+"""
+
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from backend import sql_profiler
+from backend.sql_profiler import SQLProfilerMiddleware, normalize
+
+
+def _todo(title):
+    return {"title": title, "description": "Budgeted", "priority": 1, "complete": False}
+
+
+class TestNormalize:
+    """Test suite for statement shapes."""
+
+    def test_literals_and_placeholders_collapse(self):
+        """Test statements differing only in values share a shape."""
+        assert normalize("SELECT * FROM todos WHERE id = 5 AND title = 'it''s'") == normalize(
+            "SELECT *  FROM todos\n WHERE id = ? AND title = $1"
+        )
+
+    def test_in_lists_collapse(self):
+        """Test IN lists of any length share a shape."""
+        assert normalize("DELETE FROM todos WHERE id IN (?, ?, ?)") == normalize("DELETE FROM todos WHERE id IN (?, ?)")
+
+
+class TestProfilerMiddleware:
+    """Test suite for per-request attribution."""
+
+    def _app(self, statements):
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        sql_profiler.install(engine)
+        app = FastAPI()
+        app.add_middleware(SQLProfilerMiddleware, repeat_threshold=3)
+
+        @app.get("/")
+        async def run():
+            async with engine.connect() as conn:
+                for i in range(statements):
+                    await conn.execute(text(f"SELECT {i}"))
+            return {}
+
+        return app
+
+    def test_server_timing_header(self):
+        """Test each response reports its query count and time."""
+        with TestClient(self._app(2)) as client:
+            header = client.get("/").headers["server-timing"]
+
+        assert header.startswith("db;dur=")
+        assert 'desc="2 queries"' in header
+
+    def test_repeated_statements_are_flagged(self, caplog):
+        """Test a request repeating one statement shape is logged as a likely N+1."""
+        with caplog.at_level(logging.WARNING, logger="backend.sql_profiler"):
+            with TestClient(self._app(4)) as client:
+                client.get("/")
+
+        assert any("possible N+1 in GET /: 4 x SELECT ?" in r.getMessage() for r in caplog.records)
+
+    def test_slow_queries_are_logged(self, caplog, monkeypatch):
+        """Test statements over the threshold are logged with their shape."""
+        monkeypatch.setattr(sql_profiler, "SQL_SLOW_QUERY_MS", 0)
+
+        with caplog.at_level(logging.WARNING, logger="backend.sql_profiler"):
+            with TestClient(self._app(1)) as client:
+                client.get("/")
+
+        assert any(r.getMessage().startswith("slow query") and "in GET /: SELECT ?" in r.getMessage() for r in caplog.records)
+
+
+class TestQueryBudgets:
+    """Exact statement counts for the hot endpoints."""
+
+    def test_list_todos(self, client, auth_headers, query_budget):
+        """Test a cold list is a version lookup plus one SELECT, a warm one only the lookup."""
+        with query_budget(2):
+            client.get("/", headers=auth_headers)
+        with query_budget(1):
+            client.get("/", headers=auth_headers)
+
+    def test_update_and_delete_todo(self, client, auth_headers, query_budget):
+        """Test writes are one statement plus the version bump; deletes add a tombstone."""
+        created = client.post("/todo/batch", json={"operations": [{"op": "create", "todo": _todo("One")}]}, headers=auth_headers)
+        todo_id = created.json()["results"][0]["id"]
+
+        with query_budget(2):
+            client.put(f"/todo/{todo_id}", json=_todo("Two"), headers=auth_headers)
+        with query_budget(3):
+            client.delete(f"/todo/{todo_id}", headers=auth_headers)
+
+    def test_admin_update_and_delete_todo(self, client, auth_headers, admin_headers, query_budget):
+        """Test admin writes cost what the owner's do: the bump finds the owner, no lookup first."""
+        created = client.post("/todo/batch", json={"operations": [{"op": "create", "todo": _todo("One")}]}, headers=auth_headers)
+        todo_id = created.json()["results"][0]["id"]
+
+        with query_budget(2):
+            assert client.put(f"/admin/todo/{todo_id}", json={"title": "Two"}, headers=admin_headers).status_code == 204
+        with query_budget(3):
+            assert client.delete(f"/admin/todo/{todo_id}", headers=admin_headers).status_code == 204
+        with query_budget(1):
+            assert client.delete(f"/admin/todo/{todo_id}", headers=admin_headers).status_code == 404
+
+    def test_changes_since_current_version(self, client, auth_headers, query_budget):
+        """Test a sync with nothing new is only the version lookup."""
+        version = client.get("/todo/changes", headers=auth_headers).json()["version"]
+
+        with query_budget(1):
+            client.get("/todo/changes", params={"since": version}, headers=auth_headers)
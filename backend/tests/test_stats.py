@@ -0,0 +1,110 @@
+"""
+Todo statistics tests.
+
+Tests for /todo/stats, /admin/stats and the maintained todo counts.
+"""
+
+from fastapi import status
+
+from backend.stats import summarize
+
+
+def _todo(title, priority=1, complete=False):
+    return {"title": title, "description": "Counted", "priority": priority, "complete": complete}
+
+
+def _batch(client, headers, operations):
+    response = client.post("/todo/batch", json={"operations": operations}, headers=headers)
+    return [r["id"] for r in response.json()["results"]]
+
+
+def _stats(client, headers, url="/todo/stats"):
+    response = client.get(url, headers=headers)
+    assert response.status_code == status.HTTP_200_OK, response.text
+    return response.json()
+
+
+def _expected(client, headers):
+    """The stats recomputed from the full list, as the dashboard used to."""
+    todos = client.get("/", headers=headers).json()
+    return summarize((t["priority"], t["complete"], 1) for t in todos)
+
+
+class TestStats:
+    """Test suite for todo statistics."""
+
+    def test_empty(self, client, auth_headers):
+        """Test a user without todos gets zeros."""
+        assert _stats(client, auth_headers) == {
+            "total": 0, "completed": 0, "open": 0, "completion_rate": 0.0, "by_priority": [],
+        }
+
+    def test_counts_follow_every_write_path(self, client, auth_headers, admin_headers):
+        """Test creates, updates and deletes through every route keep the counts exact."""
+        a, b, c, d = _batch(client, auth_headers, [
+            {"op": "create", "todo": _todo("One", 1)},
+            {"op": "create", "todo": _todo("Two", 2, True)},
+            {"op": "create", "todo": _todo("Three", 2)},
+            {"op": "create", "todo": _todo("Four", 5)},
+        ])
+        client.post("/todo", json=_todo("Five", 3, True), headers=auth_headers)
+        client.put(f"/todo/{a}", json=_todo("One", 4, True), headers=auth_headers)
+        client.delete(f"/todo/{b}", headers=auth_headers)
+        _batch(client, auth_headers, [
+            {"op": "update", "id": c, "todo": _todo("Three", 2, True)},
+            {"op": "delete", "id": d},
+        ])
+        client.put(f"/admin/todo/{c}", json={"priority": 1}, headers=admin_headers)
+
+        stats = _stats(client, auth_headers)
+
+        assert stats == _expected(client, auth_headers)
+        assert stats["total"] == 3
+        assert stats["completed"] == 3
+        assert stats["completion_rate"] == 1.0
+        assert [p["priority"] for p in stats["by_priority"]] == [1, 3, 4]
+
+        client.delete(f"/admin/todo/{c}", headers=admin_headers)
+        assert _stats(client, auth_headers)["total"] == 2
+
+    def test_completion_rate_and_priorities(self, client, auth_headers):
+        """Test the rate and per-priority breakdown."""
+        _batch(client, auth_headers, [
+            {"op": "create", "todo": _todo(f"Todo {i}", priority=1 + i % 2, complete=i < 1)} for i in range(4)
+        ])
+
+        stats = _stats(client, auth_headers)
+
+        assert stats["completion_rate"] == 0.25
+        assert stats["by_priority"] == [
+            {"priority": 1, "total": 2, "completed": 1},
+            {"priority": 2, "total": 2, "completed": 0},
+        ]
+
+    def test_stats_support_conditional_requests(self, client, auth_headers):
+        """Test unchanged stats revalidate with a 304."""
+        etag = client.get("/todo/stats", headers=auth_headers).headers["etag"]
+
+        response = client.get("/todo/stats", headers={**auth_headers, "If-None-Match": etag})
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_admin_stats_cover_all_users(self, client, auth_headers, admin_headers):
+        """Test the admin view aggregates every owner's counts."""
+        _batch(client, auth_headers, [{"op": "create", "todo": _todo("Mine", 1, True)}])
+        _batch(client, admin_headers, [{"op": "create", "todo": _todo("Admin's", 1)}])
+
+        stats = _stats(client, admin_headers, "/admin/stats")
+
+        assert stats["total"] == 2
+        assert stats["completed"] == 1
+        assert stats["owners"] == 2
+        assert client.get("/admin/stats", headers=auth_headers).status_code == status.HTTP_403_FORBIDDEN
+
+    def test_stats_read_is_constant(self, client, auth_headers, query_budget):
+        """Test stats are a version lookup and one counts read however many todos exist."""
+        _batch(client, auth_headers, [{"op": "create", "todo": _todo(f"Todo {i}", 1 + i % 5)} for i in range(200)])
+
+        with query_budget(2) as profile:
+            assert _stats(client, auth_headers)["total"] == 200
+        assert "todo_counts" in profile.statements[-1][0]
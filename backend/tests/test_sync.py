@@ -0,0 +1,141 @@
+"""
+Delta sync tests.
+
+Tests for GET /todo/changes and the change versions stamped on todos.
+"""
+
+import time
+from datetime import datetime, timezone
+
+from fastapi import status
+from sqlalchemy import select, update
+
+from backend.models import Jobs, TodoTombstones
+
+
+def _todo(title, priority=1, complete=False):
+    return {"title": title, "description": "Synced", "priority": priority, "complete": complete}
+
+
+def _batch(client, headers, operations):
+    response = client.post("/todo/batch", json={"operations": operations}, headers=headers)
+    return [r["id"] for r in response.json()["results"]]
+
+
+def _changes(client, headers, since=None):
+    params = {} if since is None else {"since": since}
+    response = client.get("/todo/changes", params=params, headers=headers)
+    assert response.status_code == status.HTTP_200_OK, response.text
+    return response.json()
+
+
+def _prune_now(db_session, timeout=10):
+    # The runner queued the pruning job at start; bring it forward and wait.
+    job = db_session.scalars(select(Jobs).where(Jobs.kind == "prune_tombstones")).one()
+    job.run_after = 0
+    db_session.commit()
+    deadline = time.monotonic() + timeout
+    while job.status in ("queued", "running"):
+        assert time.monotonic() < deadline, job.status
+        time.sleep(0.02)
+        db_session.refresh(job)
+    assert job.status == "succeeded", job.error
+
+
+class TestDeltaSync:
+    """Test suite for the changes endpoint."""
+
+    def test_first_sync_is_a_reset(self, client, auth_headers):
+        """Test a sync without `since` returns the whole list."""
+        _batch(client, auth_headers, [{"op": "create", "todo": _todo(f"Todo {i}")} for i in range(3)])
+
+        body = _changes(client, auth_headers)
+
+        assert body["reset"] is True
+        assert [t["title"] for t in body["todos"]] == ["Todo 0", "Todo 1", "Todo 2"]
+        assert body["deleted"] == []
+        assert body["version"] >= 1
+
+    def test_only_changes_since_the_last_sync(self, client, auth_headers):
+        """Test inserts, updates and deletes after `since` are all that is returned."""
+        a, b, c = _batch(client, auth_headers, [{"op": "create", "todo": _todo(f"Todo {i}")} for i in range(3)])
+        since = _changes(client, auth_headers)["version"]
+
+        client.put(f"/todo/{a}", json=_todo("Renamed", complete=True), headers=auth_headers)
+        client.delete(f"/todo/{b}", headers=auth_headers)
+        (d,) = _batch(client, auth_headers, [{"op": "create", "todo": _todo("Added")}])
+
+        body = _changes(client, auth_headers, since)
+
+        assert body["reset"] is False
+        assert [(t["id"], t["title"]) for t in body["todos"]] == [(a, "Renamed"), (d, "Added")]
+        assert body["deleted"] == [b]
+        assert body["version"] == since + 3
+        assert all(t["version"] > since and t["updated_at"] for t in body["todos"])
+
+        again = _changes(client, auth_headers, body["version"])
+        assert again["todos"] == [] and again["deleted"] == []
+
+    def test_batch_and_admin_writes_are_tracked(self, client, auth_headers, admin_headers):
+        """Test batch and admin writes stamp versions and leave tombstones."""
+        a, b = _batch(client, auth_headers, [{"op": "create", "todo": _todo(f"Todo {i}")} for i in range(2)])
+        since = _changes(client, auth_headers)["version"]
+
+        _batch(client, auth_headers, [{"op": "update", "id": a, "todo": _todo("Batched")}, {"op": "delete", "id": b}])
+        body = _changes(client, auth_headers, since)
+        assert [t["title"] for t in body["todos"]] == ["Batched"]
+        assert body["deleted"] == [b]
+
+        client.put(f"/admin/todo/{a}", json={"priority": 4}, headers=admin_headers)
+        body = _changes(client, auth_headers, body["version"])
+        assert [t["priority"] for t in body["todos"]] == [4]
+
+        client.delete(f"/admin/todo/{a}", headers=admin_headers)
+        body = _changes(client, auth_headers, body["version"])
+        assert body["todos"] == [] and body["deleted"] == [a]
+
+    def test_future_version_resets(self, client, auth_headers):
+        """Test a `since` the server has never issued falls back to a full sync."""
+        _batch(client, auth_headers, [{"op": "create", "todo": _todo("Only")}])
+
+        body = _changes(client, auth_headers, since=10_000)
+
+        assert body["reset"] is True
+        assert [t["title"] for t in body["todos"]] == ["Only"]
+
+    def test_changes_are_owner_scoped(self, client, auth_headers, admin_headers):
+        """Test another user's writes never show up."""
+        since = _changes(client, auth_headers)["version"]
+        (other,) = _batch(client, admin_headers, [{"op": "create", "todo": _todo("Admin's")}])
+        client.delete(f"/todo/{other}", headers=admin_headers)
+
+        body = _changes(client, auth_headers, since)
+
+        assert body["version"] == since
+        assert body["todos"] == [] and body["deleted"] == []
+
+    def test_syncs_from_before_pruned_tombstones_reset(self, client, auth_headers, db_session):
+        """Test old tombstones are pruned, and only syncs that would miss them start over."""
+        a, b, c = _batch(client, auth_headers, [{"op": "create", "todo": _todo(f"Todo {i}")} for i in range(3)])
+        before_deletes = _changes(client, auth_headers)["version"]
+        client.delete(f"/todo/{a}", headers=auth_headers)
+        after_first = _changes(client, auth_headers)["version"]
+        client.delete(f"/todo/{b}", headers=auth_headers)
+        db_session.execute(
+            update(TodoTombstones).where(TodoTombstones.todo_id == a)
+            .values(deleted_at=datetime(2000, 1, 1, tzinfo=timezone.utc))
+        )
+        db_session.commit()
+
+        _prune_now(db_session)
+
+        assert db_session.scalars(select(TodoTombstones.todo_id)).all() == [b]
+        body = _changes(client, auth_headers, before_deletes)
+        assert body["reset"] is True
+        assert [t["id"] for t in body["todos"]] == [c]
+        body = _changes(client, auth_headers, after_first)
+        assert body["reset"] is False
+        assert body["deleted"] == [b]
+        assert db_session.scalars(
+            select(Jobs.status).where(Jobs.kind == "prune_tombstones").order_by(Jobs.id)
+        ).all() == ["succeeded", "queued"]
@@ -0,0 +1,74 @@
+"""
+Verified-token cache tests.
+
+Tests for the LRU/TTL cache in front of decode_token.
+"""
+
+import time
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from backend.routers import auth
+from backend.token_cache import TokenCache, token_cache
+
+
+class TestTokenCache:
+    """Test suite for the token cache."""
+
+    def test_second_decode_is_a_hit(self, monkeypatch):
+        """Test a verified token is not decoded again while cached."""
+        token_cache.clear()
+        token = auth.create_access_token("cached", 7, "user", timedelta(minutes=5))
+
+        assert auth.decode_token(token) == {"username": "cached", "id": 7, "role": "user"}
+
+        def fail(*args, **kwargs):
+            raise AssertionError("jwt.decode should not run on a cache hit")
+
+        monkeypatch.setattr(auth.jwt, "decode", fail)
+        assert auth.decode_token(token)["id"] == 7
+        assert token_cache.snapshot()["hits"] == 1
+        assert token_cache.snapshot()["misses"] == 1
+
+    def test_invalid_tokens_are_not_cached(self):
+        """Test a token that fails verification is rejected every time."""
+        token_cache.clear()
+
+        for _ in range(2):
+            with pytest.raises(HTTPException):
+                auth.decode_token("not-a-jwt")
+        assert token_cache.snapshot()["size"] == 0
+
+    def test_entries_expire_with_the_token(self):
+        """Test an entry is dropped once its token's exp has passed."""
+        cache = TokenCache(max_entries=10)
+        cache.put("token", {"id": 1}, time.time() + 0.05)
+        assert cache.get("token") == {"id": 1}
+
+        time.sleep(0.1)
+        assert cache.get("token") is None
+        assert cache.snapshot()["size"] == 0
+
+    def test_size_is_capped_lru(self):
+        """Test the least recently used entry is evicted at the cap."""
+        cache = TokenCache(max_entries=2)
+        expires = time.time() + 60
+        cache.put("a", {"id": 1}, expires)
+        cache.put("b", {"id": 2}, expires)
+        cache.get("a")
+        cache.put("c", {"id": 3}, expires)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == {"id": 1}
+        assert cache.snapshot()["evictions"] == 1
+        assert cache.snapshot()["size"] == 2
+
+    def test_cached_claims_cannot_be_mutated(self):
+        """Test callers get a copy of the cached claims."""
+        cache = TokenCache(max_entries=2)
+        cache.put("a", {"id": 1}, time.time() + 60)
+
+        cache.get("a")["id"] = 99
+        assert cache.get("a") == {"id": 1}
@@ -5,32 +5,13 @@ Tests for user profile endpoints including delete account functionality.
 """
 
 from fastapi import status
-import pytest
-
-
-@pytest.fixture
-def auth_headers(client, test_user_data):
-    """Get authentication headers for a test user."""
-    # Register the user
-    client.post("/auth/", json=test_user_data)
-    
-    # Login and get token
-    response = client.post(
-        "/auth/token",
-        data={
-            "username": test_user_data["username"],
-            "password": test_user_data["password"],
-        },
-        headers={"Content-Type": "application/x-www-form-urlencoded"},
-    )
-    token = response.json()["access_token"]
-    return {"Authorization": f"Bearer {token}"}
+
 
 
 class TestUserEndpoints:
     """Test suite for user endpoints."""
 
-    def test_delete_account_success(self, client, db_session, auth_headers):
+    def test_delete_account_success(self, client, db_session, auth_headers, wait_for_job):
         """Test successful account deletion."""
         from backend.models import Users
 
@@ -40,14 +21,33 @@ class TestUserEndpoints:
 
         # Delete account
         response = client.delete("/user/delete_account", headers=auth_headers)
-        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        job = wait_for_job(auth_headers, response.json()["job_id"])
+        assert job["status"] == "succeeded"
 
         # Verify user no longer exists
         db_session.expire_all()
         user = db_session.query(Users).filter(Users.username == "testuser").first()
         assert user is None
 
-    def test_delete_account_also_deletes_todos(self, client, db_session, auth_headers):
+    def test_no_writes_while_the_account_is_deleted(self, client, db_session, auth_headers, hold_jobs,
+                                                    wait_for_job):
+        """Test the old token cannot add todos behind the deletion job's back."""
+        from backend.models import Todos
+
+        gate = hold_jobs("delete_account")
+        response = client.delete("/user/delete_account", headers=auth_headers)
+        assert response.status_code == status.HTTP_202_ACCEPTED
+
+        todo = {"title": "Too late", "description": "Written after delete", "priority": 1}
+        assert client.post("/todo", json=todo, headers=auth_headers).status_code == status.HTTP_404_NOT_FOUND
+        gate.set()
+
+        assert wait_for_job(auth_headers, response.json()["job_id"])["status"] == "succeeded"
+        db_session.expire_all()
+        assert db_session.query(Todos).count() == 0
+
+    def test_delete_account_also_deletes_todos(self, client, db_session, auth_headers, wait_for_job):
         """Test that deleting account also removes associated todos."""
         from backend.models import Users, Todos
 
@@ -72,7 +72,8 @@ class TestUserEndpoints:
 
         # Delete account
         response = client.delete("/user/delete_account", headers=auth_headers)
-        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        wait_for_job(auth_headers, response.json()["job_id"])
 
         # Verify todos are also deleted
         db_session.expire_all()
@@ -0,0 +1,78 @@
+"""
+Verified-token cache.
+
+Clients reuse one access token for its whole lifetime, so the claims decoded
+from a token are kept until the token's own `exp`. Entries are keyed by a
+SHA-256 of the token (the raw token is never stored), evicted least recently
+used first, and both the entry count and the size of a cacheable token are
+capped so the cache cannot grow without bound.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv('TOKEN_CACHE_MAX_ENTRIES', '10000'))
+# Tokens longer than this are verified every time rather than cached.
+TOKEN_CACHE_MAX_TOKEN_BYTES = int(os.getenv('TOKEN_CACHE_MAX_TOKEN_BYTES', '4096'))
+
+
+class TokenCache:
+    """Thread-safe LRU of decoded claims, each valid until its `exp`."""
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry[1])
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, token: str, claims: dict, expires_at: float):
+        if self.max_entries <= 0 or len(token) > TOKEN_CACHE_MAX_TOKEN_BYTES or expires_at <= time.time():
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, dict(claims))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+token_cache = TokenCache()
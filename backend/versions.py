@@ -0,0 +1,134 @@
+"""
+Per-owner data versions and conditional GETs.
+
+Every user row carries a `version` that each write to the user or to their
+todos bumps inside the same transaction. Reads look it up with one primary key
+lookup and answer a matching If-None-Match with 304 before anything else is
+queried or serialized. The todo cache keys its entries by the same version.
+
+Todo writes also stamp the new version on the rows they touch (and on a
+tombstone per deleted todo), which is what delta sync reads. Writers bump
+first: the UPDATE locks the user row until commit, so one owner's writes
+commit in version order and a client that has seen version N has seen
+every change up to N. Old tombstones are pruned, raising the owner's
+tombstone_horizon; a client that last synced before it has to start over.
+"""
+
+import hashlib
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy import and_, bindparam, case, delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from backend.models import TodoTombstones, Todos, Users
+
+
+async def owner_version(db: AsyncSession, owner_id: int) -> Optional[int]:
+    """The owner's current version, or None if the user does not exist."""
+    return await db.scalar(select(Users.version).where(Users.id == owner_id))
+
+
+async def sync_point(db: AsyncSession, owner_id: int) -> tuple:
+    """(version, tombstone horizon) of the owner in one lookup; (None, 0) if the user does not exist."""
+    row = (await db.execute(
+        select(Users.version, Users.tombstone_horizon).where(Users.id == owner_id)
+    )).first()
+    return tuple(row) if row is not None else (None, 0)
+
+
+async def bump_version(db: AsyncSession, owner_id: int, active_only: bool = False) -> Optional[int]:
+    """Advance the owner's version and return it. Run it in the transaction of the write.
+
+    With `active_only`, a deactivated owner (one whose account is being
+    deleted) is not bumped either, and None keeps their todos from being written.
+    """
+    match = Users.id == owner_id
+    if active_only:
+        match = and_(match, Users.is_active)
+    return await db.scalar(
+        update(Users).where(match).values(version=Users.version + 1)
+        .returning(Users.version)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def bump_owner_of(db: AsyncSession, todo_id: int) -> Optional[tuple]:
+    """Advance the version of the todo's active owner; (owner id, version), or None if there is no such todo.
+
+    For writers that know the todo but not its owner (admins). One statement
+    that locks the user row before the todo is written, in the same order as
+    the owner's own writes. The todos of an account being deleted count as gone.
+    """
+    row = (await db.execute(
+        update(Users).where(Users.id == select(Todos.owner_id).where(Todos.id == todo_id).scalar_subquery(),
+                            Users.is_active)
+        .values(version=Users.version + 1)
+        .returning(Users.id, Users.version)
+        .execution_options(synchronize_session=False)
+    )).first()
+    return tuple(row) if row is not None else None
+
+
+async def record_deletes(db: AsyncSession, owner_id: int, todo_ids, version: int):
+    """Leave a tombstone per deleted todo for delta sync."""
+    await db.execute(insert(TodoTombstones), [
+        {'todo_id': todo_id, 'owner_id': owner_id, 'version': version} for todo_id in todo_ids
+    ])
+
+
+async def prune_tombstones(db: AsyncSession, before: datetime, limit: int) -> int:
+    """Delete up to `limit` of the oldest tombstones from before `before` and commit; how many went.
+
+    Each owner's tombstone_horizon is raised to the newest version pruned, in
+    the same transaction, and their rows are locked first, as writers do.
+    """
+    rows = (await db.execute(
+        select(TodoTombstones.id, TodoTombstones.owner_id, TodoTombstones.version)
+        .where(TodoTombstones.deleted_at < before)
+        .order_by(TodoTombstones.deleted_at, TodoTombstones.id)
+        .limit(limit)
+    )).all()
+    if not rows:
+        return 0
+    horizons = {}
+    for row in rows:
+        horizons[row.owner_id] = max(row.version, horizons.get(row.owner_id, 0))
+    users = Users.__table__
+    await db.execute(
+        update(users).where(users.c.id == bindparam('owner')).values(tombstone_horizon=case(
+            (users.c.tombstone_horizon < bindparam('horizon'), bindparam('horizon')),
+            else_=users.c.tombstone_horizon,
+        )),
+        [{'owner': owner_id, 'horizon': horizon} for owner_id, horizon in sorted(horizons.items())],
+    )
+    await db.execute(delete(TodoTombstones).where(TodoTombstones.id.in_([row.id for row in rows])))
+    await db.commit()
+    return len(rows)
+
+
+def make_etag(*parts) -> str:
+    return '"' + '-'.join(str(p) for p in parts if p != '') + '"'
+
+
+def query_digest(request: Request) -> str:
+    """A short digest of the query string, so each listing variant has its own ETag."""
+    query = request.url.query
+    return hashlib.blake2s(query.encode(), digest_size=6).hexdigest() if query else ''
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match already names this ETag."""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored.
+    return etag in {tag.strip().removeprefix('W/') for tag in header.split(',')}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})